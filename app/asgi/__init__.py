@@ -0,0 +1,3 @@
+from .app import AsgiApp, create_app
+
+__all__ = ['AsgiApp', 'create_app']
@@ -0,0 +1,150 @@
+"""ASGI front-end serving the CherryPy route surface from one event loop.
+
+Handlers are coroutines: LDAP binds, SQLite and QR rendering are awaited on the model
+executor and Telegram messages go through the sender thread, so a slow directory call
+parks a coroutine instead of one of a fixed number of server threads.
+"""
+import asyncio
+import logging
+import time
+from http import HTTPStatus
+
+from app.common.database.migrations import apply_migrations
+from app.config import Config
+from app.metrics import HTTP_REQUESTS, HTTP_SECONDS
+from app.models import directory_sync, profile_refresher, token_store
+from app.models.aio import ModelExecutor, run_sync
+from app.tracing import tracer
+from app.web.hooks.normalize_username import (cached_login, login_account,
+                                              login_error, normalized_login)
+from app.web.hooks.rate_limit import RATE_LIMITED_MESSAGE, over_limit
+from app.web.sessions import session_store
+from app.web.tg_sender import telegram_sender
+
+from .assets import Assets, Static
+from .auth import Auth
+from .office365 import Office365
+from .request import (HTTPError, Receive, Redirect, Request, Response, Scope,
+                      Send, read_body)
+from .root import Root
+from .routing import Handler, Route, Router
+from .user import User
+from .utils import SESSION_COOKIE
+
+logger = logging.getLogger(__name__)
+
+
+class AsgiApp:
+    def __init__(self) -> None:
+        self.router = Router()
+        # registers the asset_url template global, so it goes before the controllers load templates
+        assets = Assets()
+        self.router.mount(assets, '/assets')
+        self.router.mount(Static(assets.manifest), '/static')
+        self.router.mount(Root(), '/')
+        self.router.mount(Auth(), '/auth')
+        self.router.mount(User(), '/user')
+        self.router.mount(Office365(), '/office365')
+        logger.debug("Created ASGI app controllers")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                session_store.start()
+                token_store.start()
+                profile_refresher.start()
+                directory_sync.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def shutdown() -> None:
+        directory_sync.stop()
+        profile_refresher.stop()
+        token_store.stop()
+        session_store.stop()
+        telegram_sender.stop()
+        ModelExecutor.shutdown()
+
+    async def _http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start = time.perf_counter()
+        label = 'unmatched'
+        try:
+            request = Request(scope, await read_body(receive))
+            found = self.router.match(request.path)
+            if found is None:
+                raise HTTPError(404)
+            handler, route, label, args = found
+            with tracer.trace(f'{request.method} {request.path}'):
+                response = await self._dispatch(request, handler, route, args)
+        except ConnectionError:
+            return
+        except Redirect as e:
+            response = Response(status=e.status, content_type=None)
+            response.headers['Location'] = e.location
+        except HTTPError as e:
+            response = Response(e.message or HTTPStatus(e.status).phrase, e.status, 'text/plain;charset=utf-8')
+            response.headers.update(e.headers)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Unhandled error in %s", label)
+            response = Response(HTTPStatus.INTERNAL_SERVER_ERROR.phrase, 500, 'text/plain;charset=utf-8')
+
+        HTTP_SECONDS.observe(time.perf_counter() - start, label)
+        HTTP_REQUESTS.inc(label, str(response.status))
+        await response.send(send, head=scope['method'] == 'HEAD')
+
+    async def _dispatch(self, request: Request, handler: Handler, route: Route, args: list[str]) -> Response:
+        if route.methods is not None and request.method not in route.methods \
+                and not (request.method == 'HEAD' and 'GET' in route.methods):
+            raise HTTPError(405, headers={'Allow': ', '.join(route.methods)})
+
+        # same order as the CherryPy tools: rate limiting first, so rejected requests never reach LDAP
+        if route.rate_limit is not None:
+            limiter = over_limit(route.rate_limit, request.remote_ip, request.params.get('username'),
+                                 user=route.rate_limit_user)
+            if limiter is not None:
+                raise HTTPError(429, RATE_LIMITED_MESSAGE, {'Retry-After': str(limiter.retry_after())})
+
+        session_id = request.cookies.get(SESSION_COOKIE)
+        if session_id:
+            request.session_id = session_id
+            # a session held in memory resolves without I/O, anything else reads the sessions table
+            if session_id in session_store:
+                request.username = session_store.resolve(session_id, request.agent)
+            else:
+                request.username = await run_sync(session_store.resolve, session_id, request.agent)
+
+        if route.authenticated and request.username is None:
+            raise Redirect("/auth")
+
+        if route.normalize_username and 'username' in request.params:
+            # rejected input and known logins are answered here, only a directory lookup leaves the loop
+            username = request.params['username']
+            login = None
+            if login_account(username) is not None:
+                login = cached_login(username)
+                if login is None:
+                    login = await run_sync(normalized_login, username)
+            if login is None:
+                request.params['errors'] = [login_error(username)]
+            else:
+                request.params['username'] = login
+
+        return await handler(request, *args)
+
+
+def create_app() -> AsgiApp:
+    Config.load()
+    Config.setup_app_logger('app_asgi.log')
+    apply_migrations()
+    return AsgiApp()
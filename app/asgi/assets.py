@@ -0,0 +1,52 @@
+from app.config import Config
+from app.web.assets import Asset, AssetManifest
+from app.web.controllers.assets import IMMUTABLE
+
+from .request import HTTPError, Request, Response
+from .routing import expose
+from .utils import not_modified
+
+# plain /static/ URLs are not fingerprinted, so browsers revalidate them
+REVALIDATE = 'public, no-cache'
+
+
+def asset_response(request: Request, asset: Asset, cache_control: str) -> Response:
+    encoding, body = asset.negotiate(request.headers.get('accept-encoding', ''))
+    etag = asset.etag(encoding)
+    if not_modified(request, etag):
+        response = Response(status=304, content_type=None)
+    else:
+        response = Response(body, content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class Assets():
+    def __init__(self):
+        self.manifest = AssetManifest(cache_dir=Config.assets_cache_dir).build()
+        Config.jinja_env.globals['asset_url'] = self.manifest.url
+
+    @expose(('GET', 'HEAD'), positional=True)
+    async def index(self, request: Request, *parts: str) -> Response:
+        asset = self.manifest.find('/'.join(parts))
+        if asset is None:
+            raise HTTPError(404)
+        return asset_response(request, asset, IMMUTABLE)
+
+
+class Static():
+    """The static files under their own names, as the CherryPy front-end serves them at /static/."""
+
+    def __init__(self, manifest: AssetManifest) -> None:
+        self.manifest = manifest
+
+    @expose(('GET', 'HEAD'), positional=True)
+    async def index(self, request: Request, *parts: str) -> Response:
+        asset = self.manifest.by_path.get('/'.join(parts))
+        if asset is None:
+            raise HTTPError(404)
+        return asset_response(request, asset, REVALIDATE)
@@ -0,0 +1,119 @@
+import logging
+import secrets
+
+from app.config import Config
+from app.models import User
+from app.models.aio import run_sync
+from app.web import services
+from app.web.cached import CachedResponse
+from app.web.services import FormError
+from app.web.sessions import session_store
+
+from .request import Redirect, Request, Response
+from .routing import expose
+from .utils import cached_page, set_session_cookie
+
+logger = logging.getLogger(__name__)
+
+
+class Auth():
+    """Async counterpart of app.web.controllers.Auth; the app.web.services flows are awaited on the model executor."""
+
+    def __init__(self):
+        self.index_template = Config.jinja_env.get_template('auth/index.html')
+        self.reset_template = Config.jinja_env.get_template('auth/reset.html')
+        self.reset_typed_template = Config.jinja_env.get_template('auth/reset_typed.html')
+        self.index_page = CachedResponse(self.index_template.render)
+        self.reset_page = CachedResponse(self.reset_template.render)
+
+    @expose()
+    async def index(self, request: Request) -> Response:
+        if request.username is not None:
+            raise Redirect("/user")
+
+        return cached_page(request, self.index_page)
+
+    @expose(rate_limit='login', normalize_username=True)
+    async def login(self, request: Request) -> Response:
+        if request.username is not None:
+            raise Redirect("/user")
+
+        username, password = request.require('username', 'password')
+        if 'errors' in request.params:
+            return Response(self.index_template.render(errors=request.params['errors']))
+
+        try:
+            await run_sync(services.check_login, username, password)
+        except FormError as e:
+            return Response(self.index_template.render(errors=[str(e)]))
+
+        session_id = secrets.token_hex(20)
+        await run_sync(session_store.save, session_id, username, request.agent)
+
+        response = Response(status=303, content_type=None)
+        response.headers['Location'] = "/user"
+        set_session_cookie(response, session_id, int(Config.session_lifetime))
+        return response
+
+    @expose()
+    async def reset(self, request: Request) -> Response:
+        if request.username is not None:
+            raise Redirect("/user")
+
+        return cached_page(request, self.reset_page)
+
+    @expose(('POST',), rate_limit='reset_post', normalize_username=True)
+    async def reset_post(self, request: Request) -> Response:
+        if request.username is not None:
+            raise Redirect("/user")
+
+        username, = request.require('username')
+        try:
+            user, bind_dest_list = await run_sync(services.reset_destinations, username)
+        except FormError as e:
+            return Response(self.reset_template.render(errors=[str(e)]))
+
+        return Response(self.reset_template.render(user=user, type_form=True, bind_dest_list=bind_dest_list))
+
+    @expose(rate_limit='reset_typed', rate_limit_user=(3, 300.0), normalize_username=True)
+    async def reset_typed(self, request: Request) -> Response:
+        if request.username is not None:
+            raise Redirect("/user")
+
+        username, bind_dest_id = request.require('username', 'bind_dest_id')
+        try:
+            user, bind_dest = await run_sync(services.send_reset_code, username, bind_dest_id)
+        except FormError as e:
+            return Response(self.reset_template.render(errors=[str(e)]))
+
+        return Response(self.reset_typed_template.render(username=user.login, bind_dest_id=bind_dest.value))
+
+    @expose(('POST',), rate_limit='reset_save', normalize_username=True)
+    async def reset_save(self, request: Request) -> Response:
+        username, bind_dest_id, reset_key, password = request.require('username', 'bind_dest_id', 'reset_key',
+                                                                      'password')
+        logger.info("Reset password request received for user: %s", username)
+        if request.username is not None:
+            raise Redirect("/user")
+
+        if 'errors' in request.params:
+            return Response(self.reset_typed_template.render(errors=request.params['errors']))
+
+        try:
+            await run_sync(services.reset_password, username, bind_dest_id, reset_key, password)
+        except FormError as e:
+            return Response(self.reset_typed_template.render(username=username, bind_dest_id=bind_dest_id,
+                                                             errors=[str(e)]))
+
+        raise Redirect("/auth")
+
+    @expose(authenticated=True)
+    async def logout(self, request: Request) -> Response:
+        assert request.session_id is not None and request.username is not None
+        await run_sync(session_store.delete, request.session_id)
+        User.invalidate_cache(request.username)
+
+        response = Response(status=303, content_type=None)
+        response.headers['Location'] = "/auth"
+        set_session_cookie(response, '', 0)
+        return response
@@ -0,0 +1,16 @@
+from app.config import Config
+from app.web.cached import CachedResponse
+
+from .request import Request, Response
+from .routing import expose
+from .utils import cached_page
+
+
+class Office365():
+    def __init__(self):
+        self.index_template = Config.jinja_env.get_template('office365/index.html')
+        self.index_page = CachedResponse(self.index_template.render)
+
+    @expose(('GET',))
+    async def index(self, request: Request) -> Response:
+        return cached_page(request, self.index_page)
@@ -0,0 +1,98 @@
+from http.cookies import SimpleCookie
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import parse_qsl
+
+from app.web.client_ip import client_ip
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+MAX_BODY = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = '', headers: Optional[dict[str, str]] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Redirect(Exception):
+    def __init__(self, location: str, status: int = 303) -> None:
+        super().__init__(location)
+        self.location = location
+        self.status = status
+
+
+class Request:
+    def __init__(self, scope: Scope, body: bytes) -> None:
+        self.method: str = scope['method']
+        self.path: str = scope['path']
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        self.remote_ip = client_ip(scope['client'][0] if scope.get('client') else '', self.headers.get('x-forwarded-for'))
+        self.params = dict[str, Any](parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        if self.headers.get('content-type', '').startswith('application/x-www-form-urlencoded'):
+            self.params.update(parse_qsl(body.decode('utf-8')))
+
+        cookies = SimpleCookie()
+        cookies.load(self.headers.get('cookie', ''))
+        self.cookies = {key: morsel.value for key, morsel in cookies.items()}
+        # filled in by the app from the session cookie
+        self.session_id: Optional[str] = None
+        self.username: Optional[str] = None
+
+    @property
+    def agent(self) -> str:
+        return self.headers.get('user-agent', '')
+
+    def require(self, *names: str) -> list[Any]:
+        missing = [name for name in names if name not in self.params]
+        if missing:
+            # same answer CherryPy gives for a handler called without its arguments
+            raise HTTPError(404, f"Missing parameters: {','.join(missing)}")
+        return [self.params[name] for name in names]
+
+
+class Response:
+    def __init__(self, body: bytes | str = b'', status: int = 200,
+                 content_type: Optional[str] = 'text/html;charset=utf-8') -> None:
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.status = status
+        self.headers = dict[str, str]()
+        self.cookies = list[str]()
+        if content_type is not None:
+            self.headers['Content-Type'] = content_type
+
+    def set_cookie(self, name: str, value: str, max_age: Optional[int] = None, secure: bool = False) -> None:
+        cookie = f'{name}={value}; Path=/; HttpOnly; SameSite=Lax'
+        if secure:
+            cookie += '; Secure'
+        if max_age is not None:
+            cookie += f'; Max-Age={max_age}'
+        self.cookies.append(cookie)
+
+    async def send(self, send: Send, head: bool = False) -> None:
+        headers = [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in self.headers.items()]
+        headers += [(b'set-cookie', cookie.encode('latin-1')) for cookie in self.cookies]
+        headers.append((b'content-length', str(len(self.body)).encode()))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if head else self.body})
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError('client disconnected')
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise HTTPError(413)
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
@@ -0,0 +1,18 @@
+from app.config import Config
+from app.metrics import registry
+
+from .request import HTTPError, Redirect, Request, Response
+from .routing import expose
+
+
+class Root():
+    @expose()
+    async def index(self, request: Request) -> Response:
+        raise Redirect("/user" if request.username is not None else "/auth")
+
+    @expose(('GET',))
+    async def metrics(self, request: Request) -> Response:
+        if request.remote_ip not in Config.metrics_allowed_ips:
+            raise HTTPError(404)
+
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from app.ratelimit import Budget
+
+from .request import Response
+
+Handler = Callable[..., Awaitable[Response]]
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    """What the CherryPy decorators of the matching controller method declare."""
+    methods: Optional[tuple[str, ...]] = None
+    authenticated: bool = False
+    normalize_username: bool = False
+    rate_limit: Optional[str] = None
+    rate_limit_user: Optional[Budget] = None
+    # extra path segments are passed to the handler, like CherryPy positional arguments
+    positional: bool = False
+
+
+def expose(methods: Optional[tuple[str, ...]] = None, **options: Any) -> Callable[[Handler], Handler]:
+    def decorator(handler: Handler) -> Handler:
+        handler.route = Route(methods, **options)  # type: ignore[attr-defined]
+        return handler
+
+    return decorator
+
+
+class Router:
+    def __init__(self) -> None:
+        self._routes = dict[str, tuple[Handler, Route, str]]()
+
+    def mount(self, controller: Any, prefix: str) -> None:
+        prefix = prefix.rstrip('/')
+        for name in dir(controller):
+            handler = getattr(controller, name)
+            route = getattr(handler, 'route', None)
+            if not isinstance(route, Route):
+                continue
+
+            label = f'{controller.__class__.__name__}.{name}'
+            if name == 'index':
+                self._routes[prefix or '/'] = (handler, route, label)
+                self._routes[prefix + '/'] = (handler, route, label)
+            else:
+                self._routes[f'{prefix}/{name}'] = (handler, route, label)
+
+    def match(self, path: str) -> Optional[tuple[Handler, Route, str, list[str]]]:
+        found = self._routes.get(path)
+        if found is not None:
+            return (*found, [])
+
+        head, _, tail = path.rpartition('/')
+        args = [tail]
+        while head:
+            found = self._routes.get(head)
+            if found is not None and found[1].positional:
+                return (*found, args)
+            head, _, tail = head.rpartition('/')
+            args.insert(0, tail)
+        return None
@@ -0,0 +1,73 @@
+import logging
+
+import app.models
+from app.config import Config
+from app.models.aio import run_sync
+from app.web import services
+
+from .request import HTTPError, Redirect, Request, Response
+from .routing import expose
+
+logger = logging.getLogger(__name__)
+
+
+class User():
+    """Async counterpart of app.web.controllers.User."""
+
+    def __init__(self):
+        self.index_template = Config.jinja_env.get_template('user/index.html')
+        self.reset_info_template = Config.jinja_env.get_template('user/reset_info.html')
+        self.telegram_new_template = Config.jinja_env.get_template('user/telegram_new.html')
+        self.otp_new_template = Config.jinja_env.get_template('user/otp_new.html')
+
+    @expose(('GET',), authenticated=True)
+    async def index(self, request: Request) -> Response:
+        assert request.username is not None
+        user = await app.models.User.find_async(request.username)
+        logger.info("User '%s' accessed index page.", user.name)
+        return Response(self.index_template.render({'user': user}))
+
+    @expose(('GET',), authenticated=True)
+    async def reset_info(self, request: Request) -> Response:
+        assert request.username is not None
+        user = await app.models.User.find_async(request.username)
+        logger.info("User '%s' accessed reset_info page.", user.name)
+        return Response(self.reset_info_template.render({'user': user}))
+
+    @expose(('GET',), authenticated=True)
+    async def telegram_new(self, request: Request) -> Response:
+        assert request.username is not None
+        params = await run_sync(services.new_telegram_binding, request.username)
+        return Response(self.telegram_new_template.render(params))
+
+    @expose(('GET',), authenticated=True)
+    async def telegram_destroy(self, request: Request) -> Response:
+        assert request.username is not None
+        await run_sync(services.remove_telegram, request.username)
+        raise Redirect("/user/reset_info")
+
+    @expose(('GET', 'POST'), authenticated=True)
+    async def otp_new(self, request: Request) -> Response:
+        assert request.username is not None
+        params = await run_sync(services.otp_binding, request.username, request.params.get('otp_number'))
+        if params is None:
+            raise Redirect("/user/reset_info")
+        return Response(self.otp_new_template.render(params))
+
+    @expose(('GET',), authenticated=True, positional=True)
+    async def qr(self, request: Request, kind: str) -> Response:
+        assert request.username is not None
+        image = await run_sync(services.binding_qr, request.username, kind)
+        if image is None:
+            raise HTTPError(404)
+
+        response = Response(image, content_type='image/png')
+        # the codes carry binding secrets, so no copy may outlive the page
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @expose(('GET',), authenticated=True)
+    async def otp_destroy(self, request: Request) -> Response:
+        assert request.username is not None
+        await run_sync(services.remove_otp, request.username)
+        raise Redirect("/user/reset_info")
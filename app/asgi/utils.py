@@ -0,0 +1,22 @@
+from app.config import Config
+from app.web.cached import CachedResponse
+
+from .request import Request, Response
+
+SESSION_COOKIE = 'session_id'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]
+
+
+def set_session_cookie(response: Response, session_id: str, max_age: int) -> None:
+    response.set_cookie(SESSION_COOKIE, session_id, max_age, secure=Config.session_cookie_secure)
+
+
+def cached_page(request: Request, page: CachedResponse) -> Response:
+    body, etag = page.load()
+    response = Response(status=304, content_type=None) if not_modified(request, etag) else Response(body)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = page.cache_control
+    return response
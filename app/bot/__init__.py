@@ -1,3 +1,4 @@
 from .bot import Bot
+from .webhook import WebhookReceiver
 
-__all__ = ['Bot']
+__all__ = ['Bot', 'WebhookReceiver']
@@ -1,17 +1,44 @@
 import asyncio
+import concurrent.futures
+import functools
 import logging
-from typing import Any, Optional
+import threading
+import time
+from typing import Any, Callable, Coroutine, Optional, TypeVar
 
+import cherrypy
 from telegram.ext import (Application, CallbackQueryHandler, CommandHandler,
                           ConversationHandler, MessageHandler, filters)
 
 from app.config import Config
+from app.metrics import BOT_SECONDS, MetricsServer
+from app.models import directory_sync, profile_refresher
+from app.models.aio import ModelExecutor
+from app.tracing import tracer
 
 from . import handlers
+from .errors import error_reporter
 from .handlers import StartConversationState
+from .persistence import SQLitePersistence
+from .webhook import WebhookReceiver
 
 logger = logging.getLogger(__name__)
 
+R = TypeVar('R')
+
+
+def timed(callback: Callable[..., Coroutine[Any, Any, R]]) -> Callable[..., Coroutine[Any, Any, R]]:
+    @functools.wraps(callback)
+    async def wrapper(*args: Any, **kwargs: Any) -> R:
+        start = time.perf_counter()
+        try:
+            with tracer.trace(f'bot.{callback.__name__}'):
+                return await callback(*args, **kwargs)
+        finally:
+            BOT_SECONDS.observe(time.perf_counter() - start, callback.__name__)
+
+    return wrapper
+
 
 class SingletonMeta(type):
     _instances = dict['SingletonMeta', 'SingletonMeta']()
@@ -25,54 +52,143 @@ class SingletonMeta(type):
 
 class Bot(metaclass=SingletonMeta):
     loop: Optional[asyncio.AbstractEventLoop]
+    metrics_server: Optional[MetricsServer]
+    webhook: Optional[WebhookReceiver]
 
     def __init__(self) -> None:
         logger.info("Initializing bot")
-        self.application = Application.builder().token(Config.telegram_bot_token).build()
+        builder = (Application.builder()
+                   .token(Config.telegram_bot_token)
+                   .base_url(Config.telegram_api_url)
+                   .persistence(SQLitePersistence(StartConversationState))
+                   .post_stop(self._post_stop))
+        if Config.bot_mode == 'webhook':
+            # updates arrive through WebhookReceiver, so no Updater; the bounded queue pushes back on Telegram
+            builder = builder.updater(None).update_queue(asyncio.Queue(maxsize=Config.bot_update_queue_size))
+        self.application = builder.build()
         self.loop = None
+        self.metrics_server = None
+        self.webhook = WebhookReceiver(self.application) if Config.bot_mode == 'webhook' else None
         self.__register_handlers__()
 
     def __register_handlers__(self) -> None:
         logger.info("Registering handlers")
         self.application.add_handler(ConversationHandler(
             entry_points=[CommandHandler(
-                'start', handlers.sc_start, block=False)],
+                'start', timed(handlers.sc_start), block=False)],
             states={
                 StartConversationState.LOGIN: [
                     MessageHandler(
-                        filters.TEXT, handlers.sc_set_login, block=False)
+                        filters.TEXT, timed(handlers.sc_set_login), block=False)
                 ],
                 StartConversationState.CONFIRMATION: [
                     MessageHandler(
-                        filters.TEXT, handlers.sc_set_confirmation, block=False)
+                        filters.TEXT, timed(handlers.sc_set_confirmation), block=False)
                 ],
                 StartConversationState.FINISH: [
                     CallbackQueryHandler(
-                        handlers.sc_save_user, pattern='^save$', block=False),
+                        timed(handlers.sc_save_user), pattern='^save$', block=False),
                     CallbackQueryHandler(
-                        handlers.sc_reset_user, pattern='^reset$', block=False),
+                        timed(handlers.sc_reset_user), pattern='^reset$', block=False),
                 ],
             },
             fallbacks=[],
+            name='start',
+            persistent=True,
         ))
         self.application.add_handler(CommandHandler(
-            'whoami', handlers.whoami, block=False))
+            'whoami', timed(handlers.whoami), block=False))
         self.application.add_handler(CommandHandler(
-            'help', handlers.help_cmd, block=False))
+            'help', timed(handlers.help_cmd), block=False))
 
         logger.debug("Registering error handlers")
         self.application.add_error_handler(handlers.error_handler)
 
     def start(self) -> None:
-        logger.info('Starting bot polling')
-        self.loop = asyncio.get_event_loop()
-        self.application.run_polling()
-        logger.debug('Run polling exited')
+        if Config.metrics_port:
+            logger.info('Serving metrics on port %d', Config.metrics_port)
+            self.metrics_server = MetricsServer(Config.metrics_port, Config.metrics_allowed_ips).start()
+        # the bot is the main reader of the local profiles, so a standalone bot keeps them fresh itself
+        profile_refresher.start()
+        directory_sync.start()
+
+        if self.webhook is not None:
+            self._run_webhook(standalone=True)
+        else:
+            logger.info('Starting bot polling')
+            self.loop = asyncio.get_event_loop()
+            self.application.run_polling()
+            logger.debug('Run polling exited')
+        directory_sync.stop()
+        profile_refresher.stop()
+        ModelExecutor.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+
+    def start_embedded(self) -> WebhookReceiver:
+        """Runs the webhook bot on a background loop; the caller mounts the returned receiver."""
+        assert self.webhook is not None, 'embedded mode requires BOT_MODE=webhook'
+        started = threading.Event()
+        threading.Thread(target=self._run_webhook, args=(False, started), name='bot', daemon=True).start()
+        started.wait()
+        return self.webhook
+
+    async def _start_webhook(self) -> None:
+        assert self.webhook is not None
+        await self.application.initialize()
+        await self.application.start()
+        await self.application.bot.set_webhook(Config.bot_webhook_url, secret_token=Config.bot_webhook_secret)
+        self.webhook.loop = self.loop
+        self.webhook.accepting = True
+        logger.info('Webhook set to %s', Config.bot_webhook_url)
+
+    def _run_webhook(self, standalone: bool, started: Optional[threading.Event] = None) -> None:
+        logger.info('Starting bot in webhook mode')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start_webhook())
+        finally:
+            if started is not None:
+                started.set()
+
+        if standalone:
+            host, port = Config.bot_webhook_listen
+            cherrypy.config.update({'server.socket_host': host, 'server.socket_port': port,
+                                    'engine.autoreload.on': False, 'log.screen': False})
+            cherrypy.tree.mount(self.webhook, Config.bot_webhook_path, WebhookReceiver.config)
+            cherrypy.engine.start()
+        try:
+            self.loop.run_forever()
+        finally:
+            if standalone:
+                cherrypy.engine.exit()
+            self.loop.close()
+            logger.debug('Webhook loop exited')
+
+    async def _post_stop(self, _application: Application) -> None:
+        # run_polling calls this once the handlers are done; pending error digests go out before the loop closes
+        await error_reporter.close()
+
+    async def _drain(self) -> None:
+        # Application.stop processes everything already queued and awaits the running handlers
+        await self.application.stop()
+        await self._post_stop(self.application)
+        await self.application.shutdown()
 
     def stop(self) -> None:
         logger.info('Stopping bot')
         if self.loop is None:
             logger.warning('Bot appears to not be running (loop is None)')
+        elif self.webhook is not None:
+            self.webhook.accepting = False
+            logger.info('Draining %d queued updates', self.application.update_queue.qsize())
+            try:
+                asyncio.run_coroutine_threadsafe(self._drain(), self.loop).result(Config.bot_drain_timeout)
+            except concurrent.futures.TimeoutError:
+                logger.warning('Bot did not drain within %.0f seconds', Config.bot_drain_timeout)
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
         else:
             self.loop.stop()
         logger.debug('Stopped current event loop')
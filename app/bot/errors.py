@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import html
+import json
+import logging
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from telegram import Bot, Update
+from telegram.constants import ParseMode
+
+from app.config import Config
+from app.metrics import registry
+from app.models.aio import run_sync
+from app.ratelimit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+BOT_ERRORS = registry.counter('bot_errors_total', 'Exceptions raised by bot handlers.', ('error',))
+ERROR_REPORTS = registry.counter('bot_error_reports_total', 'Error digests sent to the developer chat.')
+
+
+def _pre(text: str, limit: int, tail: bool = False) -> str:
+    # Telegram counts the 4096 characters of a message after parsing the markup, so only the text is cut
+    if len(text) > limit:
+        text = '…\n' + text[-limit:] if tail else text[:limit] + '\n…'
+    return f"<pre>{html.escape(text, quote=False)}</pre>"
+
+
+def fingerprint(error: BaseException) -> str:
+    """Exception type and the code locations of its traceback; the same failure gets the same fingerprint."""
+    frames = [(frame.f_code.co_filename, frame.f_code.co_name, lineno)
+              for frame, lineno in traceback.walk_tb(error.__traceback__)]
+    key = repr((type(error).__module__, type(error).__qualname__, frames))
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+@dataclass(slots=True)
+class ErrorDigest:
+    fingerprint: str
+    # the first occurrence since the last digest, formatted only if the digest is sent
+    error: BaseException
+    update: object
+    chat_data: Any
+    user_data: Any
+    count: int = 0
+    since: float = field(default_factory=time.time)
+    sent: float = 0.0
+
+    def format(self) -> str:
+        tb_string = "".join(traceback.format_exception(None, self.error, self.error.__traceback__))
+        update_str = self.update.to_dict() if isinstance(self.update, Update) else str(self.update)
+        repeats = f", {self.count} times in {time.time() - self.since:.0f} s" if self.count > 1 else ""
+        return (
+            f"An exception was raised while handling an update{repeats} (fingerprint {self.fingerprint})\n"
+            f"{_pre('update = ' + json.dumps(update_str, indent=2, ensure_ascii=False), 1500)}\n\n"
+            f"{_pre(f'context.chat_data = {self.chat_data}', 300)}\n\n"
+            f"{_pre(f'context.user_data = {self.user_data}', 300)}\n\n"
+            # the end of the traceback says where the exception was raised
+            f"{_pre(tb_string, 1700, tail=True)}"
+        )
+
+    def reset(self, count: int) -> None:
+        # occurrences counted while the digest was formatted and sent go into the next one
+        self.count -= count
+        self.since = time.time()
+        self.sent = time.monotonic()
+
+
+class ErrorReporter:
+    """Collapses bot exceptions into one developer message per fingerprint and window.
+
+    report() runs on the event loop and only fingerprints and counts. A background task sends a
+    digest for every fingerprint with new occurrences, at most once per Config.error_report_window
+    and within the Config.error_report_budget shared by all fingerprints; digests over the budget
+    wait for the next round and keep counting. Messages are formatted on the model executor.
+    """
+
+    def __init__(self) -> None:
+        self._digests = dict[str, ErrorDigest]()
+        self._limiter: Optional[TokenBucketLimiter] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def report(self, error: BaseException, update: object, chat_data: Any, user_data: Any, bot: Bot) -> None:
+        BOT_ERRORS.inc(type(error).__name__)
+        key = fingerprint(error)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = ErrorDigest(key, error, update, chat_data, user_data)
+        elif digest.count == 0:
+            digest.error, digest.update, digest.chat_data, digest.user_data = error, update, chat_data, user_data
+        digest.count += 1
+
+        self._bot = bot
+        if self._task is None:
+            self._limiter = TokenBucketLimiter(*Config.error_report_budget)
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name='error-reporter')
+        if digest.count == 1 and digest.sent == 0.0:
+            # a new kind of failure goes out right away, repeats wait for their window
+            assert self._wakeup is not None
+            self._wakeup.set()
+
+    def _due(self, force: bool) -> list[ErrorDigest]:
+        now = time.monotonic()
+        due = [digest for digest in self._digests.values()
+               if digest.count > 0 and (force or digest.sent == 0.0 or now - digest.sent >= Config.error_report_window)]
+        for key in [key for key, digest in self._digests.items()
+                    if digest.count == 0 and now - digest.sent >= Config.error_report_window]:
+            del self._digests[key]
+        return sorted(due, key=lambda digest: digest.since)
+
+    async def flush(self, force: bool = False) -> None:
+        assert self._limiter is not None and self._bot is not None
+        for digest in self._due(force):
+            if not self._limiter.allow('developer'):
+                logger.warning("Error report budget exhausted, %d digests wait for the next round",
+                               sum(1 for digest in self._digests.values() if digest.count > 0))
+                return
+            count = digest.count
+            try:
+                message = await run_sync(digest.format)
+                await self._bot.send_message(chat_id=Config.developer_chat_id, text=message, parse_mode=ParseMode.HTML)
+                ERROR_REPORTS.inc()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # never raise from here, the error handler would report it again
+                logger.exception("Sending error report %s failed", digest.fingerprint)
+            finally:
+                digest.reset(count)
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), Config.error_report_window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        await self.flush(force=True)
+
+
+error_reporter = ErrorReporter()
+
+registry.callback('bot_error_fingerprints', 'Error fingerprints tracked by the error reporter.', (),
+                  lambda: [((), len(error_reporter))])
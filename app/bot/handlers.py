@@ -1,50 +1,25 @@
 import base64
-import html
-import json
 import logging
-import traceback
 from enum import Enum, auto, unique
 
 from telegram import Update
-from telegram.constants import ParseMode
 from telegram.ext import ContextTypes, ConversationHandler
 
-from ..config import Config
-from ..models import User, UserBindDestination
+from ..models import TokenPurpose, User, token_store
 from . import resources
+from .errors import error_reporter
 
 logger = logging.getLogger(__name__)
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Log the error and send a telegram message to notify the developer."""
+    """Log the error and queue a digest for the developer chat."""
     # Log the error before we do anything else, so we can see it even if something breaks.
     logger.error(msg="Exception while handling an update:",
                  exc_info=context.error)
 
-    # traceback.format_exception returns the usual python message about an exception, but as a
-    # list of strings rather than a single string, so we have to join them together.
-    tb_msg = context.error.__traceback__ if context.error is not None else None
-    tb_list = traceback.format_exception(None, context.error, tb_msg)
-    tb_string = "".join(tb_list)
-
-    # Build the message with some markup and additional information about what happened.
-    # You might need to add some logic to deal with messages longer than the 4096 character limit.
-    update_str = update.to_dict() if isinstance(update, Update) else str(update)
-    message = (
-        f"An exception was raised while handling an update\n"
-        f"<pre>update = {html.escape(json.dumps(update_str, indent=2, ensure_ascii=False))}"
-        "</pre>\n\n"
-        f"<pre>context.chat_data = {html.escape(str(context.chat_data))}</pre>\n\n"
-        f"<pre>context.user_data = {html.escape(str(context.user_data))}</pre>\n\n"
-        f"<pre>{html.escape(tb_string)}</pre>"
-    )
-
-    # Finally, send the message
-    # max message size 4096
-    await context.bot.send_message(
-        chat_id=Config.developer_chat_id, text=message[:4000], parse_mode=ParseMode.HTML
-    )
+    if context.error is not None:
+        error_reporter.report(context.error, update, context.chat_data, context.user_data, context.bot)
 
 
 @unique
@@ -61,7 +36,7 @@ async def sc_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> StartC
         logger.error("sc_start with message/text None")
         return StartConversationState.LOGIN
 
-    user = User.try_find_by_telegram(update.message.chat.id)
+    user = await User.try_find_by_telegram_async(update.message.chat.id)
     if user is not None:
         await update.message.reply_text(resources.SC_START_DONE_TEXT % user.name)
         return ConversationHandler.END
@@ -69,25 +44,24 @@ async def sc_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> StartC
     data = update.message.text.split()
     if len(data) > 1:
         login, bind_token = base64.b64decode(data[1]).decode().split()
-        user = User.try_find(login)
+        user = await User.try_find_async(login)
         if user is None:
             await update.message.reply_text(resources.SC_LOGIN_ERROR_TEXT)
             await update.message.reply_text(resources.SC_START_OK_TEXT)
             return StartConversationState.LOGIN
 
-        if user.bind_token != bind_token or user.bind_dest != UserBindDestination.TELEGRAM:
-            if user.bind_dest != UserBindDestination.TELEGRAM:
+        assert user.login is not None
+        if not await token_store.consume_async(TokenPurpose.TELEGRAM, user.login, bind_token):
+            if await token_store.peek_async(TokenPurpose.TELEGRAM, user.login) is None:
                 await update.message.reply_text(resources.SC_CONFIRMATION_NTG_ERROR_TEXT)
             else:
                 await update.message.reply_text(resources.SC_CONFIRMATION_ERROR_TEXT)
             await update.message.reply_text(resources.SC_START_OK_TEXT)
-            user.bind_token = None
-            user.bind_dest = UserBindDestination.NONE
-            user.save()
+            await token_store.discard_async(TokenPurpose.TELEGRAM, user.login)
             return StartConversationState.LOGIN
 
         assert context.chat_data is not None
-        context.chat_data['login'] = login
+        context.chat_data['login'] = user.login
         context.chat_data['tg_id'] = update.message.chat.id
 
         text = resources.SC_FINISH_TEXT % user.name
@@ -106,19 +80,20 @@ async def sc_set_login(update: Update, context: ContextTypes.DEFAULT_TYPE) -> St
         return StartConversationState.LOGIN
 
     login = update.message.text.strip()
-    user = User.try_find(login)
+    user = await User.try_find_async(login)
     if user is None:
         await update.message.reply_text(resources.SC_LOGIN_ERROR_TEXT)
         await update.message.reply_text(resources.SC_START_OK_TEXT)
         return StartConversationState.LOGIN
 
-    if user.bind_token is None:
+    assert user.login is not None
+    if await token_store.peek_async(TokenPurpose.TELEGRAM, user.login) is None:
         await update.message.reply_text(resources.SC_CONFIRMATION_NONE_TEXT)
         await update.message.reply_text(resources.SC_START_OK_TEXT)
         return StartConversationState.LOGIN
 
     assert context.chat_data is not None
-    context.chat_data['login'] = login
+    context.chat_data['login'] = user.login
     await update.message.reply_text(resources.SC_CONFIRMATION_OK_TEXT)
     return StartConversationState.CONFIRMATION
 
@@ -131,21 +106,18 @@ async def sc_set_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE
         return StartConversationState.LOGIN
 
     assert context.chat_data is not None
-    user = User.find(context.chat_data['login'])
+    login = context.chat_data['login']
     bind_token = update.message.text.strip()
 
-    if user.bind_token != bind_token:
+    if not await token_store.consume_async(TokenPurpose.TELEGRAM, login, bind_token):
         await update.message.reply_text(resources.SC_CONFIRMATION_ERROR_TEXT)
         await update.message.reply_text(resources.SC_START_OK_TEXT)
 
-        user.bind_token = None
-        user.save()
+        await token_store.discard_async(TokenPurpose.TELEGRAM, login)
 
         return StartConversationState.LOGIN
 
-    user.bind_token = None
-    user.save()
-
+    user = await User.find_async(login)
     context.chat_data['tg_id'] = update.message.chat.id
 
     text = resources.SC_FINISH_TEXT % user.name
@@ -161,9 +133,9 @@ async def sc_save_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> St
         return StartConversationState.LOGIN
 
     assert context.chat_data is not None
-    user = User.find(context.chat_data['login'])
+    user = await User.find_async(context.chat_data['login'])
     user.telegram = context.chat_data['tg_id']
-    user.save()
+    await user.save_async()
 
     await update.callback_query.message.edit_text(resources.SC_SAVE_USER_TEXT)
     return ConversationHandler.END
@@ -198,7 +170,7 @@ async def whoami(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.error("whoami with message None")
         return
 
-    user = User.try_find_by_telegram(update.message.chat_id)
+    user = await User.try_find_by_telegram_async(update.message.chat_id)
     if user is None:
         await update.message.reply_text(resources.WHOAMI_NONE_TEXT)
     else:
@@ -0,0 +1,156 @@
+import json
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Any, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from app.config import Config
+from app.metrics import SQL_SECONDS, registry
+from app.models.aio import run_sync
+
+PURGE_CONVERSATIONS_SQL = 'DELETE FROM "bot_conversations" WHERE "updated" < ?'
+PURGE_CHAT_DATA_SQL = 'DELETE FROM "bot_chat_data" WHERE "updated" < ?'
+FETCH_CONVERSATIONS_SQL = 'SELECT "key", "state" FROM "bot_conversations" WHERE "name" = ?'
+SAVE_CONVERSATION_SQL = ('INSERT OR REPLACE INTO "bot_conversations" ("name", "key", "state", "updated") '
+                         'VALUES (?, ?, ?, ?)')
+DELETE_CONVERSATION_SQL = 'DELETE FROM "bot_conversations" WHERE "name" = ? AND "key" = ?'
+FETCH_CHAT_DATA_SQL = 'SELECT "data" FROM "bot_chat_data" WHERE "chat_id" = ?'
+SAVE_CHAT_DATA_SQL = 'INSERT OR REPLACE INTO "bot_chat_data" ("chat_id", "data", "updated") VALUES (?, ?, ?)'
+DELETE_CHAT_DATA_SQL = 'DELETE FROM "bot_chat_data" WHERE "chat_id" = ?'
+
+ConversationKey = tuple[int | str, ...]
+ConversationDict = dict[ConversationKey, object]
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_WRITES = registry.counter('bot_persistence_writes_total', 'Rows written by the bot persistence.',
+                                      ('table',))
+PERSISTENCE_SKIPPED = registry.counter('bot_persistence_skipped_total',
+                                       'Chat data updates skipped because nothing changed.')
+
+
+class SQLitePersistence(BasePersistence[dict[Any, Any], dict[Any, Any], dict[Any, Any]]):
+    """Conversation states and chat_data of the bot kept in Config.database.
+
+    Only what changed is written: the Application hands over the chats and conversations touched
+    since its last run, and chat data equal to what was last written is skipped. Nothing is read
+    up front but the live conversation states; a chat's data is loaded the first time one of its
+    updates is processed. Rows older than Config.bot_state_ttl are dropped on startup.
+    """
+
+    def __init__(self, states: type[Enum]) -> None:
+        super().__init__(PersistenceInput(bot_data=False, chat_data=True, user_data=False, callback_data=False),
+                         Config.bot_persistence_interval)
+        self.states = states
+        self._lock = threading.Lock()
+        # chat id -> serialized data as last read or written, present once the chat was loaded
+        self._chat_data = dict[int, str]()
+
+    def _encode_state(self, state: object) -> str:
+        return state.name if isinstance(state, self.states) else json.dumps(state)
+
+    def _decode_state(self, value: str) -> object:
+        return self.states[value] if value in self.states.__members__ else json.loads(value)
+
+    def _load_conversations(self, name: str) -> ConversationDict:
+        expired = time.time() - Config.bot_state_ttl
+        with Config.database.get_connection() as db, SQL_SECONDS.time('purge_bot_state'):
+            db.execute(PURGE_CONVERSATIONS_SQL, (expired,))
+            db.execute(PURGE_CHAT_DATA_SQL, (expired,))
+        with SQL_SECONDS.time('fetch_conversations'):
+            rows = Config.database.execute(FETCH_CONVERSATIONS_SQL, (name,)).fetchall()
+        logger.info("Loaded %d %s conversations", len(rows), name)
+        return {tuple(json.loads(key)): self._decode_state(state) for key, state in rows}
+
+    def _save_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        with Config.database.get_connection() as db, SQL_SECONDS.time('save_conversation'):
+            if new_state is None:
+                db.execute(DELETE_CONVERSATION_SQL, (name, json.dumps(key)))
+            else:
+                db.execute(SAVE_CONVERSATION_SQL, (name, json.dumps(key), self._encode_state(new_state), time.time()))
+        PERSISTENCE_WRITES.inc('bot_conversations')
+
+    def _load_chat_data(self, chat_id: int) -> Optional[dict[Any, Any]]:
+        with self._lock:
+            if chat_id in self._chat_data:
+                return None
+        with SQL_SECONDS.time('fetch_chat_data'):
+            row = Config.database.execute(FETCH_CHAT_DATA_SQL, (chat_id,)).fetchone()
+        data = '{}' if row is None else row[0]
+        with self._lock:
+            self._chat_data.setdefault(chat_id, data)
+        return json.loads(data)
+
+    def _save_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        serialized = json.dumps(data, sort_keys=True)
+        with self._lock:
+            if self._chat_data.get(chat_id) == serialized:
+                PERSISTENCE_SKIPPED.inc()
+                return
+            self._chat_data[chat_id] = serialized
+        with Config.database.get_connection() as db, SQL_SECONDS.time('save_chat_data'):
+            db.execute(SAVE_CHAT_DATA_SQL, (chat_id, serialized, time.time()))
+        PERSISTENCE_WRITES.inc('bot_chat_data')
+
+    def _drop_chat_data(self, chat_id: int) -> None:
+        with self._lock:
+            self._chat_data[chat_id] = '{}'
+        with Config.database.get_connection() as db, SQL_SECONDS.time('drop_chat_data'):
+            db.execute(DELETE_CHAT_DATA_SQL, (chat_id,))
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        return await run_sync(self._load_conversations, name)
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        await run_sync(self._save_conversation, name, key, new_state)
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        # loaded per chat in refresh_chat_data, so startup does not depend on the number of chats
+        return {}
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        if chat_id in self._chat_data:
+            return
+        data = await run_sync(self._load_chat_data, chat_id)
+        if data:
+            chat_data.update(data)
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        await run_sync(self._save_chat_data, chat_id, data)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await run_sync(self._drop_chat_data, chat_id)
+
+    async def get_user_data(self) -> dict[int, dict[Any, Any]]:
+        return {}
+
+    async def update_user_data(self, user_id: int, data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict[Any, Any]) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        pass
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        return {}
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def flush(self) -> None:
+        # every update is written as it is handed over, there is nothing buffered to flush
+        pass
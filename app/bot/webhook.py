@@ -0,0 +1,63 @@
+import asyncio
+import hmac
+import logging
+from typing import Optional
+
+import cherrypy
+from telegram import Update
+from telegram.ext import Application
+
+from app.config import Config
+from app.metrics import registry
+
+WEBHOOK_UPDATES = registry.counter('bot_webhook_updates_total', 'Webhook requests by outcome.', ('outcome',))
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookReceiver:
+    """CherryPy app that validates Telegram webhook calls and feeds the bounded update queue."""
+
+    # Telegram posts to the exact URL it was given, without a trailing slash
+    config = {'/': {'tools.trailing_slash.on': False}}
+
+    def __init__(self, application: Application) -> None:
+        self.application = application
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.accepting = False
+        registry.callback('bot_update_queue_depth', 'Updates waiting in the bot update queue.', (),
+                          lambda: [((), application.update_queue.qsize())])
+
+    async def _enqueue(self, update: Update) -> bool:
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    @cherrypy.expose
+    @cherrypy.tools.allow(methods=['POST'])
+    @cherrypy.tools.json_in()
+    def index(self):
+        token = cherrypy.request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(token.encode(), Config.bot_webhook_secret.encode()):
+            WEBHOOK_UPDATES.inc('forbidden')
+            raise cherrypy.HTTPError(403)
+
+        if not self.accepting or self.loop is None:
+            # Telegram retries non-2xx deliveries, so nothing is lost while we start or drain
+            WEBHOOK_UPDATES.inc('unavailable')
+            raise cherrypy.HTTPError(503)
+
+        update = Update.de_json(cherrypy.request.json, self.application.bot)
+        if update is None:
+            WEBHOOK_UPDATES.inc('empty')
+            return ''
+
+        if not asyncio.run_coroutine_threadsafe(self._enqueue(update), self.loop).result(timeout=5):
+            logger.warning("Update queue is full, rejecting update %d", update.update_id)
+            WEBHOOK_UPDATES.inc('queue_full')
+            raise cherrypy.HTTPError(503)
+
+        WEBHOOK_UPDATES.inc('accepted')
+        return ''
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU map with per-entry expiry.
+
+    The lock is only held for dictionary operations and never across a load or an await,
+    so the cache is safe to share between CherryPy worker threads and the bot event loop.
+    Concurrent get_or_load() misses for one key share a single load.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict[K, tuple[float, V]]()
+        self._loading = dict[K, Future[V]]()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: K, now: float) -> Optional[V]:
+        # the caller holds the lock
+        item = self._data.get(key)
+        if item is None or item[0] <= now:
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def get(self, key: K) -> Optional[V]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            return self._lookup(key, now)
+
+    def _store(self, key: K, value: V) -> None:
+        # the caller holds the lock
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key: K, value: V) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: K, loader: Callable[[], V]) -> V:
+        """The cached value, or the one `loader` returns; a miss while another thread loads `key` waits for it."""
+        if not self.enabled:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is not None:
+                return value
+            loading = self._loading.get(key)
+            if loading is None:
+                future = self._loading[key] = Future[V]()
+        if loading is not None:
+            # the loader's exception is raised here too, so a failing backend is not asked again at once
+            return loading.result()
+
+        try:
+            value = loader()
+        except BaseException as exception:
+            with self._lock:
+                if self._loading.get(key) is future:
+                    del self._loading[key]
+            future.set_exception(exception)
+            raise
+        with self._lock:
+            # pop() or clear() during the load took it out of _loading, the value may predate them
+            if self._loading.get(key) is future:
+                del self._loading[key]
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            item = self._data.pop(key, None)
+            self._loading.pop(key, None)
+        return None if item is None else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._loading.clear()
@@ -1,17 +1,268 @@
+import ipaddress
+import os
+import stat
+import tempfile
+from typing import Any, Callable, Optional, TypeVar
+from urllib.parse import urlparse
+
+from jinja2 import FileSystemBytecodeCache
+from ldap3 import Server
+
+from app.cache import TTLCache
 from app.common.config import Config as CommonConfig
 from app.common.config.utils import getenv, getenv_typed
+from app.db import SQLiteDatabase, database_path
+from app.directory import (DirectoryReader, LDAPConnectionPool,
+                           PooledLDAPDescriptor)
+from app.log import parse_logger_map, setup_queue_logging
+from app.metrics import LDAP_ERRORS, LDAP_SECONDS, InstrumentedProxy, registry
+from app.profiling import route_profiler
+from app.tracing import TracedTemplate, tracer
+
+T = TypeVar('T')
+
+DEFAULT_ASSETS_CACHE_DIR = os.path.join(tempfile.gettempdir(), f'auth-manager-assets-{os.getuid()}')
+
+LDAP_OPERATIONS = ('get_user', 'login', 'set_password', 'normalize_login')
+
+
+def getenv_default(key: str, default: T, cast: Callable[[str], T]) -> T:
+    value = os.getenv(key)
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+
+def private_dir(path: str) -> str:
+    """Creates `path` for this user only, or checks that an existing one is; anything else is refused.
+
+    Cache directories under a shared temp dir could otherwise be planted by another local user.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(f'{path} must be a directory owned by uid {os.getuid()} and not writable by others')
+    return path
+
+
+def parse_budget(value: str) -> tuple[int, float]:
+    capacity, period = value.split('/')
+    return int(capacity), float(period)
+
+
+def parse_bool(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def parse_networks(value: str) -> tuple[ipaddress.IPv4Network | ipaddress.IPv6Network, ...]:
+    return tuple(ipaddress.ip_network(item.strip()) for item in value.split(',') if item.strip())
+
+
+def parse_address(value: str) -> tuple[str, int]:
+    host, port = value.rsplit(':', 1)
+    return host.strip('[]'), int(port)
 
 
 class Config(CommonConfig):
     telegram_bot_token: str
     telegram_bot_url: str
+    telegram_api_url: str
+    telegram_pool_size: int
+    telegram_send_timeout: float
     developer_chat_id: int
     login_supported_domain: list[str]
+    login_supported_domains: frozenset[str]
+    login_normalize_local: bool
+    login_cache: TTLCache[str, str]
+    ldap_cache_ttl: float
+    ldap_cache_size: int
+    ldap_user_cache: TTLCache[str, Any]
+    model_io_workers: int
+    qr_cache: TTLCache[str, bytes]
+    ldap_pool_size: int
+    ldap_pool: Optional[LDAPConnectionPool] = None
+    directory_reader: Optional[DirectoryReader] = None
+    ldap_sync_interval: float
+    ldap_sync_full_interval: float
+    metrics_allowed_ips: frozenset[str]
+    trusted_proxies: tuple[ipaddress.IPv4Network | ipaddress.IPv6Network, ...]
+    session_lifetime: float
+    session_cookie_secure: bool
+    session_cache_size: int
+    session_flush_interval: float
+    session_sweep_interval: float
+    reset_token_ttl: float
+    bind_token_ttl: float
+    token_purge_interval: float
+    profile_ttl: float
+    profile_max_age: float
+    profile_refresh_interval: float
+    profile_refresh_batch: int
+    rate_limit_enabled: bool
+    rate_limit_ip: tuple[int, float]
+    rate_limit_user: tuple[int, float]
+    metrics_port: int
+    bot_mode: str
+    bot_webhook_url: str
+    bot_webhook_path: str
+    bot_webhook_secret: str
+    bot_webhook_listen: tuple[str, int]
+    bot_webhook_embedded: bool
+    bot_update_queue_size: int
+    bot_drain_timeout: float
+    bot_persistence_interval: float
+    bot_state_ttl: float
+    error_report_window: float
+    error_report_budget: tuple[int, float]
+    assets_cache_dir: Optional[str]
+    asgi_listen: tuple[str, int]
+    db_busy_timeout: float
+    db_synchronous: str
+    db_cached_statements: int
+    jinja_cache_dir: Optional[str]
+    log_format: str
+    log_queue_size: int
+    log_sampling: dict[str, float]
+    log_rate_limits: dict[str, tuple[int, float]]
+    admin_token: str
 
     @staticmethod
     def load():
         super(Config, Config).load()
+        Config.db_busy_timeout = getenv_default('DB_BUSY_TIMEOUT', 5.0, float)
+        Config.db_synchronous = getenv_default('DB_SYNCHRONOUS', 'NORMAL', str)
+        Config.db_cached_statements = getenv_default('DB_CACHED_STATEMENTS', 128, int)
+        path = database_path(Config.database)
+        if path:
+            common_database = Config.database
+            Config.database = SQLiteDatabase(path, Config.db_busy_timeout, Config.db_synchronous,
+                                             Config.db_cached_statements)
+            # the common database keeps its connection open, it would otherwise hold the file until exit
+            close = getattr(common_database, 'close', None)
+            if callable(close):
+                close()
+        # compiled templates survive restarts, so controllers' get_template calls skip the compiler; cached
+        # bytecode is executed, so without JINJA_CACHE_DIR Jinja picks its own per-user 0700 directory
+        Config.jinja_cache_dir = getenv_default('JINJA_CACHE_DIR', None, private_dir)
+        Config.jinja_env.bytecode_cache = FileSystemBytecodeCache(Config.jinja_cache_dir)
+        Config.jinja_env.template_class = TracedTemplate
         Config.telegram_bot_token = getenv('TELEGRAM_BOT_TOKEN')
         Config.telegram_bot_url = getenv('TELEGRAM_BOT_URL')
+        Config.telegram_api_url = getenv_default('TELEGRAM_API_URL', 'https://api.telegram.org/bot', str)
+        Config.telegram_pool_size = getenv_default('TELEGRAM_POOL_SIZE', 8, int)
+        # how long a reset request waits for Telegram to accept the code before reporting a failure
+        Config.telegram_send_timeout = getenv_default('TELEGRAM_SEND_TIMEOUT', 10.0, float)
         Config.developer_chat_id = getenv_typed('DEVELOPER_CHAT_ID', int)
         Config.login_supported_domain = getenv_typed('LOGIN_SUPPORTED_DOMAIN', lambda x: x.split(','))
+        Config.login_supported_domains = frozenset(domain.strip().lower() for domain in Config.login_supported_domain)
+        # only when every sAMAccountName is the lower-cased userPrincipalName prefix
+        Config.login_normalize_local = getenv_default('LOGIN_NORMALIZE_LOCAL', False, parse_bool)
+        Config.login_cache = TTLCache(getenv_default('LOGIN_CACHE_SIZE', 4096, int),
+                                      getenv_default('LOGIN_CACHE_TTL', 3600.0, float))
+        Config.ldap_cache_ttl = getenv_default('LDAP_CACHE_TTL', 300.0, float)
+        Config.ldap_cache_size = getenv_default('LDAP_CACHE_SIZE', 1024, int)
+        Config.ldap_user_cache = TTLCache(Config.ldap_cache_size, Config.ldap_cache_ttl)
+        Config.model_io_workers = getenv_default('MODEL_IO_WORKERS', 16, int)
+        Config.qr_cache = TTLCache(getenv_default('QR_CACHE_SIZE', 256, int), getenv_default('QR_CACHE_TTL', 3600.0, float))
+        Config.ldap_pool_size = getenv_default('LDAP_POOL_SIZE', 0, int)
+        if Config.ldap_pool_size > 0:
+            Config.ldap_pool = LDAPConnectionPool(Server(getenv('LDAP_POOL_URL')),
+                                                  getenv('LDAP_POOL_USER'), getenv('LDAP_POOL_PASSWORD'),
+                                                  size=Config.ldap_pool_size,
+                                                  max_idle=getenv_default('LDAP_POOL_MAX_IDLE', 300.0, float))
+            Config.ldap_descriptor = PooledLDAPDescriptor(Config.ldap_pool, getenv('LDAP_POOL_SEARCH_BASE'))
+            Config.directory_reader = DirectoryReader(
+                Config.ldap_pool, getenv('LDAP_POOL_SEARCH_BASE'),
+                page_size=getenv_default('LDAP_SYNC_PAGE_SIZE', 500, int),
+                show_deleted=getenv_default('LDAP_SYNC_SHOW_DELETED', True, parse_bool))
+        # the directory sync needs the pool; 0 leaves it off, a full pass also finds deleted accounts
+        Config.ldap_sync_interval = getenv_default('LDAP_SYNC_INTERVAL', 0.0, float)
+        Config.ldap_sync_full_interval = getenv_default('LDAP_SYNC_FULL_INTERVAL', 86400.0, float)
+        Config.ldap_descriptor = InstrumentedProxy(Config.ldap_descriptor, LDAP_OPERATIONS, LDAP_SECONDS, LDAP_ERRORS)
+        Config.metrics_allowed_ips = getenv_default('METRICS_ALLOWED_IPS', frozenset(['127.0.0.1', '::1']),
+                                                    lambda x: frozenset(x.split(',')))
+        Config.metrics_port = getenv_default('METRICS_PORT', 0, int)
+        # X-Forwarded-For is only believed from these peers; without any, rate limits and the metrics
+        # allowlist see the TCP peer, so the app must then be reached without a proxy in front
+        Config.trusted_proxies = getenv_default('TRUSTED_PROXIES', (), parse_networks)
+        Config.session_lifetime = getenv_default('SESSION_LIFETIME', 3600.0, float)
+        # turn off only to serve plain http to hosts other than localhost, e.g. in a test environment
+        Config.session_cookie_secure = getenv_default('SESSION_COOKIE_SECURE', True, parse_bool)
+        Config.session_cache_size = getenv_default('SESSION_CACHE_SIZE', 4096, int)
+        Config.session_flush_interval = getenv_default('SESSION_FLUSH_INTERVAL', 30.0, float)
+        Config.session_sweep_interval = getenv_default('SESSION_SWEEP_INTERVAL', 300.0, float)
+        Config.reset_token_ttl = getenv_default('RESET_TOKEN_TTL', 900.0, float)
+        Config.bind_token_ttl = getenv_default('BIND_TOKEN_TTL', 3600.0, float)
+        Config.token_purge_interval = getenv_default('TOKEN_PURGE_INTERVAL', 300.0, float)
+        # profiles older than PROFILE_TTL are refreshed in the background, up to PROFILE_MAX_AGE they are still served
+        Config.profile_ttl = getenv_default('PROFILE_TTL', 86400.0, float)
+        Config.profile_max_age = getenv_default('PROFILE_MAX_AGE', 7 * 86400.0, float)
+        Config.profile_refresh_interval = getenv_default('PROFILE_REFRESH_INTERVAL', 300.0, float)
+        Config.profile_refresh_batch = getenv_default('PROFILE_REFRESH_BATCH', 100, int)
+        Config.rate_limit_enabled = getenv_default('RATE_LIMIT_ENABLED', True, parse_bool)
+        Config.rate_limit_ip = getenv_default('RATE_LIMIT_IP', (30, 60.0), parse_budget)
+        Config.rate_limit_user = getenv_default('RATE_LIMIT_USER', (10, 300.0), parse_budget)
+        Config.bot_mode = getenv_default('BOT_MODE', 'polling', str)
+        if Config.bot_mode == 'webhook':
+            Config.bot_webhook_url = getenv('BOT_WEBHOOK_URL')
+            Config.bot_webhook_path = urlparse(Config.bot_webhook_url).path or '/'
+            Config.bot_webhook_secret = getenv('BOT_WEBHOOK_SECRET')
+            Config.bot_webhook_listen = getenv_default('BOT_WEBHOOK_LISTEN', ('127.0.0.1', 8443), parse_address)
+        elif Config.bot_mode != 'polling':
+            raise ValueError(f'BOT_MODE must be polling or webhook, got {Config.bot_mode!r}')
+        Config.bot_webhook_embedded = (Config.bot_mode == 'webhook'
+                                       and getenv_default('BOT_WEBHOOK_EMBEDDED', False, parse_bool))
+        Config.bot_update_queue_size = getenv_default('BOT_UPDATE_QUEUE_SIZE', 1024, int)
+        Config.bot_drain_timeout = getenv_default('BOT_DRAIN_TIMEOUT', 30.0, float)
+        Config.bot_persistence_interval = getenv_default('BOT_PERSISTENCE_INTERVAL', 5.0, float)
+        Config.bot_state_ttl = getenv_default('BOT_STATE_TTL', 86400.0, float)
+        Config.error_report_window = getenv_default('ERROR_REPORT_WINDOW', 300.0, float)
+        Config.error_report_budget = getenv_default('ERROR_REPORT_BUDGET', (10, 300.0), parse_budget)
+        Config.assets_cache_dir = private_dir(getenv_default('ASSETS_CACHE_DIR', DEFAULT_ASSETS_CACHE_DIR, str))
+        Config.asgi_listen = getenv_default('ASGI_LISTEN', ('127.0.0.1', 8080), parse_address)
+        Config.log_format = getenv_default('LOG_FORMAT', 'text', str)
+        if Config.log_format not in ('text', 'json'):
+            raise ValueError(f'LOG_FORMAT must be text or json, got {Config.log_format!r}')
+        Config.log_queue_size = getenv_default('LOG_QUEUE_SIZE', 10_000, int)
+        Config.log_sampling = getenv_default('LOG_SAMPLING', {}, lambda x: {
+            name: float(rate) for name, rate in parse_logger_map(x).items()})
+        Config.log_rate_limits = getenv_default('LOG_RATE_LIMITS', {}, lambda x: {
+            name: parse_budget(budget) for name, budget in parse_logger_map(x).items()})
+        tracer.enabled = getenv_default('TRACE_ENABLED', True, parse_bool)
+        tracer.slow_threshold = getenv_default('TRACE_SLOW_MS', 1000.0, float) / 1000
+        # profiles expose code paths and arguments, so they are only written to a directory this user owns
+        route_profiler.directory = getenv_default('PROFILE_DIR', '', private_dir)
+        # Root.profile answers 404 while this is empty
+        Config.admin_token = getenv_default('ADMIN_TOKEN', '', str)
+        Config.register_metrics()
+
+    @staticmethod
+    def setup_app_logger(filename: str):
+        super(Config, Config).setup_app_logger(filename)
+        # the file handlers set up above are fed from a queue, request threads only enqueue
+        setup_queue_logging(Config.log_queue_size, Config.log_format == 'json', Config.log_sampling,
+                            Config.log_rate_limits)
+
+    @staticmethod
+    def register_metrics():
+        caches = {'ldap_user': Config.ldap_user_cache, 'qr': Config.qr_cache, 'login': Config.login_cache}
+        registry.callback('cache_hits_total', 'In-process cache hits.', ('cache',),
+                          lambda: [((name,), cache.hits) for name, cache in caches.items()], 'counter')
+        registry.callback('cache_misses_total', 'In-process cache misses.', ('cache',),
+                          lambda: [((name,), cache.misses) for name, cache in caches.items()], 'counter')
+        registry.callback('cache_entries', 'In-process cache size.', ('cache',),
+                          lambda: [((name,), len(cache)) for name, cache in caches.items()])
+
+        database = Config.database
+        if isinstance(database, SQLiteDatabase):
+            registry.callback('sqlite_connections', 'Open per-thread SQLite connections.', (),
+                              lambda: [((), len(database))])
+            registry.callback('sqlite_connections_opened_total', 'SQLite connections opened.', (),
+                              lambda: [((), database.opened)], 'counter')
+
+        pool = Config.ldap_pool
+        if pool is not None:
+            registry.callback('ldap_pool_calls_total', 'Pooled LDAP operations.', ('operation',),
+                              lambda: [((name,), value) for name, value in pool.metrics.calls.items()], 'counter')
+            registry.callback('ldap_pool_seconds_total', 'Time spent in pooled LDAP operations.', ('operation',),
+                              lambda: [((name,), value) for name, value in pool.metrics.seconds.items()], 'counter')
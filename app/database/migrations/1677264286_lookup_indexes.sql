@@ -0,0 +1,34 @@
+-- login was never unique, so there may be duplicates to fold away before the unique index.
+-- The oldest row is the one lookups returned and saves updated, so it survives; bindings only a
+-- newer duplicate holds are merged into it, newest first, and the removed rows are kept verbatim
+-- in "users_duplicates" for review.
+CREATE TABLE IF NOT EXISTS "users_duplicates" AS SELECT * FROM "users" WHERE 0;
+
+INSERT INTO "users_duplicates"
+SELECT * FROM "users"
+WHERE "id" NOT IN (SELECT MIN("id") FROM "users" GROUP BY "login");
+
+UPDATE "users" SET
+    "email2" = COALESCE("email2", (
+        SELECT "d"."email2" FROM "users_duplicates" AS "d"
+        WHERE "d"."login" = "users"."login" AND "d"."email2" IS NOT NULL ORDER BY "d"."id" DESC LIMIT 1)),
+    "phone" = COALESCE("phone", (
+        SELECT "d"."phone" FROM "users_duplicates" AS "d"
+        WHERE "d"."login" = "users"."login" AND "d"."phone" IS NOT NULL ORDER BY "d"."id" DESC LIMIT 1)),
+    "telegram" = COALESCE("telegram", (
+        SELECT "d"."telegram" FROM "users_duplicates" AS "d"
+        WHERE "d"."login" = "users"."login" AND "d"."telegram" IS NOT NULL ORDER BY "d"."id" DESC LIMIT 1)),
+    "otp" = COALESCE("otp", (
+        SELECT "d"."otp" FROM "users_duplicates" AS "d"
+        WHERE "d"."login" = "users"."login" AND "d"."otp" IS NOT NULL ORDER BY "d"."id" DESC LIMIT 1)),
+    "bind_dest" = COALESCE(NULLIF("bind_dest", 0), (
+        SELECT "d"."bind_dest" FROM "users_duplicates" AS "d"
+        WHERE "d"."login" = "users"."login" AND "d"."bind_dest" <> 0 ORDER BY "d"."id" DESC LIMIT 1), "bind_dest")
+WHERE "login" IN (SELECT "login" FROM "users_duplicates");
+
+DELETE FROM "users"
+WHERE "id" IN (SELECT "id" FROM "users_duplicates");
+
+CREATE UNIQUE INDEX IF NOT EXISTS "users_login_idx" ON "users" ("login");
+CREATE INDEX IF NOT EXISTS "users_telegram_idx" ON "users" ("telegram");
+CREATE INDEX IF NOT EXISTS "sessions_time_idx" ON "sessions" ("time");
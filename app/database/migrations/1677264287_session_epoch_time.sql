@@ -0,0 +1,7 @@
+-- sessions."time" now holds epoch seconds written by app.web.sessions. Older rows hold the server's
+-- local time as a datetime string; convert them in place so the upgrade logs nobody out, and drop
+-- only rows whose value cannot be read as a date.
+UPDATE "sessions" SET "time" = CAST(strftime('%s', "time", 'utc') AS INTEGER)
+WHERE typeof("time") = 'text' AND strftime('%s', "time", 'utc') IS NOT NULL;
+
+DELETE FROM "sessions" WHERE typeof("time") = 'text';
@@ -0,0 +1,23 @@
+CREATE TABLE IF NOT EXISTS "tokens" (
+    "purpose"  TEXT      NOT NULL,
+    "login"    TEXT      NOT NULL,
+    "token"    TEXT      NOT NULL,
+    "expires"  NUMERIC   NOT NULL,
+    PRIMARY KEY ("purpose", "login")
+);
+
+CREATE INDEX IF NOT EXISTS "tokens_expires_idx" ON "tokens" ("expires");
+
+-- carry pending codes over with a fresh hour to live, then clear the old columns
+INSERT OR REPLACE INTO "tokens" ("purpose", "login", "token", "expires")
+SELECT CASE "bind_dest" WHEN 4 THEN 'otp' ELSE 'telegram' END, "login", "bind_token", strftime('%s', 'now') + 3600
+FROM "users"
+WHERE "bind_token" IS NOT NULL AND "bind_dest" IN (3, 4);
+
+INSERT OR REPLACE INTO "tokens" ("purpose", "login", "token", "expires")
+SELECT 'reset', "login", CAST("reset_token" AS TEXT), strftime('%s', 'now') + 3600
+FROM "users"
+WHERE "reset_token" IS NOT NULL;
+
+UPDATE "users" SET "bind_token" = NULL, "reset_token" = NULL, "bind_dest" = 0
+WHERE "bind_token" IS NOT NULL OR "reset_token" IS NOT NULL OR "bind_dest" <> 0;
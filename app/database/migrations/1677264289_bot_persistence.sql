@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS "bot_conversations" (
+    "name"     TEXT      NOT NULL,
+    "key"      TEXT      NOT NULL,
+    "state"    TEXT      NOT NULL,
+    "updated"  NUMERIC   NOT NULL,
+    PRIMARY KEY ("name", "key")
+);
+
+CREATE TABLE IF NOT EXISTS "bot_chat_data" (
+    "chat_id"  INTEGER   NOT NULL PRIMARY KEY,
+    "data"     TEXT      NOT NULL,
+    "updated"  NUMERIC   NOT NULL
+);
@@ -0,0 +1,4 @@
+ALTER TABLE "users" ADD COLUMN "display_name" TEXT NULL;
+ALTER TABLE "users" ADD COLUMN "refreshed_at" NUMERIC NULL;
+
+CREATE INDEX IF NOT EXISTS "users_refreshed_at_idx" ON "users" ("refreshed_at");
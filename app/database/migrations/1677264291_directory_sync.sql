@@ -0,0 +1,25 @@
+CREATE TABLE IF NOT EXISTS "directory_users" (
+    "guid"          TEXT      NOT NULL PRIMARY KEY,
+    "upn"           TEXT      NULL,
+    "account"       TEXT      NULL,
+    "display_name"  TEXT      NULL,
+    "disabled"      INT       NOT NULL DEFAULT 0,
+    "deleted"       INT       NOT NULL DEFAULT 0,
+    "usn"           INT       NOT NULL,
+    "synced_at"     NUMERIC   NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS "directory_users_upn_idx" ON "directory_users" ("upn");
+
+-- one high-water mark per domain controller, uSNChanged values are not comparable across them
+CREATE TABLE IF NOT EXISTS "directory_sync" (
+    "server"        TEXT      NOT NULL PRIMARY KEY,
+    "usn"           INT       NOT NULL,
+    "full_sync_at"  NUMERIC   NOT NULL,
+    "synced_at"     NUMERIC   NOT NULL
+);
+
+ALTER TABLE "users" ADD COLUMN "ldap_guid" TEXT NULL;
+ALTER TABLE "users" ADD COLUMN "deleted_at" NUMERIC NULL;
+
+CREATE INDEX IF NOT EXISTS "users_ldap_guid_idx" ON "users" ("ldap_guid");
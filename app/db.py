@@ -0,0 +1,114 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence
+
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def database_path(database: Any) -> str:
+    """File behind a database object exposing execute(), as reported by SQLite itself."""
+    for _, name, path in database.execute('PRAGMA database_list').fetchall():
+        if name == 'main':
+            return path or ''
+    return ''
+
+
+class SQLiteDatabase:
+    """Drop-in replacement for Config.database shared by the web and bot processes.
+
+    The file runs in WAL mode, so readers never block the writer, and every thread keeps one
+    connection with its own prepared-statement cache. get_connection() blocks open with BEGIN
+    IMMEDIATE, so a writer that has to wait for the other process does so in the busy handler up
+    front instead of failing with "database is locked" when a read transaction tries to upgrade,
+    and what it reads in the block cannot change before it writes.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, synchronous: str = 'NORMAL',
+                 cached_statements: int = 128) -> None:
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f'synchronous must be one of {", ".join(SYNCHRONOUS_LEVELS)}, got {synchronous!r}')
+
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous.upper()
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = dict[int, tuple[threading.Thread, sqlite3.Connection]]()
+        self.opened = 0
+
+        connection = self._connect()
+        try:
+            mode = connection.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        finally:
+            connection.close()
+        if mode.lower() != 'wal':
+            logger.warning("SQLite database %s stays in %s journal mode", path, mode)
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level='IMMEDIATE',
+                                     check_same_thread=False, cached_statements=self.cached_statements)
+        connection.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}')
+        connection.execute(f'PRAGMA synchronous = {self.synchronous}')
+        return connection
+
+    def _prune(self) -> None:
+        for ident, (thread, connection) in list(self._connections.items()):
+            if not thread.is_alive():
+                del self._connections[ident]
+                connection.close()
+
+    def connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.depth = 0
+            with self._lock:
+                # connections of finished threads are closed here, executor and server pools rarely churn
+                self._prune()
+                self._connections[threading.get_ident()] = (threading.current_thread(), connection)
+                self.opened += 1
+        return connection
+
+    def execute(self, sql: str, parameters: Sequence[Any] = ()) -> sqlite3.Cursor:
+        connection = self.connection()
+        cursor = connection.execute(sql, parameters)
+        # statements outside get_connection() autocommit, like on a throwaway connection
+        if self._local.depth == 0 and connection.in_transaction:
+            connection.commit()
+        return cursor
+
+    @contextmanager
+    def get_connection(self) -> Iterator[sqlite3.Connection]:
+        """The thread's connection inside a transaction; nested blocks join the outermost one."""
+        connection = self.connection()
+        self._local.depth += 1
+        try:
+            if self._local.depth > 1:
+                yield connection
+                return
+            # the span covers waiting for the write lock and the commit, the statements are spans of their own
+            with span('sql.transaction'), connection:
+                # sqlite3 would only begin before the first write, leaving earlier reads outside the transaction
+                if not connection.in_transaction:
+                    connection.execute('BEGIN IMMEDIATE')
+                yield connection
+        finally:
+            self._local.depth -= 1
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for _, connection in connections.values():
+            connection.close()
+        self._local = threading.local()
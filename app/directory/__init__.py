@@ -0,0 +1,6 @@
+from .descriptor import LDAPUser, PooledLDAPDescriptor
+from .pool import LDAPConnectionPool, LDAPMetrics
+from .sync import DirectoryEntry, DirectoryReader
+
+__all__ = ['DirectoryEntry', 'DirectoryReader', 'LDAPConnectionPool', 'LDAPMetrics', 'LDAPUser',
+           'PooledLDAPDescriptor']
@@ -0,0 +1,105 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from ldap3 import SUBTREE, Connection, Server
+from ldap3.core.exceptions import LDAPException as LDAP3Exception
+from ldap3.utils.conv import escape_filter_chars
+
+from app.common.ldap import LDAPException
+
+from .pool import LDAPConnectionPool
+
+logger = logging.getLogger(__name__)
+
+USER_ATTRIBUTES = ['userPrincipalName', 'displayName', 'sAMAccountName']
+
+
+@dataclass
+class LDAPUser:
+    distinguished_name: str
+    user_principal_name: str
+    display_name: str
+    sam_account_name: str
+
+
+class PooledLDAPDescriptor:
+    """Drop-in replacement for Config.ldap_descriptor backed by LDAPConnectionPool.
+
+    Searches and password changes reuse the pool's service-account connections,
+    while user logins bind on their own short-lived connection.
+    """
+
+    def __init__(self, pool: LDAPConnectionPool, search_base: str) -> None:
+        self.pool = pool
+        self.search_base = search_base
+
+    @property
+    def server(self) -> Server:
+        return self.pool.server
+
+    def _search_user(self, connection: Connection, login: str) -> Optional[LDAPUser]:
+        login = escape_filter_chars(login)
+        account = login.split('@')[0]
+        connection.search(self.search_base,
+                          f'(&(objectClass=user)(|(userPrincipalName={login})(sAMAccountName={account})))',
+                          search_scope=SUBTREE, attributes=USER_ATTRIBUTES)
+        if len(connection.entries) == 0:
+            return None
+
+        entry = connection.entries[0]
+        return LDAPUser(distinguished_name=entry.entry_dn,
+                        user_principal_name=str(entry.userPrincipalName),
+                        display_name=str(entry.displayName),
+                        sam_account_name=str(entry.sAMAccountName))
+
+    def find_user(self, login: str) -> Optional[LDAPUser]:
+        try:
+            return self.pool.run('search', self._search_user, login)
+        except LDAP3Exception as exception:
+            raise LDAPException(f'Search for {login} failed: {exception}') from exception
+
+    def get_user(self, login: str) -> LDAPUser:
+        user = self.find_user(login)
+        if user is None:
+            raise LDAPException(f'User {login} not found')
+        return user
+
+    def normalize_login(self, login: str) -> str:
+        user = self.find_user(login)
+        return login.lower() if user is None else user.sam_account_name.lower()
+
+    def login(self, username: str, password: str) -> bool:
+        if not password:
+            return False
+
+        user = self.find_user(username)
+        if user is None:
+            return False
+
+        start = time.perf_counter()
+        connection = Connection(self.server, user.distinguished_name, password,
+                                client_strategy=self.pool.client_strategy)
+        try:
+            return bool(connection.bind())
+        except LDAP3Exception as exception:
+            logger.error("LDAP bind for %s failed: %s", username, exception)
+            return False
+        finally:
+            connection.unbind()
+            self.pool.metrics.record('login', time.perf_counter() - start)
+
+    def _set_password(self, connection: Connection, distinguished_name: str, password: str) -> bool:
+        return bool(connection.extend.microsoft.modify_password(distinguished_name, password))
+
+    def set_password(self, username: str, password: str) -> bool:
+        user = self.find_user(username)
+        if user is None:
+            return False
+
+        try:
+            return self.pool.run('set_password', self._set_password, user.distinguished_name, password)
+        except LDAP3Exception as exception:
+            logger.error("LDAP set_password for %s failed: %s", username, exception)
+            return False
@@ -0,0 +1,130 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal, Optional
+
+from ldap3 import SYNC, Connection, Server
+from ldap3.core.exceptions import (LDAPCommunicationError,
+                                   LDAPSessionTerminatedByServerError)
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (LDAPCommunicationError, LDAPSessionTerminatedByServerError)
+
+ClientStrategy = Literal['SYNC', 'SAFE_SYNC', 'RESTARTABLE', 'SAFE_RESTARTABLE', 'MOCK_SYNC']
+
+
+class LDAPMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = dict[str, int]()
+        self.errors = dict[str, int]()
+        self.seconds = dict[str, float]()
+
+    def record(self, operation: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            self.seconds[operation] = self.seconds.get(operation, 0.0) + seconds
+            if failed:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    @contextmanager
+    def measure(self, operation: str) -> Iterator[None]:
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.record(operation, time.perf_counter() - start, failed)
+
+
+class LDAPConnectionPool:
+    """Reusable service-account connections, used for searches and password changes only."""
+
+    def __init__(self, server: Server, user: str, password: str, size: int = 4,
+                 max_idle: float = 300.0, acquire_timeout: float = 10.0, client_strategy: ClientStrategy = SYNC) -> None:
+        self.server = server
+        self.user = user
+        self.password = password
+        self.size = size
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self.client_strategy = client_strategy
+        self.metrics = LDAPMetrics()
+        self._idle = queue.LifoQueue[tuple[Connection, float]]()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self) -> Connection:
+        with self.metrics.measure('bind'):
+            connection = Connection(self.server, self.user, self.password,
+                                    client_strategy=self.client_strategy, raise_exceptions=True)
+            connection.bind()
+            return connection
+
+    def _checkout(self) -> Connection:
+        now = time.monotonic()
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if now - last_used > self.max_idle or connection.closed or not connection.bound:
+                logger.debug("Recycling idle LDAP connection")
+                self._discard(connection)
+                continue
+            return connection
+
+    @staticmethod
+    def _discard(connection: Connection) -> None:
+        try:
+            connection.unbind()
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        if self._closed:
+            raise RuntimeError('LDAP pool is closed')
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError('Timed out waiting for a free LDAP connection')
+
+        connection: Optional[Connection] = None
+        try:
+            connection = self._checkout()
+            yield connection
+        except CONNECTION_ERRORS:
+            logger.warning("Dropping broken LDAP connection")
+            if connection is not None:
+                self._discard(connection)
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put((connection, time.monotonic()))
+            self._slots.release()
+
+    def run(self, operation: str, func, *args, **kwargs):
+        """Call func(connection, ...) on a pooled connection, reconnecting once if it turns out to be dead."""
+        for attempt in (1, 2):
+            try:
+                with self.metrics.measure(operation), self.connection() as connection:
+                    return func(connection, *args, **kwargs)
+            except CONNECTION_ERRORS as exception:
+                if attempt == 2:
+                    raise
+                logger.warning("LDAP %s failed (%s), reconnecting", operation, exception)
+        raise AssertionError('unreachable')
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
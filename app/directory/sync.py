@@ -0,0 +1,107 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from ldap3 import BASE, SUBTREE, Connection
+from ldap3.core.exceptions import LDAPException as LDAP3Exception
+from ldap3.protocol.microsoft import show_deleted_control
+
+from .pool import CONNECTION_ERRORS, LDAPConnectionPool
+
+logger = logging.getLogger(__name__)
+
+SYNC_ATTRIBUTES = ['objectGUID', 'userPrincipalName', 'displayName', 'sAMAccountName', 'userAccountControl',
+                   'uSNChanged', 'isDeleted']
+PAGED_RESULTS_OID = '1.2.840.113556.1.4.319'
+ACCOUNT_DISABLED = 0x2
+
+
+@dataclass(slots=True)
+class DirectoryEntry:
+    guid: str
+    user_principal_name: Optional[str]
+    display_name: Optional[str]
+    sam_account_name: Optional[str]
+    usn: int
+    disabled: bool
+    deleted: bool
+
+
+def _guid(value: Any) -> str:
+    if isinstance(value, bytes):
+        return str(uuid.UUID(bytes_le=value))
+    return str(value).strip('{}').lower()
+
+
+def _entry(entry: Any) -> DirectoryEntry:
+    control = entry['userAccountControl'].value
+    return DirectoryEntry(guid=_guid(entry['objectGUID'].value),
+                          user_principal_name=entry['userPrincipalName'].value,
+                          display_name=entry['displayName'].value,
+                          sam_account_name=entry['sAMAccountName'].value,
+                          usn=int(entry['uSNChanged'].value),
+                          disabled=control is not None and bool(int(control) & ACCOUNT_DISABLED),
+                          deleted=bool(entry['isDeleted'].value))
+
+
+class DirectoryReader:
+    """Pages through the user objects of a directory, optionally only those changed in a uSNChanged range.
+
+    uSNChanged counters are per domain controller, so a high-water mark is only meaningful against
+    the server it was read from; ``server_name`` identifies it. With ``show_deleted`` tombstones of
+    deleted accounts are returned too (Active Directory's show-deleted control); without it
+    deletions only show up as entries missing from a full pass.
+    """
+
+    def __init__(self, pool: LDAPConnectionPool, search_base: str, page_size: int = 500,
+                 show_deleted: bool = True) -> None:
+        self.pool = pool
+        self.search_base = search_base
+        self.page_size = page_size
+        self.show_deleted = show_deleted
+
+    @property
+    def server_name(self) -> str:
+        return f'{self.pool.server.host}:{self.pool.server.port}'
+
+    @staticmethod
+    def _highest_usn(connection: Connection) -> Optional[int]:
+        try:
+            connection.search('', '(objectClass=*)', BASE, attributes=['highestCommittedUSN'])
+        except CONNECTION_ERRORS:
+            # the pool drops the connection and retries; a dead server is not a server without the attribute
+            raise
+        except LDAP3Exception as exception:
+            logger.debug("Reading highestCommittedUSN failed: %s", exception)
+            return None
+        if len(connection.entries) == 0 or connection.entries[0]['highestCommittedUSN'].value is None:
+            return None
+        return int(connection.entries[0]['highestCommittedUSN'].value)
+
+    def highest_usn(self) -> Optional[int]:
+        """The server's highestCommittedUSN from the root DSE, None where the server does not publish it."""
+        return self.pool.run('sync_usn', self._highest_usn)
+
+    def pages(self, since: Optional[int] = None, until: Optional[int] = None) -> Iterator[list[DirectoryEntry]]:
+        """Entries with since < uSNChanged <= until, a page at a time; all of them when both are None.
+
+        A paged search has to stay on one connection, so a pool slot is held until the last page.
+        """
+        search_filter = '(objectClass=user)'
+        if since is not None:
+            search_filter += f'(uSNChanged>={since + 1})'
+        if until is not None:
+            search_filter += f'(uSNChanged<={until})'
+        controls = [show_deleted_control(criticality=False)] if self.show_deleted else None
+
+        with self.pool.connection() as connection:
+            cookie = None
+            while True:
+                with self.pool.metrics.measure('sync_page'):
+                    connection.search(self.search_base, f'(&{search_filter})', SUBTREE, attributes=SYNC_ATTRIBUTES,
+                                      paged_size=self.page_size, paged_cookie=cookie, controls=controls)
+                yield [_entry(entry) for entry in connection.entries]
+                cookie = connection.result.get('controls', {}).get(PAGED_RESULTS_OID, {}).get('value', {}).get('cookie')
+                if not cookie:
+                    return
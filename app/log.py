@@ -0,0 +1,174 @@
+"""Queue-based logging set up behind ``Config.setup_app_logger``.
+
+The handlers installed on the root logger move behind a QueueListener thread, so request
+threads and the bot's event loop only enqueue records. Records are rendered on that thread too,
+unless their arguments could change before it gets to them. Filters on the queue handler drop
+sampled-out or over-rate records from chatty loggers before anything is copied.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from typing import Any, Optional
+
+from app.metrics import registry
+
+LOG_DROPPED = registry.counter('log_records_dropped_total', 'Log records not written, by reason.', ('reason',))
+
+# attributes every LogRecord has; anything else came in through `extra`
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'taskName'}
+IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+def parse_logger_map(value: str) -> dict[str, str]:
+    """``app.models.user=0.1,app.bot=0.5`` -> {'app.models.user': '0.1', 'app.bot': '0.5'}"""
+    return dict(item.strip().rsplit('=', 1) for item in value.split(',') if item.strip())
+
+
+def _match(name: str, prefixes: dict[str, Any]) -> Optional[str]:
+    # the longest configured prefix wins, like logger hierarchy levels
+    while True:
+        if name in prefixes:
+            return name
+        if '.' not in name:
+            return None
+        name = name.rsplit('.', 1)[0]
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING from the configured loggers and their children."""
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = _match(record.name, self.rates)
+        if prefix is None or random.random() < self.rates[prefix]:
+            return True
+        LOG_DROPPED.inc('sampled')
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """At most `capacity` records below WARNING per `period` seconds for each configured logger prefix."""
+
+    def __init__(self, caps: dict[str, tuple[int, float]]) -> None:
+        super().__init__()
+        self.caps = caps
+        self._buckets = {prefix: [float(capacity), time.monotonic()] for prefix, (capacity, _) in caps.items()}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = _match(record.name, self.caps)
+        if prefix is None:
+            return True
+
+        capacity, period = self.caps[prefix]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets[prefix]
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * capacity / period)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+        LOG_DROPPED.inc('rate_limited')
+        return False
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line. Fields passed through `extra` are included; callables among them
+    are only called here, so they cost nothing for records that are filtered out."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                data[key] = value() if callable(value) else value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves the formatting to the listener thread.
+
+    The stock handler renders the message and the traceback before enqueueing. Here a record
+    whose arguments are all immutable goes into the queue as it is; only records with mutable
+    arguments (a model, a dict) are rendered on the calling thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc('queue_full')
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_queue_logging(queue_size: int = 10_000, json_format: bool = False,
+                        sampling: Optional[dict[str, float]] = None,
+                        rate_limits: Optional[dict[str, tuple[int, float]]] = None) -> None:
+    """Moves the root logger's handlers behind a QueueListener thread."""
+    global _listener  # pylint: disable=global-statement
+
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    if _listener is not None:
+        _listener.stop()
+        handlers = list(_listener.handlers)
+    if json_format:
+        for handler in handlers:
+            handler.setFormatter(JSONFormatter())
+
+    records = queue.Queue[logging.LogRecord](queue_size)
+    queue_handler = LazyQueueHandler(records)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+    if rate_limits:
+        queue_handler.addFilter(RateLimitFilter(rate_limits))
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_queue_logging)
+    registry.callback('log_queue_size', 'Log records waiting for the listener thread.', (),
+                      lambda: [((), records.qsize())])
+
+
+def stop_queue_logging() -> None:
+    """Writes out what is queued and stops the listener thread."""
+    global _listener  # pylint: disable=global-statement
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,250 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from app.tracing import span
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values = dict[LabelValues, float]()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in items]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, span_name: Optional[str] = None) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # when set, time() also records a span named after it and the label values
+        self.span_name = span_name
+        # per label set: [count per bucket..., +Inf count, sum]
+        self._values = dict[LabelValues, list[float]]()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            if self.span_name is None:
+                yield
+            else:
+                with span('.'.join((self.span_name, *labels))):
+                    yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+
+        lines = []
+        for labels, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {int(cumulative)}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {state[-1]!r}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {int(cumulative)}')
+        return lines
+
+
+class Callback(Metric):
+    """Gauge or counter whose samples are read from the owning object at scrape time."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[tuple[LabelValues, float]]], metric_type: str = 'gauge') -> None:
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        try:
+            samples = list(self.collect())
+        except Exception:  # pylint: disable=broad-exception-caught
+            return []
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in samples]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics = dict[str, Metric]()
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Any:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS, span_name: Optional[str] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets, span_name))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[tuple[LabelValues, float]]], metric_type: str = 'gauge') -> Callback:
+        return self.register(Callback(name, documentation, labelnames, collect, metric_type))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter('http_requests_total', 'HTTP requests by handler and status.', ('handler', 'status'))
+HTTP_SECONDS = registry.histogram('http_request_duration_seconds', 'HTTP handler latency.', ('handler',))
+LDAP_SECONDS = registry.histogram('ldap_call_duration_seconds', 'Config.ldap_descriptor call latency.',
+                                  ('operation',), span_name='ldap')
+LDAP_ERRORS = registry.counter('ldap_call_errors_total', 'Config.ldap_descriptor calls that raised.', ('operation',))
+SQL_SECONDS = registry.histogram('sqlite_statement_duration_seconds', 'SQLite statement latency.', ('statement',),
+                                 span_name='sql')
+TELEGRAM_SECONDS = registry.histogram('telegram_send_duration_seconds', 'Outbound Telegram message latency.',
+                                      span_name='telegram.send')
+TELEGRAM_ERRORS = registry.counter('telegram_send_errors_total', 'Outbound Telegram messages that failed.')
+BOT_SECONDS = registry.histogram('bot_handler_duration_seconds', 'Bot update handler latency.', ('handler',))
+
+
+class InstrumentedProxy:
+    """Wraps an object so the listed methods are timed into a histogram labelled by method name."""
+
+    def __init__(self, target: Any, methods: Iterable[str], histogram: Histogram,
+                 errors: Optional[Counter] = None) -> None:
+        self._target = target
+        self._methods = frozenset(methods)
+        self._histogram = histogram
+        self._errors = errors
+
+    @property
+    def target(self) -> Any:
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._target, name)
+        if name not in self._methods:
+            return attribute
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            try:
+                with self._histogram.time(name):
+                    return attribute(*args, **kwargs)
+            except Exception:
+                if self._errors is not None:
+                    self._errors.inc(name)
+                raise
+
+        return timed
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    server: 'MetricsServer'
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path.split('?', 1)[0] != '/metrics' or self.client_address[0] not in self.server.allowed_ips:
+            self.send_error(404)
+            return
+
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Standalone /metrics listener for processes without a web server, i.e. the bot."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int, allowed_ips: frozenset[str]) -> None:
+        super().__init__(('', port), _MetricsRequestHandler)
+        self.allowed_ips = allowed_ips
+
+    def start(self) -> 'MetricsServer':
+        threading.Thread(target=self.serve_forever, name='metrics', daemon=True).start()
+        return self
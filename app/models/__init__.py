@@ -1,3 +1,7 @@
+from .directory_sync import DirectorySync, directory_sync
+from .profiles import ProfileRefresher, profile_refresher
+from .tokens import TokenPurpose, TokenStore, token_store
 from .user import User, UserBindDestination
 
-__all__ = ['User', 'UserBindDestination']
+__all__ = ['DirectorySync', 'ProfileRefresher', 'TokenPurpose', 'TokenStore', 'User', 'UserBindDestination',
+           'directory_sync', 'profile_refresher', 'token_store']
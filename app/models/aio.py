@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.config import Config
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+
+class ModelExecutor:
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get() -> ThreadPoolExecutor:
+        with ModelExecutor._lock:
+            if ModelExecutor._executor is None:
+                logger.info("Starting model I/O executor with %d workers", Config.model_io_workers)
+                ModelExecutor._executor = ThreadPoolExecutor(max_workers=Config.model_io_workers,
+                                                             thread_name_prefix='model-io')
+            return ModelExecutor._executor
+
+    @staticmethod
+    def shutdown() -> None:
+        with ModelExecutor._lock:
+            if ModelExecutor._executor is not None:
+                ModelExecutor._executor.shutdown(wait=True)
+                ModelExecutor._executor = None
+
+
+async def run_sync(func: Callable[..., T], *args: Any) -> T:
+    # copy the context so context variables set by the caller follow the call into the worker thread
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(ModelExecutor.get(), functools.partial(context.run, func, *args))
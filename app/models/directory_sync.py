@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.config import Config
+from app.directory import DirectoryEntry
+from app.metrics import SQL_SECONDS, registry
+
+FETCH_STATE_SQL = 'SELECT "usn", "full_sync_at" FROM "directory_sync" WHERE "server" = ?'
+SAVE_STATE_SQL = '''
+    INSERT INTO "directory_sync" ("server", "usn", "full_sync_at", "synced_at")
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT ("server") DO UPDATE SET
+        "usn" = excluded."usn", "full_sync_at" = excluded."full_sync_at", "synced_at" = excluded."synced_at"
+'''
+# tombstones lose most attributes, so a missing value keeps the one seen before
+UPSERT_SQL = '''
+    INSERT INTO "directory_users" ("guid", "upn", "account", "display_name", "disabled", "deleted", "usn", "synced_at")
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT ("guid") DO UPDATE SET
+        "upn" = COALESCE(excluded."upn", "upn"),
+        "account" = COALESCE(excluded."account", "account"),
+        "display_name" = COALESCE(excluded."display_name", "display_name"),
+        "disabled" = excluded."disabled",
+        "deleted" = excluded."deleted",
+        "usn" = excluded."usn",
+        "synced_at" = excluded."synced_at"
+'''
+PROFILE_SQL = '''
+    UPDATE "users" SET
+        "display_name" = COALESCE(?, "display_name"),
+        "refreshed_at" = ?,
+        "deleted_at" = CASE WHEN ? THEN COALESCE("deleted_at", ?) END
+    WHERE "ldap_guid" = ?
+'''
+# a rename onto a login that already has its own row is left for an administrator
+RENAME_SQL = 'UPDATE OR IGNORE "users" SET "login" = ? WHERE "ldap_guid" = ? AND "login" <> ?'
+LINK_SQL = '''
+    UPDATE "users" SET "ldap_guid" = (
+        SELECT "guid" FROM "directory_users" WHERE "upn" = "users"."login" AND "deleted" = 0
+    )
+    WHERE "ldap_guid" IS NULL AND "login" IN (SELECT "upn" FROM "directory_users" WHERE "deleted" = 0)
+'''
+MISSING_SQL = 'UPDATE "directory_users" SET "deleted" = 1, "synced_at" = ? WHERE "deleted" = 0 AND "synced_at" < ?'
+MARK_DELETED_SQL = '''
+    UPDATE "users" SET "deleted_at" = ?
+    WHERE "deleted_at" IS NULL AND "ldap_guid" IN (SELECT "guid" FROM "directory_users" WHERE "deleted" = 1)
+'''
+
+logger = logging.getLogger(__name__)
+
+SYNC_ENTRIES = registry.counter('ldap_sync_entries_total', 'Directory entries written by the sync, by pass.',
+                                ('pass',))
+SYNC_SECONDS = registry.histogram('ldap_sync_seconds', 'Duration of completed directory sync passes.', ('pass',),
+                                  (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+
+
+class DirectorySync:
+    """Mirrors the directory's user objects into directory_users and the profiles of linked users.
+
+    The first pass, and one every LDAP_SYNC_FULL_INTERVAL after it, reads every user object; entries
+    it did not see are marked deleted. The passes in between ask only for objects whose uSNChanged
+    is above the high-water mark of the previous pass. Each page is written in one transaction; the
+    mark only moves once a pass completes, so an interrupted pass is repeated, not skipped.
+    """
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.usn: Optional[int] = None
+        self.last_sync: Optional[float] = None
+        self.failed = 0
+
+    def _write(self, entries: list[DirectoryEntry], now: float) -> None:
+        with Config.database.get_connection() as db, SQL_SECONDS.time('sync_directory_page'):
+            db.executemany(UPSERT_SQL, [
+                (entry.guid, entry.user_principal_name, entry.sam_account_name, entry.display_name,
+                 entry.disabled, entry.deleted, entry.usn, now) for entry in entries])
+            db.executemany(PROFILE_SQL, [
+                (entry.display_name, now, entry.deleted, now, entry.guid) for entry in entries])
+            db.executemany(RENAME_SQL, [
+                (entry.user_principal_name, entry.guid, entry.user_principal_name)
+                for entry in entries if entry.user_principal_name is not None and not entry.deleted])
+
+    def sync(self, full: Optional[bool] = None) -> int:
+        """Runs one pass, full when `full` or when one is due; returns the number of entries written."""
+        reader = Config.directory_reader
+        assert reader is not None
+        start = time.time()
+        with SQL_SECONDS.time('fetch_sync_state'):
+            state = Config.database.execute(FETCH_STATE_SQL, (reader.server_name,)).fetchone()
+        if full is None:
+            full = state is None or float(state[1]) < start - Config.ldap_sync_full_interval
+        kind = 'full' if full else 'incremental'
+
+        # the upper bound keeps changes made during the pass for the next one; without it the highest
+        # uSNChanged seen becomes the mark, and an object changed twice during the pass can be missed.
+        # A full pass reads without it, since an object it leaves out is marked deleted; whatever it
+        # reads past the mark is read again by the next pass.
+        until = reader.highest_usn()
+        since = None if full or state is None else int(state[0])
+        highest = since or 0
+        count = 0
+        for entries in reader.pages(since, None if full else until):
+            if self._stop.is_set():
+                logger.info("Directory sync interrupted after %d entries", count)
+                return count
+            self._write(entries, start)
+            count += len(entries)
+            highest = max([highest, *(entry.usn for entry in entries)])
+            SYNC_ENTRIES.inc(kind, amount=len(entries))
+
+        with Config.database.get_connection() as db, SQL_SECONDS.time('finish_directory_sync'):
+            if full:
+                missing = db.execute(MISSING_SQL, (start, start)).rowcount
+                if missing > 0:
+                    logger.info("Directory sync marked %d missing entries deleted", missing)
+            db.execute(MARK_DELETED_SQL, (start,))
+            db.execute(LINK_SQL)
+            full_sync_at = start if full or state is None else float(state[1])
+            self.usn = until if until is not None else highest
+            db.execute(SAVE_STATE_SQL, (reader.server_name, self.usn, full_sync_at, start))
+
+        self.last_sync = start
+        SYNC_SECONDS.observe(time.time() - start, kind)
+        logger.info("Directory sync (%s) wrote %d entries, high-water mark %d", kind, count, self.usn)
+        return count
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self.failed += 1
+                logger.exception("Directory sync failed")
+            if self._stop.wait(Config.ldap_sync_interval):
+                return
+
+    def start(self) -> None:
+        if self._thread is not None or Config.ldap_sync_interval <= 0:
+            return
+        if Config.directory_reader is None:
+            logger.warning("LDAP_SYNC_INTERVAL is set but the LDAP pool is not, not starting the directory sync")
+            return
+        logger.info("Starting directory sync thread")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='directory-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+directory_sync = DirectorySync()
+
+registry.callback('ldap_sync_lag_seconds', 'Seconds since the start of the last completed directory sync pass.', (),
+                  lambda: [] if directory_sync.last_sync is None else [((), time.time() - directory_sync.last_sync)])
+registry.callback('ldap_sync_usn', 'uSNChanged high-water mark of the directory sync.', (),
+                  lambda: [] if directory_sync.usn is None else [((), directory_sync.usn)])
+registry.callback('ldap_sync_errors_total', 'Directory sync passes that failed.', (),
+                  lambda: [((), directory_sync.failed)], 'counter')
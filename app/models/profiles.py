@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.common.ldap import LDAPException
+from app.config import Config
+from app.metrics import SQL_SECONDS, registry
+
+from .user import PROFILE_SQL
+
+STALE_SQL = '''
+    SELECT "id", "login"
+    FROM "users"
+    WHERE "id" > ? AND ("refreshed_at" IS NULL OR "refreshed_at" < ?) AND "deleted_at" IS NULL
+    ORDER BY "id"
+    LIMIT ?
+'''
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileRefresher:
+    """Keeps the display_name column of users fresh, one batch of stale rows per tick.
+
+    Rows are walked in id order from where the previous batch stopped, so accounts the directory
+    keeps failing on are retried on the next pass instead of blocking the ones behind them.
+    """
+
+    def __init__(self) -> None:
+        self._cursor = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshed = 0
+        self.failed = 0
+
+    def refresh(self) -> int:
+        """Refreshes one batch of stale profiles; returns how many rows were updated."""
+        cutoff = time.time() - Config.profile_ttl
+        with SQL_SECONDS.time('fetch_stale_profiles'):
+            rows = Config.database.execute(STALE_SQL, (self._cursor, cutoff, Config.profile_refresh_batch)).fetchall()
+        self._cursor = rows[-1][0] if len(rows) == Config.profile_refresh_batch else 0
+
+        updates = []
+        for user_id, login in rows:
+            try:
+                ldap_user = Config.ldap_descriptor.get_user(login)
+            except LDAPException as exception:
+                self.failed += 1
+                logger.warning("Profile refresh of %s failed: %s", login, exception)
+                continue
+            Config.ldap_user_cache.set(login.lower(), ldap_user)
+            updates.append((ldap_user.display_name, time.time(), user_id))
+
+        if updates:
+            with Config.database.get_connection() as db, SQL_SECONDS.time('update_profile'):
+                db.executemany(PROFILE_SQL, updates)
+            self.refreshed += len(updates)
+            logger.info("Refreshed %d of %d stale profiles", len(updates), len(rows))
+        return len(updates)
+
+    def _run(self) -> None:
+        while not self._stop.wait(Config.profile_refresh_interval):
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Profile refresh failed")
+
+    def start(self) -> None:
+        if self._thread is not None or Config.profile_refresh_interval <= 0:
+            return
+        logger.info("Starting profile refresh thread")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiles', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+profile_refresher = ProfileRefresher()
+
+registry.callback('profiles_refreshed_total', 'User profiles refreshed from the directory in the background.', (),
+                  lambda: [((), profile_refresher.refreshed)], 'counter')
+registry.callback('profile_refresh_errors_total', 'Background profile refreshes the directory failed.', (),
+                  lambda: [((), profile_refresher.failed)], 'counter')
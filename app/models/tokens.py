@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Optional
+
+from app.config import Config
+from app.metrics import SQL_SECONDS, registry
+
+from .aio import run_sync
+
+ISSUE_SQL = 'INSERT OR REPLACE INTO "tokens" ("purpose", "login", "token", "expires") VALUES (?, ?, ?, ?)'
+FETCH_SQL = 'SELECT "token" FROM "tokens" WHERE "purpose" = ? AND "login" = ? AND "expires" > ?'
+CONSUME_SQL = 'DELETE FROM "tokens" WHERE "purpose" = ? AND "login" = ? AND "token" = ? AND "expires" > ?'
+DISCARD_SQL = 'DELETE FROM "tokens" WHERE "purpose" = ? AND "login" = ?'
+PURGE_SQL = 'DELETE FROM "tokens" WHERE "expires" <= ?'
+
+logger = logging.getLogger(__name__)
+
+TOKENS_CONSUMED = registry.counter('tokens_consumed_total', 'Token checks by purpose and outcome.',
+                                   ('purpose', 'outcome'))
+
+
+class TokenPurpose(Enum):
+    RESET = 'reset'
+    TELEGRAM = 'telegram'
+    OTP = 'otp'
+
+
+def token_ttl(purpose: TokenPurpose) -> float:
+    return Config.reset_token_ttl if purpose == TokenPurpose.RESET else Config.bind_token_ttl
+
+
+class TokenStore:
+    """Single-use codes with an expiry, kept in the tokens table.
+
+    The web and bot processes share the table and either may replace or consume a token, so every
+    read goes to it; a check always ends in the DELETE that consumes the token, and whichever caller
+    removes the row wins. Expired rows are purged in bulk by a background thread.
+    """
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.purged = 0
+
+    def issue(self, purpose: TokenPurpose, login: str, token: str) -> str:
+        """Stores `token` for `login`, replacing any earlier one of the same purpose."""
+        expires = time.time() + token_ttl(purpose)
+        with Config.database.get_connection() as db, SQL_SECONDS.time('issue_token'):
+            db.execute(ISSUE_SQL, (purpose.value, login, token, expires))
+        return token
+
+    def peek(self, purpose: TokenPurpose, login: str) -> Optional[str]:
+        """The live token of `login` without consuming it."""
+        with SQL_SECONDS.time('fetch_token'):
+            data = Config.database.execute(FETCH_SQL, (purpose.value, login, time.time())).fetchone()
+        return None if data is None else data[0]
+
+    def consume(self, purpose: TokenPurpose, login: str, token: str) -> bool:
+        """Removes the token when it matches and has not expired; true only for the first caller."""
+        with Config.database.get_connection() as db, SQL_SECONDS.time('consume_token'):
+            consumed = db.execute(CONSUME_SQL, (purpose.value, login, token, time.time())).rowcount == 1
+        TOKENS_CONSUMED.inc(purpose.value, 'ok' if consumed else 'rejected')
+        return consumed
+
+    def discard(self, purpose: TokenPurpose, login: str) -> None:
+        with Config.database.get_connection() as db, SQL_SECONDS.time('discard_token'):
+            db.execute(DISCARD_SQL, (purpose.value, login))
+
+    async def issue_async(self, purpose: TokenPurpose, login: str, token: str) -> str:
+        return await run_sync(self.issue, purpose, login, token)
+
+    async def peek_async(self, purpose: TokenPurpose, login: str) -> Optional[str]:
+        return await run_sync(self.peek, purpose, login)
+
+    async def consume_async(self, purpose: TokenPurpose, login: str, token: str) -> bool:
+        return await run_sync(self.consume, purpose, login, token)
+
+    async def discard_async(self, purpose: TokenPurpose, login: str) -> None:
+        await run_sync(self.discard, purpose, login)
+
+    def purge(self) -> None:
+        now = time.time()
+        with Config.database.get_connection() as db, SQL_SECONDS.time('purge_tokens'):
+            count = db.execute(PURGE_SQL, (now,)).rowcount
+        if count > 0:
+            self.purged += count
+            logger.info("Purged %d expired tokens", count)
+
+    def _run(self) -> None:
+        while not self._stop.wait(Config.token_purge_interval):
+            try:
+                self.purge()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Token purge failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        logger.info("Starting token purge thread")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tokens', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+token_store = TokenStore()
+
+registry.callback('tokens_purged_total', 'Expired token rows removed by the purge thread.', (),
+                  lambda: [((), token_store.purged)], 'counter')
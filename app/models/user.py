@@ -1,43 +1,51 @@
 from __future__ import annotations
 
+import functools
 import logging
-from dataclasses import dataclass
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from sqlite3 import Connection
+from typing import AsyncIterator, Iterator, Optional
 
 from app.common.ldap import LDAPException
 from app.config import Config
+from app.metrics import SQL_SECONDS, registry
 
+from .aio import run_sync
+
+COLUMNS = ("login", "email2", "phone", "telegram", "otp", "bind_dest")
 INSERT_SQL = '''
     INSERT INTO "users"
-        ("login", "bind_token", "email2", "phone", "telegram", "otp", "reset_token", "bind_dest")
+        ("login", "email2", "phone", "telegram", "otp", "bind_dest", "display_name", "refreshed_at")
     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
 '''
-UPDATE_SQL = '''
-    UPDATE "users"
-    SET "login" = ?,
-        "bind_token" = ?,
-        "email2" = ?,
-        "phone" = ?,
-        "telegram" = ?,
-        "otp" = ?,
-        "reset_token" = ?,
-        "bind_dest" = ?
-    WHERE "id" = ?
-'''
 FETCH_BY_LOGIN_SQL = '''
-    SELECT "id", "bind_token", "email2", "phone", "telegram", "otp", "reset_token", "bind_dest"
+    SELECT "id", "email2", "phone", "telegram", "otp", "bind_dest", "display_name", "refreshed_at"
     FROM "users"
     WHERE "login" = ?
 '''
 FETCH_BY_TELEGRAM_SQL = '''
-    SELECT "login"
+    SELECT "id", "email2", "phone", "telegram", "otp", "bind_dest", "display_name", "refreshed_at", "login"
     FROM "users"
-    WHERE "telegram" = ?
+    WHERE "telegram" = ? AND "deleted_at" IS NULL
 '''
+PROFILE_SQL = 'UPDATE "users" SET "display_name" = ?, "refreshed_at" = ? WHERE "id" = ?'
 
 logger = logging.getLogger(__name__)
 
+PROFILE_READS = registry.counter('profile_reads_total', 'Profile lookups by Telegram ID, by where the profile came from.',
+                                 ('source',))
+
+
+@functools.lru_cache(maxsize=None)
+def update_sql(columns: tuple[str, ...]) -> str:
+    # one statement text per column set, so sqlite's statement cache keeps hitting
+    assignments = ', '.join(f'"{column}" = ?' for column in columns)
+    return f'UPDATE "users" SET {assignments} WHERE "id" = ?'
+
 
 class UserBindDestination(Enum):
     NONE = 0
@@ -47,47 +55,161 @@ class UserBindDestination(Enum):
     OTP = 4
 
 
-@dataclass
+class UnitOfWork:
+    """Users saved inside User.transaction(), written together in one transaction on exit."""
+
+    def __init__(self) -> None:
+        self._pending = dict[int, 'User']()
+
+    def add(self, user: User) -> None:
+        self._pending[id(user)] = user
+
+    def commit(self) -> None:
+        users, self._pending = list(self._pending.values()), {}
+        if not any(user.is_dirty() for user in users):
+            return
+        saved = [(user, user.id, user._snapshot) for user in users]
+        try:
+            with Config.database.get_connection() as db:
+                for user in users:
+                    user.write(db)
+        except BaseException:
+            # the transaction was rolled back, so the users written before the failure are dirty again
+            for user, user_id, snapshot in saved:
+                user.id, user._snapshot = user_id, snapshot
+            raise
+
+
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar('user_unit_of_work', default=None)
+
+
+@dataclass(slots=True)
 class User:
     id: Optional[int] = None
     login: Optional[str] = None
-    bind_token: Optional[str] = None
     email2: Optional[str] = None
     phone: Optional[int] = None
     telegram: Optional[int] = None
     otp: Optional[str] = None
-    reset_token: Optional[int] = None
     bind_dest: Optional[UserBindDestination] = None
 
-    # only from LDAP
+    # display name from LDAP, mirrored in the display_name column
     name: Optional[str] = None
 
-    def save(self):
-        with Config.database.get_connection() as db:
-            if self.id is None:
-                cursor = db.execute(INSERT_SQL, (self.login, self.bind_token, self.email2,
-                                    self.phone, self.telegram, self.otp, self.reset_token, self.bind_dest.value))
-                self.id = cursor.lastrowid
-                logger.info("User with login %s created", self.login)
-            else:
-                db.execute(UPDATE_SQL, (self.login, self.bind_token, self.email2, self.phone,
-                                        self.telegram, self.otp, self.reset_token, self.bind_dest.value, self.id))
-                logger.info("User with login %s updated", self.login)
+    # column values as last loaded or written; None until the user is known to the database
+    _snapshot: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def _values(self) -> tuple:
+        bind_dest = UserBindDestination.NONE if self.bind_dest is None else self.bind_dest
+        return (self.login, self.email2, self.phone, self.telegram, self.otp, bind_dest.value)
+
+    def mark_clean(self) -> None:
+        self._snapshot = self._values()
+
+    def dirty_fields(self) -> tuple[str, ...]:
+        if self._snapshot is None:
+            return COLUMNS
+        return tuple(column for column, old, new in zip(COLUMNS, self._snapshot, self._values()) if old != new)
+
+    def is_dirty(self) -> bool:
+        return self._snapshot is None or self._snapshot != self._values()
+
+    def write(self, db: Connection) -> None:
+        if not self.is_dirty():
+            return
+
+        values = self._values()
+        if self.id is None:
+            refreshed_at = None if self.name is None else time.time()
+            with SQL_SECONDS.time('insert_user'):
+                self.id = db.execute(INSERT_SQL, (*values, self.name, refreshed_at)).lastrowid
+            logger.info("User with login %s created", self.login)
+        else:
+            columns = self.dirty_fields()
+            changed = [value for column, value in zip(COLUMNS, values) if column in columns]
+            with SQL_SECONDS.time('update_user'):
+                db.execute(update_sql(columns), (*changed, self.id))
+            logger.info("User with login %s updated: %s", self.login, ', '.join(columns))
+        self._snapshot = values
+
+    def save(self) -> None:
+        work = _unit_of_work.get()
+        if work is not None:
+            work.add(self)
+        elif self.is_dirty():
+            with Config.database.get_connection() as db:
+                self.write(db)
+
+    async def save_async(self) -> None:
+        await run_sync(self.save)
+
+    @staticmethod
+    @contextmanager
+    def transaction() -> Iterator[UnitOfWork]:
+        """Defers every save() in the block and writes the changed users in one transaction.
+
+        Nested blocks join the outer one. Users inserted inside the block get their id on exit.
+        """
+        outer = _unit_of_work.get()
+        if outer is not None:
+            yield outer
+            return
+
+        work = UnitOfWork()
+        token = _unit_of_work.set(work)
+        try:
+            yield work
+        finally:
+            _unit_of_work.reset(token)
+        work.commit()
+
+    @staticmethod
+    @asynccontextmanager
+    async def transaction_async() -> AsyncIterator[UnitOfWork]:
+        outer = _unit_of_work.get()
+        if outer is not None:
+            yield outer
+            return
+
+        work = UnitOfWork()
+        token = _unit_of_work.set(work)
+        try:
+            yield work
+        finally:
+            _unit_of_work.reset(token)
+        await run_sync(work.commit)
+
+    @staticmethod
+    def _from_row(login: str, name: Optional[str], data: tuple) -> User:
+        user = User(login=login, name=name, id=data[0], email2=data[1], phone=data[2], telegram=data[3],
+                    otp=data[4], bind_dest=UserBindDestination(data[5]))
+        user.mark_clean()
+        return user
 
     @staticmethod
     def find(login: str) -> User:
-        ldap_user = Config.ldap_descriptor.get_user(login)
-        cursor = Config.database.execute(FETCH_BY_LOGIN_SQL, (ldap_user.user_principal_name,))
-        data = cursor.fetchone()
+        ldap_user = Config.ldap_user_cache.get_or_load(
+            login.lower(), lambda: Config.ldap_descriptor.get_user(login))
+        with SQL_SECONDS.time('fetch_by_login'):
+            data = Config.database.execute(FETCH_BY_LOGIN_SQL, (ldap_user.user_principal_name,)).fetchone()
         if data is None:
-            return User(login=ldap_user.user_principal_name, name=ldap_user.display_name)
+            user = User(login=ldap_user.user_principal_name, name=ldap_user.display_name)
+            # a user without a row reads the same as an empty row, so only a change creates one
+            user.mark_clean()
+            return user
 
-        user = User(login=ldap_user.user_principal_name, name=ldap_user.display_name, id=data[0],
-                    bind_token=data[1], email2=data[2], phone=data[3], telegram=data[4],
-                    otp=data[5], reset_token=data[6], bind_dest=UserBindDestination(data[7]))
-        logger.info("User found: %s", user)
+        user = User._from_row(ldap_user.user_principal_name, ldap_user.display_name, data)
+        # the directory was asked anyway, so a changed or stale local profile is brought up to date for free
+        if data[6] != user.name or data[7] is None or data[7] < time.time() - Config.profile_ttl:
+            with Config.database.get_connection() as db, SQL_SECONDS.time('update_profile'):
+                db.execute(PROFILE_SQL, (user.name, time.time(), user.id))
+        logger.info("User found: %s", user.login)
         return user
 
+    @staticmethod
+    async def find_async(login: str) -> User:
+        return await run_sync(User.find, login)
+
     @staticmethod
     def try_find(login: str) -> Optional[User]:
         try:
@@ -96,14 +218,35 @@ class User:
             logger.error("User.find(%s) failed: %s", login, exception)
             return None
 
+    @staticmethod
+    async def try_find_async(login: str) -> Optional[User]:
+        return await run_sync(User.try_find, login)
+
+    @staticmethod
+    def invalidate_cache(login: str) -> None:
+        Config.ldap_user_cache.pop(login.lower())
+
     @staticmethod
     def try_find_by_telegram(tg_id: int) -> Optional[User]:
-        cursor = Config.database.execute(FETCH_BY_TELEGRAM_SQL, (tg_id,))
-        data = cursor.fetchone()
+        """The user bound to `tg_id`, from the local profile while it is younger than PROFILE_MAX_AGE.
+
+        Older or missing profiles go to the directory like find(), which also refreshes the row.
+        """
+        with SQL_SECONDS.time('fetch_by_telegram'):
+            data = Config.database.execute(FETCH_BY_TELEGRAM_SQL, (tg_id,)).fetchone()
         if data is None:
             logger.info("User not found by Telegram ID: %d", tg_id)
             return None
 
-        user = User.find(data[0])
+        if data[6] is not None and data[7] is not None and data[7] >= time.time() - Config.profile_max_age:
+            PROFILE_READS.inc('local')
+            user = User._from_row(data[8], data[6], data)
+        else:
+            PROFILE_READS.inc('ldap')
+            user = User.find(data[8])
         logger.info("User found by Telegram ID: %s", user.name)
         return user
+
+    @staticmethod
+    async def try_find_by_telegram_async(tg_id: int) -> Optional[User]:
+        return await run_sync(User.try_find_by_telegram, tg_id)
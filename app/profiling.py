@@ -0,0 +1,129 @@
+"""Profiles of the next N requests to one route, armed at run time through Root.profile.
+
+``cprofile`` sessions dump pstats files (flameprof, snakeviz, gprof2dot), ``sample`` sessions
+poll the request thread's stack every ``interval`` seconds and write collapsed stacks, one
+``frame;frame;frame count`` line per stack, as flamegraph.pl and speedscope read them. Both
+profile only the thread serving the request, so they fit CherryPy's thread per request.
+"""
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from types import FrameType
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f'{frame.f_globals.get("__name__", "?")}:{code.co_name}:{code.co_firstlineno}'
+
+
+class SamplingSession:
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter[str]()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self, path: str) -> str:
+        self._stop.set()
+        self._thread.join()
+        path += '.folded'
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.items():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+class CProfileSession:
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, path: str) -> str:
+        self.profile.disable()
+        path += '.prof'
+        self.profile.dump_stats(path)
+        return path
+
+
+Session = Union[SamplingSession, CProfileSession]
+
+
+@dataclass(slots=True)
+class Plan:
+    mode: str
+    remaining: int
+    interval: float
+
+
+class RouteProfiler:
+    def __init__(self) -> None:
+        self.directory = ''
+        self._plans = dict[str, Plan]()
+        self._lock = threading.Lock()
+        self.written = deque[str](maxlen=50)
+
+    def arm(self, route: str, count: int, mode: str, interval: float = 0.001) -> None:
+        if not self.directory:
+            raise ValueError('PROFILE_DIR is not set, there is nowhere to write profiles')
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}, got {mode!r}')
+        with self._lock:
+            if count > 0:
+                self._plans[route] = Plan(mode, count, interval)
+            else:
+                self._plans.pop(route, None)
+        logger.info("Profiling the next %d requests to %s with %s", count, route, mode)
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {'armed': {route: {'mode': plan.mode, 'remaining': plan.remaining}
+                              for route, plan in self._plans.items()},
+                    'written': list(self.written)}
+
+    def start(self, route: str) -> Optional[Session]:
+        """A session for this request when `route` is armed, counting it against the plan."""
+        if not self._plans:
+            return None
+        with self._lock:
+            plan = self._plans.get(route)
+            if plan is None:
+                return None
+            plan.remaining -= 1
+            if plan.remaining <= 0:
+                del self._plans[route]
+        if plan.mode == 'cprofile':
+            return CProfileSession()
+        return SamplingSession(threading.get_ident(), plan.interval)
+
+    def stop(self, session: Session, route: str) -> None:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        path = session.stop(os.path.join(self.directory, f'{slug}-{time.time_ns()}'))
+        with self._lock:
+            self.written.append(path)
+        logger.info("Profile of %s written to %s", route, path)
+
+
+route_profiler = RouteProfiler()
@@ -0,0 +1,37 @@
+import threading
+import time
+from collections import OrderedDict
+
+Budget = tuple[int, float]
+
+
+class TokenBucketLimiter:
+    """Token buckets per key: `capacity` requests, refilled evenly over `period` seconds."""
+
+    def __init__(self, capacity: int, period: float, max_keys: int = 10_000) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict[str, list[float]]()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.capacity), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def retry_after(self) -> int:
+        return max(1, int(1 / self.rate))
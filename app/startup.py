@@ -0,0 +1,88 @@
+"""Start-up profiling for ``main_web.py --profile-startup`` and ``main_bot.py --profile-startup``.
+
+The entry point re-runs itself under ``python -X importtime``, the child times the start-up
+stages and template loads and exits instead of serving, and the parent prints both the stage
+table and the import time per top-level package.
+"""
+import functools
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+PROFILE_FLAG = '--profile-startup'
+
+
+class StartupProfiler:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stages = list[tuple[str, float]]()
+        self.templates = list[tuple[str, float]]()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def watch_templates(self, env: Any) -> None:
+        get_template = env.get_template
+
+        @functools.wraps(get_template)
+        def timed(name: str, *args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return get_template(name, *args, **kwargs)
+            finally:
+                self.templates.append((str(name), time.perf_counter() - start))
+
+        env.get_template = timed
+
+    def report(self) -> str:
+        lines = ['stage                                  ms']
+        lines += [f'{name:<32} {seconds * 1000:>9.1f}' for name, seconds in self.stages]
+        if self.templates:
+            lines += ['', 'template                               ms']
+            lines += [f'{name:<32} {seconds * 1000:>9.1f}' for name, seconds in self.templates]
+        return '\n'.join(lines)
+
+
+profiler = StartupProfiler()
+
+
+def summarize_importtime(output: str, top: int = 15) -> str:
+    self_us = dict[str, int]()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        self_us[package] = self_us.get(package, 0) + int(own)
+
+    ranked = sorted(self_us.items(), key=lambda item: item[1], reverse=True)
+    lines = [f'imports total                    {sum(self_us.values()) / 1000:>9.1f}', '',
+             'package                                ms']
+    lines += [f'{package:<32} {us / 1000:>9.1f}' for package, us in ranked[:top]]
+    return '\n'.join(lines)
+
+
+def profile_startup(main: Callable[[], None]) -> None:
+    if 'importtime' not in sys._xoptions:  # pylint: disable=protected-access
+        child = subprocess.run([sys.executable, '-X', 'importtime', *sys.argv], stderr=subprocess.PIPE,
+                               text=True, check=False)
+        print(summarize_importtime(child.stderr))
+        if child.returncode != 0:
+            errors = [line for line in child.stderr.splitlines() if not line.startswith('import time:')]
+            print('\n'.join(errors), file=sys.stderr)
+        sys.exit(child.returncode)
+
+    profiler.enabled = True
+    main()
+    print(profiler.report())
@@ -0,0 +1,119 @@
+"""Request-scoped span trees.
+
+trace() opens the root span of a CherryPy request, an ASGI request or a bot update, and span()
+adds a child to whatever trace is current in the context. Outside a trace span() costs one
+ContextVar lookup. run_sync copies the context into the executor, so spans opened there land
+in the right tree; the Telegram sender thread attaches explicitly, and a send the request did
+not wait for shows as running. Traces slower than ``tracer.slow_threshold`` are logged with
+their tree.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from jinja2 import Template
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    duration: Optional[float] = None
+    children: list['Span'] = field(default_factory=list)
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+    def render(self, origin: Optional[float] = None, depth: int = 0) -> list[str]:
+        """One line per span: name, start offset from the root and duration, children indented."""
+        origin = self.start if origin is None else origin
+        duration = 'running' if self.duration is None else f'{self.duration * 1000:.1f} ms'
+        lines = [f'{"  " * depth}{self.name} @{(self.start - origin) * 1000:.1f} ms {duration}']
+        for child in list(self.children):
+            lines.extend(child.render(origin, depth + 1))
+        return lines
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('trace_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    parent = _current.get()
+    if parent is None:
+        yield
+        return
+
+    child = Span(name)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+@contextmanager
+def attach(parent: Optional[Span]) -> Iterator[None]:
+    """Makes `parent` current for work done on behalf of it on another thread or loop."""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.enabled = True
+        self.slow_threshold = 1.0
+        self.traces = 0
+        self.slow = 0
+
+    def begin(self, name: str) -> Optional[tuple[Span, Token]]:
+        """Starts a trace in the current context; for hooks that cannot wrap the work in trace()."""
+        if not self.enabled:
+            return None
+        root = Span(name)
+        return root, _current.set(root)
+
+    def end(self, state: Optional[tuple[Span, Token]]) -> None:
+        if state is None:
+            return
+        root, token = state
+        _current.reset(token)
+        root.finish()
+        self.traces += 1
+        assert root.duration is not None
+        if root.duration >= self.slow_threshold:
+            self.slow += 1
+            logger.warning("Slow %s:\n%s", root.name, '\n'.join(root.render()))
+
+    @contextmanager
+    def trace(self, name: str) -> Iterator[Optional[Span]]:
+        state = self.begin(name)
+        try:
+            yield None if state is None else state[0]
+        finally:
+            self.end(state)
+
+
+tracer = Tracer()
+
+
+class TracedTemplate(Template):
+    """Jinja template class whose render() is a span; set as the environment's template_class."""
+
+    def render(self, *args: Any, **kwargs: Any) -> str:
+        with span(f'jinja.{self.name}'):
+            return super().render(*args, **kwargs)
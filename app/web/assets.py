@@ -0,0 +1,170 @@
+"""Fingerprinted, precompressed static assets served under /assets/.
+
+Compressed variants are kept in a cache directory keyed by content hash, so only the first
+start after a deploy pays for brotli; ``python main_assets.py`` fills the cache at build time.
+A cached variant is only used after it decompresses back to the source it is named after.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, browsers fall back to gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSETS_PREFIX = '/assets/'
+STATIC_PREFIX = '/static/'
+# woff/woff2 and images are compressed formats already
+COMPRESSIBLE = frozenset(['.css', '.js', '.svg', '.ttf', '.eot', '.ico', '.json', '.txt'])
+# relative url(...) references in stylesheets; absolute and data: urls are left alone
+CSS_URL_RE = re.compile(r'url\((?![a-z]+:|/)([^)?#]+)([^)]*)\)')
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/woff', '.woff')
+mimetypes.add_type('font/ttf', '.ttf')
+
+
+def fingerprinted_name(path: str, digest: str) -> str:
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{digest[:12]}{ext}'
+
+
+def accepted_encodings(header: str) -> frozenset[str]:
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(name.strip().lower())
+    return frozenset(encodings)
+
+
+@dataclass(slots=True)
+class Asset:
+    path: str
+    name: str
+    content_type: str
+    digest: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def url(self) -> str:
+        return ASSETS_PREFIX + self.name
+
+    def etag(self, encoding: str) -> str:
+        # strong validators must differ between representations of the same resource
+        return f'"{self.digest[:32]}"' if encoding == 'identity' else f'"{self.digest[:32]}-{encoding}"'
+
+    def negotiate(self, accept_encoding: str) -> tuple[str, bytes]:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and encoding in accepted:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+
+class AssetManifest:
+    def __init__(self, root: str = STATIC_ROOT, cache_dir: Optional[str] = None) -> None:
+        self.root = root
+        self.cache_dir = cache_dir
+        self.by_path = dict[str, Asset]()
+        self.by_name = dict[str, Asset]()
+
+    @staticmethod
+    def _decompress(encoding: str, data: bytes) -> bytes:
+        return brotli.decompress(data) if encoding == 'br' else gzip.decompress(data)
+
+    def _cached(self, path: str, digest: str, encoding: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(self._decompress(encoding, data)).hexdigest() == digest:
+                return data
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
+        logger.warning("Ignoring cached asset %s, it does not decompress to its source", path)
+        return None
+
+    def _compress(self, digest: str, encoding: str, data: bytes) -> bytes:
+        cached = None if self.cache_dir is None else os.path.join(self.cache_dir, f'{digest}.{encoding}')
+        hit = None if cached is None else self._cached(cached, digest, encoding)
+        if hit is not None:
+            return hit
+
+        if encoding == 'br':
+            result = brotli.compress(data, quality=11)
+        else:
+            result = gzip.compress(data, 9, mtime=0)
+
+        if cached is not None:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            with open(f'{cached}.{os.getpid()}', 'wb') as f:
+                f.write(result)
+            os.replace(f'{cached}.{os.getpid()}', cached)
+        return result
+
+    def _add(self, path: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+
+        asset = Asset(path, fingerprinted_name(path, digest), content_type, digest, {'identity': data})
+        if posixpath.splitext(path)[1] in COMPRESSIBLE:
+            for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+                compressed = self._compress(digest, encoding, data)
+                if len(compressed) < len(data):
+                    asset.variants[encoding] = compressed
+
+        self.by_path[path] = asset
+        self.by_name[asset.name] = asset
+
+    def _rewrite_css(self, path: str, data: bytes) -> bytes:
+        directory = posixpath.dirname(path)
+
+        def replace(match: re.Match[str]) -> str:
+            target = posixpath.normpath(posixpath.join(directory, match.group(1).strip('\'" ')))
+            asset = self.by_path.get(target)
+            return match.group(0) if asset is None else f'url({asset.url}{match.group(2)})'
+
+        return CSS_URL_RE.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+    def build(self) -> 'AssetManifest':
+        start = time.perf_counter()
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                full = os.path.join(directory, name)
+                files.append(os.path.relpath(full, self.root).replace(os.sep, '/'))
+
+        # stylesheets go last so the fonts and images they reference already have fingerprints
+        for path in sorted(files, key=lambda item: (item.endswith('.css'), item)):
+            with open(os.path.join(self.root, path), 'rb') as f:
+                data = f.read()
+            if path.endswith('.css'):
+                data = self._rewrite_css(path, data)
+            self._add(path, data)
+
+        logger.info("Built %d static assets in %.2fs (brotli %s)", len(self.by_path),
+                    time.perf_counter() - start, 'enabled' if brotli is not None else 'unavailable')
+        return self
+
+    def url(self, path: str) -> str:
+        asset = self.by_path.get(path)
+        return STATIC_PREFIX + path if asset is None else asset.url
+
+    def find(self, name: str) -> Optional[Asset]:
+        return self.by_name.get(name)
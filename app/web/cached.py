@@ -0,0 +1,47 @@
+import hashlib
+import threading
+from typing import Callable, Optional
+
+import cherrypy
+
+
+class CachedResponse:
+    """Body of a page that renders identically for every visitor.
+
+    It is rendered on first use and served from memory afterwards, with an ETag computed
+    once, so revalidating browsers get a 304 without a render or a body.
+    """
+
+    def __init__(self, render: Callable[[], str], cache_control: str = 'no-cache') -> None:
+        self._render = render
+        self._lock = threading.Lock()
+        self._body: Optional[bytes] = None
+        self._etag = ''
+        self.cache_control = cache_control
+
+    def load(self) -> tuple[bytes, str]:
+        with self._lock:
+            if self._body is None:
+                body = self._render().encode('utf-8')
+                self._etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+                self._body = body
+        return self._body, self._etag
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._body = None
+
+    def serve(self) -> bytes:
+        body, etag = self._body, self._etag
+        if body is None:
+            body, etag = self.load()
+
+        headers = cherrypy.response.headers
+        headers['ETag'] = etag
+        headers['Cache-Control'] = self.cache_control
+        if etag in [tag.strip() for tag in cherrypy.request.headers.get('If-None-Match', '').split(',')]:
+            cherrypy.response.status = 304
+            return b''
+
+        headers['Content-Type'] = 'text/html;charset=utf-8'
+        return body
@@ -0,0 +1,34 @@
+import ipaddress
+from typing import Optional
+
+import cherrypy
+
+from app.config import Config
+
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in Config.trusted_proxies)
+
+
+def client_ip(remote_ip: str, forwarded_for: Optional[str]) -> str:
+    """The address of the client behind any TRUSTED_PROXIES, for rate limits and allowlists.
+
+    Each proxy appends the peer it saw to X-Forwarded-For, so the list is read from the right and
+    the first hop that is not a trusted proxy is the client; anything left of it is client supplied.
+    """
+    if not forwarded_for or not _trusted(remote_ip):
+        return remote_ip
+
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop):
+            return hop
+    return hops[0] if hops else remote_ip
+
+
+def request_ip() -> str:
+    return client_ip(cherrypy.request.remote.ip, cherrypy.request.headers.get('X-Forwarded-For'))
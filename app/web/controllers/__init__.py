@@ -1,6 +1,7 @@
+from .assets import Assets
 from .auth import Auth
 from .office365 import Office365
 from .root import Root
 from .user import User
 
-__all__ = ['Auth', 'Root', 'User', 'Office365']
+__all__ = ['Assets', 'Auth', 'Root', 'User', 'Office365']
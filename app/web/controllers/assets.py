@@ -0,0 +1,36 @@
+import cherrypy
+
+from app.config import Config
+from app.web.assets import AssetManifest
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class Assets():
+    _cp_config = {'tools.sessions.on': False}
+
+    def __init__(self):
+        self.manifest = AssetManifest(cache_dir=Config.assets_cache_dir).build()
+        Config.jinja_env.globals['asset_url'] = self.manifest.url
+
+    @cherrypy.expose
+    @cherrypy.tools.allow(methods=['GET', 'HEAD'])
+    def default(self, *parts):
+        asset = self.manifest.find('/'.join(parts))
+        if asset is None:
+            raise cherrypy.NotFound()
+
+        encoding, body = asset.negotiate(cherrypy.request.headers.get('Accept-Encoding', ''))
+        etag = asset.etag(encoding)
+        headers = cherrypy.response.headers
+        headers['ETag'] = etag
+        headers['Cache-Control'] = IMMUTABLE
+        headers['Vary'] = 'Accept-Encoding'
+        if etag in [tag.strip() for tag in cherrypy.request.headers.get('If-None-Match', '').split(',')]:
+            cherrypy.response.status = 304
+            return b''
+
+        headers['Content-Type'] = asset.content_type
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return body
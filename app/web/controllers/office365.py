@@ -1,13 +1,15 @@
 import cherrypy
 
 from app.config import Config
+from app.web.cached import CachedResponse
 
 
 class Office365():
     def __init__(self):
         self.index_template = Config.jinja_env.get_template('office365/index.html')
+        self.index_page = CachedResponse(self.index_template.render)
 
     @cherrypy.expose
     @cherrypy.tools.allow(methods=['GET'])
     def index(self):
-        return self.index_template.render()
+        return self.index_page.serve()
@@ -1,9 +1,15 @@
+import hmac
 import logging
 
 import cherrypy
 
-from app.common.web.utils import is_authenticated
+from app.config import Config
+from app.metrics import registry
+from app.profiling import route_profiler
+from app.web.client_ip import request_ip
+from app.web.sessions import is_authenticated
 
+from .assets import Assets
 from .auth import Auth
 from .office365 import Office365
 from .user import User
@@ -12,7 +18,11 @@ logger = logging.getLogger(__name__)
 
 
 class Root():
+    _cp_config = {'tools.metrics.on': True, 'tools.trace.on': True}
+
     def __init__(self) -> None:
+        # registers the asset_url template global, so it goes before the controllers load templates
+        self.assets = Assets()
         self.auth = Auth()
         self.user = User()
         self.office365 = Office365()
@@ -21,3 +31,30 @@ class Root():
     @cherrypy.expose
     def index(self):
         raise cherrypy.HTTPRedirect("/user" if is_authenticated() else "/auth")
+
+    @cherrypy.expose
+    @cherrypy.tools.allow(methods=['GET'])
+    def metrics(self):
+        if request_ip() not in Config.metrics_allowed_ips:
+            raise cherrypy.NotFound()
+
+        cherrypy.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return registry.render()
+
+    @cherrypy.expose
+    @cherrypy.tools.allow(methods=['GET', 'POST'])
+    @cherrypy.tools.json_out()
+    def profile(self, route=None, count='10', mode='cprofile'):
+        token = cherrypy.request.headers.get('X-Admin-Token', '')
+        if request_ip() not in Config.metrics_allowed_ips or not Config.admin_token \
+                or not hmac.compare_digest(token.encode(), Config.admin_token.encode()):
+            raise cherrypy.NotFound()
+
+        if cherrypy.request.method == 'POST':
+            if not route:
+                raise cherrypy.HTTPError(400, 'route is required')
+            try:
+                route_profiler.arm(route, int(count), mode)
+            except ValueError as e:
+                raise cherrypy.HTTPError(400, str(e)) from e
+        return route_profiler.status()
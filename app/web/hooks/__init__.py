@@ -1,3 +1,6 @@
+from .metrics import MetricsTool
 from .normalize_username import normalize_username
+from .rate_limit import rate_limit
+from .tracing import TraceTool
 
-__all__ = ['normalize_username']
+__all__ = ['MetricsTool', 'TraceTool', 'normalize_username', 'rate_limit']
@@ -0,0 +1,58 @@
+import time
+
+import cherrypy
+
+from app.metrics import HTTP_REQUESTS, HTTP_SECONDS, registry
+
+
+def _handler_name() -> str:
+    handler = getattr(cherrypy.request.handler, 'callable', None)
+    if handler is None:
+        return 'unmatched'
+    owner = getattr(handler, '__self__', None)
+    return handler.__name__ if owner is None else f'{owner.__class__.__name__}.{handler.__name__}'
+
+
+def start_request_timer():
+    cherrypy.request.metrics_start = time.perf_counter()
+    cherrypy.request.metrics_handler = 'unmatched'
+
+
+def resolve_handler_name():
+    cherrypy.request.metrics_handler = _handler_name()
+
+
+def record_request_metrics():
+    start = getattr(cherrypy.request, 'metrics_start', None)
+    if start is None:
+        return
+
+    handler = cherrypy.request.metrics_handler
+    status = str(cherrypy.response.status).split(' ', 1)[0]
+    HTTP_SECONDS.observe(time.perf_counter() - start, handler)
+    HTTP_REQUESTS.inc(handler, status)
+
+
+class MetricsTool(cherrypy.Tool):
+    def __init__(self):
+        super().__init__('on_start_resource', start_request_timer, priority=10)
+
+    def _setup(self):
+        super()._setup()
+        cherrypy.request.hooks.attach('before_handler', resolve_handler_name, priority=0)
+        cherrypy.request.hooks.attach('on_end_request', record_request_metrics)
+
+
+def _thread_pool_samples():
+    httpserver = getattr(cherrypy.server, 'httpserver', None)
+    pool = getattr(httpserver, 'requests', None)
+    if pool is None:
+        return []
+    return [(('threads',), len(pool._threads)),  # pylint: disable=protected-access
+            (('idle',), pool.idle),
+            (('queued',), pool.qsize),
+            (('max',), pool.max)]
+
+
+registry.callback('cherrypy_thread_pool', 'CherryPy worker pool size, idle threads and queued connections.',
+                  ('state',), _thread_pool_samples)
@@ -1,21 +1,61 @@
+import re
+from typing import Optional
+
 from cherrypy import request
 
 from app.config import Config
 
+UNSUPPORTED_DOMAIN_ERROR = "Домененне ім'я логіну не підтримується"
+INVALID_LOGIN_ERROR = "Некоректний логін"
+
+# what Active Directory accepts in a sAMAccountName, anything else can never match an account
+ACCOUNT_NAME = re.compile(r'[^"/\\\[\]:;|=,+*?<>@\s]{1,64}')
+
+
+def login_account(username: str) -> Optional[str]:
+    """The account part of `username`, or None when it is malformed or its domain is not supported."""
+    account, at, domain = username.partition('@')
+    if at and domain.lower() not in Config.login_supported_domains:
+        return None
+    if ACCOUNT_NAME.fullmatch(account) is None:
+        return None
+    return account
+
+
+def login_error(username: str) -> str:
+    """Why `username` has no directory login: its domain is not supported, or it is not a valid login at all."""
+    _, at, domain = username.partition('@')
+    if at and domain.lower() not in Config.login_supported_domains:
+        return UNSUPPORTED_DOMAIN_ERROR
+    return INVALID_LOGIN_ERROR
+
+
+def cached_login(username: str) -> Optional[str]:
+    """Directory login for `username` when it is known without asking the directory, otherwise None."""
+    account = login_account(username)
+    if account is None:
+        return None
+    if Config.login_normalize_local:
+        return account.lower()
+    return Config.login_cache.get(account.lower())
+
+
+def normalized_login(username: str) -> Optional[str]:
+    """Directory login for `username`, or None when it is malformed or its domain is not supported."""
+    account = login_account(username)
+    if account is None:
+        return None
+    if Config.login_normalize_local:
+        return account.lower()
+    return Config.login_cache.get_or_load(account.lower(), lambda: Config.ldap_descriptor.normalize_login(account))
+
 
 def normalize_username():
     if "username" not in request.params:
         return
 
-    username = request.params['username']
-    username_part = username.split('@')
-    if len(username_part) == 2:
-        if username_part[1] not in Config.login_supported_domain:
-            request.params['errors'] = [
-                "Домененне ім'я логіну не підтримується"]
-            return
-        request.params['username'] = Config.ldap_descriptor.normalize_login(
-            username_part[0])
-    else:
-        request.params['username'] = Config.ldap_descriptor.normalize_login(
-            username)
+    login = normalized_login(request.params['username'])
+    if login is None:
+        request.params['errors'] = [login_error(request.params['username'])]
+        return
+    request.params['username'] = login
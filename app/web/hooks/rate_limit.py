@@ -0,0 +1,56 @@
+import threading
+from typing import Any, Optional
+
+import cherrypy
+from cherrypy import request
+
+from app.config import Config
+from app.metrics import registry
+from app.ratelimit import Budget, TokenBucketLimiter
+from app.web.client_ip import request_ip
+from app.web.hooks.normalize_username import login_account
+
+RATE_LIMITED = registry.counter('http_rate_limited_total', 'Requests rejected by tools.rate_limit.', ('route', 'scope'))
+
+RATE_LIMITED_MESSAGE = "Забагато спроб, спробуйте пізніше."
+
+_limiters = dict[tuple[str, str, Budget], TokenBucketLimiter]()
+_limiters_lock = threading.Lock()
+
+
+def _limiter(route: str, scope: str, budget: Budget) -> TokenBucketLimiter:
+    key = (route, scope, budget)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(key, TokenBucketLimiter(*budget))
+    return limiter
+
+
+def over_limit(route: str, remote_ip: str, username: Any, ip: Optional[Budget] = None,
+               user: Optional[Budget] = None) -> Optional[TokenBucketLimiter]:
+    """Takes a token for the caller's IP and username; returns the limiter that ran out, if any."""
+    if not Config.rate_limit_enabled:
+        return None
+
+    ip_limiter = _limiter(route, 'ip', ip or Config.rate_limit_ip)
+    if not ip_limiter.allow(remote_ip):
+        RATE_LIMITED.inc(route, 'ip')
+        return ip_limiter
+
+    if isinstance(username, str) and username.strip():
+        # the account normalize_username works from, so every spelling of a login shares one bucket;
+        # the limit runs first, so it cannot wait for the directory's normalized form
+        account = login_account(username.strip()) or username.strip()
+        user_limiter = _limiter(route, 'user', user or Config.rate_limit_user)
+        if not user_limiter.allow(account.lower()):
+            RATE_LIMITED.inc(route, 'user')
+            return user_limiter
+    return None
+
+
+def rate_limit(route: Optional[str] = None, ip: Optional[Budget] = None, user: Optional[Budget] = None):
+    limiter = over_limit(route or request.path_info, request_ip(), request.params.get('username'), ip, user)
+    if limiter is not None:
+        cherrypy.response.headers['Retry-After'] = str(limiter.retry_after())
+        raise cherrypy.HTTPError(429, RATE_LIMITED_MESSAGE)
@@ -0,0 +1,38 @@
+import cherrypy
+
+from app.metrics import registry
+from app.profiling import route_profiler
+from app.tracing import tracer
+
+
+def start_trace():
+    request = cherrypy.request
+    request.trace = tracer.begin(f'{request.method} {request.path_info}')
+    request.profile = route_profiler.start(request.path_info)
+
+
+def end_trace():
+    request = cherrypy.request
+    session = getattr(request, 'profile', None)
+    if session is not None:
+        request.profile = None
+        route_profiler.stop(session, request.path_info)
+    tracer.end(getattr(request, 'trace', None))
+    request.trace = None
+
+
+class TraceTool(cherrypy.Tool):
+    """Opens the request's root span and, when the route is armed, a profiling session."""
+
+    def __init__(self):
+        super().__init__('on_start_resource', start_trace, priority=5)
+
+    def _setup(self):
+        super()._setup()
+        cherrypy.request.hooks.attach('on_end_request', end_trace, priority=90)
+
+
+registry.callback('traces_total', 'Requests and bot updates traced.', (),
+                  lambda: [((), tracer.traces)], 'counter')
+registry.callback('traces_slow_total', 'Traces over the slow threshold, logged with their span tree.', (),
+                  lambda: [((), tracer.slow)], 'counter')
@@ -0,0 +1,58 @@
+import base64
+import hashlib
+import logging
+from io import BytesIO
+from typing import Optional
+
+from app.config import Config
+from app.models import TokenPurpose, token_store
+
+OTP_ISSUER = 'VTL User Reset App'
+
+logger = logging.getLogger(__name__)
+
+
+def render_qr_png(data: str) -> bytes:
+    import qrcode  # pylint: disable=import-outside-toplevel
+
+    buffer = BytesIO()
+    qrcode.make(data).save(buffer)
+    return buffer.getvalue()
+
+
+def qr_image(data: str) -> bytes:
+    key = hashlib.sha256(data.encode()).hexdigest()
+    return Config.qr_cache.get_or_load(key, lambda: render_qr_png(data))
+
+
+def otp_provisioning_url(login: str, secret: str) -> str:
+    import pyotp  # pylint: disable=import-outside-toplevel
+
+    return pyotp.totp.TOTP(secret).provisioning_uri(name=login, issuer_name=OTP_ISSUER)
+
+
+def telegram_start_url(login: str, bind_token: str) -> str:
+    start_data = base64.b64encode(f"{login} {bind_token}".encode()).decode()
+    if len(start_data) <= 64:
+        logger.info("Generate full_token for '%s' user, start_data len = %d", login, len(start_data))
+        return f"{Config.telegram_bot_url}?start={start_data}"
+
+    logger.warning("Can't generate full_token for '%s' user, start_data len = %d", login, len(start_data))
+    return Config.telegram_bot_url
+
+
+def get_qr_image(kind: str, login: str) -> Optional[bytes]:
+    """The QR image of the binding `login` has pending, rebuilt from its token; None when there is none.
+
+    The payload is never handed to the browser, so the image can be rendered again whenever the
+    cache has dropped it, for as long as the token lives.
+    """
+    if kind == 'otp':
+        secret = token_store.peek(TokenPurpose.OTP, login)
+        data = None if secret is None else otp_provisioning_url(login, secret)
+    elif kind == 'telegram':
+        bind_token = token_store.peek(TokenPurpose.TELEGRAM, login)
+        data = None if bind_token is None else telegram_start_url(login, bind_token)
+    else:
+        return None
+    return None if data is None else qr_image(data)
@@ -0,0 +1,161 @@
+"""Account flows shared by both front-ends.
+
+app.web.controllers and app.asgi only adapt requests, sessions and responses around these
+functions. They block on LDAP, SQLite and Telegram, so app.asgi awaits them on the model executor.
+A failure the user is shown on the page they submitted is raised as FormError.
+"""
+import logging
+import random
+from typing import Any, Optional
+
+from app.config import Config
+from app.models import TokenPurpose, User, UserBindDestination, token_store
+from app.web.qr import get_qr_image, telegram_start_url
+from app.web.utils import deliver_tg_msg, run_tg_send_msg
+
+USER_NOT_FOUND_ERROR = "Користувача не знайдено."
+WRONG_CODE_ERROR = "Хибний код підтвердження, спробуйте ще раз."
+
+logger = logging.getLogger(__name__)
+
+
+class FormError(Exception):
+    """A message for the errors list of the form the request came from."""
+
+
+def check_login(username: str, password: str) -> None:
+    if not Config.ldap_descriptor.login(username, password):
+        logger.error("Invalid login or password")
+        raise FormError("Неправильний логін або пароль")
+    logger.info("User '%s' successfully logged in", username)
+
+
+def find_user(username: str) -> User:
+    user = User.try_find(username)
+    if user is None:
+        logger.error("User not found: %s", username)
+        raise FormError(USER_NOT_FOUND_ERROR)
+    return user
+
+
+def reset_destinations(username: str) -> tuple[User, list[UserBindDestination]]:
+    user = find_user(username)
+    bind_dest_list = []
+    if user.email2 is not None:
+        bind_dest_list.append(UserBindDestination.EMAIL)
+    if user.phone is not None:
+        bind_dest_list.append(UserBindDestination.PHONE)
+    if user.telegram is not None:
+        bind_dest_list.append(UserBindDestination.TELEGRAM)
+    if user.otp is not None:
+        bind_dest_list.append(UserBindDestination.OTP)
+    return user, bind_dest_list
+
+
+def send_reset_code(username: str, bind_dest_id: str) -> tuple[User, UserBindDestination]:
+    """Sends a reset code to the chosen destination, when it needs one; OTP codes come from the user's app."""
+    user = find_user(username)
+    bind_dest = UserBindDestination(int(bind_dest_id))
+
+    if bind_dest == UserBindDestination.OTP:
+        logger.info("Reset via OTP for user: %s", username)
+    elif bind_dest == UserBindDestination.TELEGRAM:
+        if user.telegram is None:
+            raise FormError("Щось пішло не так, спробуйте ще раз.")
+
+        assert user.login is not None
+        reset_token = token_store.issue(TokenPurpose.RESET, user.login, str(random.randrange(1_000_000, 9_999_999)))
+        if not deliver_tg_msg(user.telegram, f"Ваш код підтвердження {reset_token}"):
+            token_store.discard(TokenPurpose.RESET, user.login)
+            raise FormError("Не вдалося надіслати код у Telegram, спробуйте ще раз.")
+        logger.info("Reset token sent via telegram for user: %s", username)
+    return user, bind_dest
+
+
+def reset_password(username: str, bind_dest_id: str, reset_key: Optional[str], password: str) -> None:
+    user = find_user(username)
+    bind_dest = UserBindDestination(int(bind_dest_id))
+    if bind_dest == UserBindDestination.OTP and user.otp is not None:
+        import pyotp  # pylint: disable=import-outside-toplevel
+        if reset_key is None or not pyotp.totp.TOTP(user.otp).verify(reset_key):
+            logger.error("Incorrect OTP for user: %s", username)
+            raise FormError(WRONG_CODE_ERROR)
+    elif bind_dest == UserBindDestination.TELEGRAM and user.telegram is not None:
+        assert user.login is not None
+        if reset_key is None or not token_store.consume(TokenPurpose.RESET, user.login, reset_key):
+            logger.error("Incorrect telegram reset token for user: %s", username)
+            raise FormError(WRONG_CODE_ERROR)
+    else:
+        raise FormError("Щось пішло не так, почни зпочатку.")
+
+    if not Config.ldap_descriptor.set_password(username, password):
+        logger.error("Error saving password for user: %s", username)
+        raise FormError("Помилка збереження паролю, можливо він не відповідає вимогам.")
+    User.invalidate_cache(username)
+    logger.info("Password reset successful for user: %s", username)
+
+
+def new_telegram_binding(username: str) -> dict[str, Any]:
+    """Issues a bind token; returns the parameters of the telegram_new page."""
+    user = User.find(username)
+    assert user.login is not None
+    bind_token = token_store.issue(TokenPurpose.TELEGRAM, user.login, str(random.randrange(1_000_000, 9_999_999)))
+    logger.info("User '%s' accessed telegram_new page.", user.name)
+    return {'user': user, 'bind_token': bind_token, 'tg_url': Config.telegram_bot_url,
+            'full_tg_url': telegram_start_url(user.login, bind_token), 'qr_kind': 'telegram'}
+
+
+def remove_telegram(username: str) -> None:
+    user = User.find(username)
+    if user.telegram is not None:
+        tg_id = user.telegram
+        user.telegram = None
+        user.save()
+
+        run_tg_send_msg(tg_id, f"Інтеграцію для користувача {user.name} скасовано")
+
+    logger.info("User '%s' destroyed telegram integration.", user.name)
+
+
+def otp_binding(username: str, otp_number: Optional[str]) -> Optional[dict[str, Any]]:
+    """Binds the pending OTP secret when `otp_number` matches it, returning None; otherwise returns
+    the parameters of the otp_new page, issuing a secret when none is pending."""
+    import pyotp  # pylint: disable=import-outside-toplevel
+
+    user = User.find(username)
+    assert user.login is not None
+    params = dict[str, Any](user=user, qr_kind='otp')
+
+    secret = token_store.peek(TokenPurpose.OTP, user.login)
+    if otp_number is not None and secret is not None:
+        otp_valid = pyotp.totp.TOTP(secret).verify(otp_number)
+        logger.info("Validating OTP for '%s' user -> %s", user.name, 'True' if otp_valid else 'False')
+
+        if otp_valid:
+            user.otp = secret
+            user.save()
+            token_store.discard(TokenPurpose.OTP, user.login)
+            return None
+        params['errors'] = ["Помилка перевірки OTP коду, спробуйте ще раз"]
+    else:
+        logger.info("Generate OTP for '%s' user", user.name)
+        secret = token_store.issue(TokenPurpose.OTP, user.login, pyotp.random_base32())
+
+    params['bind_token'] = secret
+    logger.info("User '%s' accessed otp_new page.", user.name)
+    return params
+
+
+def remove_otp(username: str) -> None:
+    user = User.find(username)
+    if user.otp is not None:
+        user.otp = None
+        user.save()
+
+    logger.info("User '%s' destroyed otp integration.", user.name)
+
+
+def binding_qr(username: str, kind: str) -> Optional[bytes]:
+    user = User.find(username)
+    assert user.login is not None
+    return get_qr_image(kind, user.login)
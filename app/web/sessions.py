@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import cherrypy
+
+from app.config import Config
+from app.metrics import SQL_SECONDS, registry
+
+FETCH_SQL = 'SELECT "username", "agent", "time" FROM "sessions" WHERE "session_id" = ?'
+SAVE_SQL = 'INSERT OR REPLACE INTO "sessions" ("session_id", "username", "agent", "time") VALUES (?, ?, ?, ?)'
+DELETE_SQL = 'DELETE FROM "sessions" WHERE "session_id" = ?'
+TOUCH_SQL = 'UPDATE "sessions" SET "time" = ? WHERE "session_id" = ?'
+SWEEP_SQL = 'DELETE FROM "sessions" WHERE "time" < ?'
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SessionEntry:
+    username: str
+    agent: str
+    time: float
+
+
+class SessionStore:
+    """Hot sessions kept in memory in front of the sessions table.
+
+    Creation and deletion are written through immediately, while last-seen refreshes are
+    collected and written in one batch every flush interval; stale rows are swept in bulk.
+    SESSION_LIFETIME is therefore an idle timeout: a session expires that long after its last
+    authenticated request, not after the login.
+    """
+
+    def __init__(self) -> None:
+        self._entries = OrderedDict[str, SessionEntry]()
+        self._dirty = dict[str, float]()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.swept = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def _remember(self, session_id: str, entry: SessionEntry) -> None:
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > Config.session_cache_size:
+                self._entries.popitem(last=False)
+
+    def _load(self, session_id: str) -> Optional[SessionEntry]:
+        with SQL_SECONDS.time('fetch_session'):
+            data = Config.database.execute(FETCH_SQL, (session_id,)).fetchone()
+        if data is None:
+            return None
+
+        entry = SessionEntry(username=data[0], agent=data[1], time=float(data[2]))
+        self._remember(session_id, entry)
+        return entry
+
+    def save(self, session_id: str, username: str, agent: str) -> None:
+        now = time.time()
+        with Config.database.get_connection() as db, SQL_SECONDS.time('save_session'):
+            db.execute(SAVE_SQL, (session_id, username, agent, now))
+
+        with self._lock:
+            # username is unique in the table, so the REPLACE above dropped any older session of this user
+            for stale_id in [key for key, value in self._entries.items() if value.username == username]:
+                del self._entries[stale_id]
+                self._dirty.pop(stale_id, None)
+        self._remember(session_id, SessionEntry(username=username, agent=agent, time=now))
+
+    def resolve(self, session_id: str, agent: str) -> Optional[str]:
+        """Username of a live session with a matching agent; refreshes its last-seen time."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+        if entry is None:
+            entry = self._load(session_id)
+        if entry is None or entry.agent != agent:
+            return None
+
+        now = time.time()
+        if now - entry.time > Config.session_lifetime:
+            self.delete(session_id)
+            return None
+
+        entry.time = now
+        with self._lock:
+            self._dirty[session_id] = now
+        return entry.username
+
+    def check(self, session_id: str, username: str, agent: str) -> bool:
+        return self.resolve(session_id, agent) == username
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._dirty.pop(session_id, None)
+        with Config.database.get_connection() as db, SQL_SECONDS.time('delete_session'):
+            db.execute(DELETE_SQL, (session_id,))
+
+    def flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+
+        with Config.database.get_connection() as db, SQL_SECONDS.time('touch_sessions'):
+            db.executemany(TOUCH_SQL, [(stamp, session_id) for session_id, stamp in dirty.items()])
+        self.flushes += 1
+        logger.debug("Flushed %d session refreshes", len(dirty))
+
+    def sweep(self) -> None:
+        cutoff = time.time() - Config.session_lifetime
+        with self._lock:
+            for session_id in [key for key, value in self._entries.items() if value.time < cutoff]:
+                del self._entries[session_id]
+                self._dirty.pop(session_id, None)
+
+        with Config.database.get_connection() as db, SQL_SECONDS.time('sweep_sessions'):
+            count = db.execute(SWEEP_SQL, (cutoff,)).rowcount
+        if count > 0:
+            self.swept += count
+            logger.info("Expired %d stale sessions", count)
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while not self._stop.wait(Config.session_flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() >= next_sweep:
+                    self.sweep()
+                    next_sweep = time.monotonic() + Config.session_sweep_interval
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Session maintenance failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        logger.info("Starting session maintenance thread")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sessions', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+
+session_store = SessionStore()
+
+registry.callback('sessions_cached', 'Sessions held in the in-process session map.', (),
+                  lambda: [((), len(session_store))])
+registry.callback('sessions_swept_total', 'Stale session rows removed by the sweeper.', (),
+                  lambda: [((), session_store.swept)], 'counter')
+
+
+def _agent() -> str:
+    return cherrypy.request.headers.get('User-Agent', '')
+
+
+def is_authenticated() -> bool:
+    username = cherrypy.session.get('username')
+    if username is None:
+        return False
+    return session_store.check(cherrypy.session.id, username, _agent())
+
+
+def save_session(username: str) -> None:
+    session_store.save(cherrypy.session.id, username, _agent())
+
+
+def delete_session() -> None:
+    session_store.delete(cherrypy.session.id)
+
+
+def authenticate():
+    if not is_authenticated():
+        raise cherrypy.HTTPRedirect("/auth")
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Optional
+
+from app.config import Config
+from app.metrics import TELEGRAM_ERRORS, TELEGRAM_SECONDS
+from app.tracing import Span, attach, current_span
+
+if TYPE_CHECKING:
+    from telegram import Bot, Message
+
+logger = logging.getLogger(__name__)
+
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+GLOBAL_RATE = 30.0
+CHAT_INTERVAL = 1.0
+MAX_RETRIES = 3
+
+
+class TelegramSender:
+    """Owns one event loop thread and one keep-alive Bot API client for the whole process.
+
+    python-telegram-bot is imported by the loop thread, so web processes that never send a
+    message never pay for importing it.
+    """
+
+    def __init__(self) -> None:
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bot: Optional['Bot'] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._next_global = 0.0
+        self._next_chat = dict[int, float]()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+
+            logger.info("Starting telegram sender")
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name='tg-sender', daemon=True)
+            self._thread.start()
+            self._ready.wait()
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.running or self.loop is None:
+                return
+
+            logger.info("Stopping telegram sender")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            assert self._thread is not None
+            self._thread.join()
+            self._thread = None
+
+    def send(self, chat_id: int, text: str) -> 'Future[Message]':
+        self.start()
+        if not self.running or self.loop is None:
+            raise RuntimeError('Telegram sender is not running')
+        return asyncio.run_coroutine_threadsafe(self._send_traced(current_span(), chat_id, text), self.loop)
+
+    async def _send_traced(self, parent: Optional[Span], chat_id: int, text: str) -> 'Message':
+        # the task runs in the sender loop's context, the caller's span tree is handed over explicitly
+        with attach(parent):
+            return await self.send_async(chat_id, text)
+
+    async def send_async(self, chat_id: int, text: str) -> 'Message':
+        # pylint: disable=import-outside-toplevel
+        from telegram.error import RetryAfter
+
+        assert self._bot is not None
+        for attempt in range(1, MAX_RETRIES + 1):
+            await self._throttle(chat_id)
+            try:
+                with TELEGRAM_SECONDS.time():
+                    return await self._bot.send_message(chat_id=chat_id, text=text)
+            except RetryAfter as exception:
+                if attempt == MAX_RETRIES:
+                    TELEGRAM_ERRORS.inc()
+                    raise
+                logger.warning("Telegram rate limit hit for chat %d, retry after %ds (attempt %d)",
+                               chat_id, exception.retry_after, attempt)
+                self._next_global = max(self._next_global, self._now() + exception.retry_after)
+            except Exception:
+                TELEGRAM_ERRORS.inc()
+                raise
+
+        raise AssertionError('unreachable')
+
+    def _now(self) -> float:
+        assert self.loop is not None
+        return self.loop.time()
+
+    async def _throttle(self, chat_id: int) -> None:
+        # runs only on the sender loop, so reserving a slot needs no lock
+        now = self._now()
+        slot = max(now, self._next_global, self._next_chat.get(chat_id, 0.0))
+        self._next_global = slot + 1 / GLOBAL_RATE
+        self._next_chat[chat_id] = slot + CHAT_INTERVAL
+
+        if len(self._next_chat) > 1024:
+            self._next_chat = {key: value for key, value in self._next_chat.items() if value > now}
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _run(self) -> None:
+        # pylint: disable=import-outside-toplevel
+        from telegram import Bot
+        from telegram.request import HTTPXRequest
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        request = HTTPXRequest(connection_pool_size=Config.telegram_pool_size)
+        self._bot = Bot(Config.telegram_bot_token, base_url=Config.telegram_api_url, request=request)
+        try:
+            self.loop.run_until_complete(self._bot.initialize())
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Telegram sender failed to initialize")
+            self.loop.close()
+            return
+        finally:
+            self._ready.set()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self.loop)
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.run_until_complete(self._bot.shutdown())
+            self.loop.close()
+            logger.debug("Telegram sender loop closed")
+
+
+telegram_sender = TelegramSender()
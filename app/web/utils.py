@@ -1,23 +1,61 @@
-import asyncio
+import concurrent.futures
 import logging
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
 
 import cherrypy
-from telegram.ext import ApplicationBuilder
 
 from app.config import Config
-from app.web.hooks import normalize_username
+from app.web.hooks import (MetricsTool, TraceTool, normalize_username,
+                           rate_limit)
+from app.web.sessions import authenticate
+from app.web.tg_sender import telegram_sender
+
+if TYPE_CHECKING:
+    from telegram import Message
 
 logger = logging.getLogger(__name__)
 
 
-async def tg_send_msg(chat_id: int, text: str):
-    application = ApplicationBuilder().token(Config.telegram_bot_token).build()
-    await application.bot.sendMessage(chat_id=chat_id, text=text)
+def _log_tg_send_result(future: 'Future[Message]'):
+    if future.cancelled():
+        return
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Telegram message delivery failed: %s", exception)
+
+
+def run_tg_send_msg(chat_id: int, text: str) -> 'Future[Message]':
+    future = telegram_sender.send(chat_id, text)
+    future.add_done_callback(_log_tg_send_result)
+    return future
+
 
+def deliver_tg_msg(chat_id: int, text: str) -> bool:
+    """Sends a message and waits up to TELEGRAM_SEND_TIMEOUT for Telegram to accept it."""
+    try:
+        future = run_tg_send_msg(chat_id, text)
+    except RuntimeError:
+        logger.error("Telegram sender failed to start")
+        return False
 
-def run_tg_send_msg(chat_id: int, text: str):
-    asyncio.run(tg_send_msg(chat_id, text))
+    try:
+        future.result(Config.telegram_send_timeout)
+    except concurrent.futures.TimeoutError:
+        # the caller treats the message as not sent, so it must not go out later
+        future.cancel()
+        logger.error("Telegram message delivery to %d timed out", chat_id)
+        return False
+    except Exception:  # pylint: disable=broad-exception-caught
+        # already logged by _log_tg_send_result
+        return False
+    return True
 
 
 def init_hooks():
+    # rate_limit runs before normalize_username so rejected requests never reach LDAP
+    cherrypy.tools.rate_limit = cherrypy.Tool('before_handler', rate_limit, priority=10)
     cherrypy.tools.normalize_username = cherrypy.Tool('before_handler', normalize_username)
+    cherrypy.tools.metrics = MetricsTool()
+    cherrypy.tools.trace = TraceTool()
+    cherrypy.tools.authenticate = cherrypy.Tool('before_handler', authenticate)
@@ -1,5 +1,11 @@
+import cherrypy
+
 from app.common.web import Web as CommonWeb
+from app.config import Config
+from app.models import directory_sync, profile_refresher, token_store
 
+from .sessions import session_store
+from .tg_sender import telegram_sender
 from .utils import init_hooks
 
 init_hooks()
@@ -16,8 +22,25 @@ from .controllers import Root  # noqa: E402
 class Web:
     @staticmethod
     def start():
+        session_store.start()
+        token_store.start()
+        profile_refresher.start()
+        directory_sync.start()
+        if Config.bot_webhook_embedded:
+            # pylint: disable=import-outside-toplevel
+            from app.bot import Bot, WebhookReceiver
+            cherrypy.tree.mount(Bot().start_embedded(), Config.bot_webhook_path, WebhookReceiver.config)
         CommonWeb.start(Root())
 
     @staticmethod
     def stop():
         CommonWeb.stop()
+        if Config.bot_webhook_embedded:
+            # pylint: disable=import-outside-toplevel
+            from app.bot import Bot
+            Bot().stop()
+        directory_sync.stop()
+        profile_refresher.stop()
+        token_store.stop()
+        session_store.stop()
+        telegram_sender.stop()
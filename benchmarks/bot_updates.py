@@ -0,0 +1,193 @@
+"""Update throughput of the bot in polling and webhook mode.
+
+The bot runs in a child process (``--serve``) against a local fake Bot API. Every synthetic
+update is a /help command from its own chat, so the numbers reflect update transport and
+dispatch rather than LDAP or SQLite. In polling mode the updates are queued on the fake API
+and handed out through getUpdates; in webhook mode they are POSTed to the receiver by
+``--concurrency`` client threads, the way Telegram delivers them in parallel.
+
+Usage: python -m benchmarks.bot_updates --updates 2000 --concurrency 16 --output bot.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+from .fake_telegram import FakeTelegramServer
+
+MODES = ('polling', 'webhook')
+SECRET = 'bench-secret'
+CHAT_ID_BASE = 700_000_000
+WARMUP_CHAT_ID = CHAT_ID_BASE - 1
+
+
+def help_update(update_id: int, chat_id: int) -> dict[str, Any]:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Bench'},
+            'text': '/help',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 5}],
+        },
+    }
+
+
+# ---------------------------------------------------------------- server side
+
+
+def serve() -> None:
+    from app.bot import Bot
+    from app.config import Config
+
+    Config.load()
+    Bot().start()
+
+
+# ---------------------------------------------------------------- client side
+
+
+class WebhookClient:
+    def __init__(self, port: int) -> None:
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def post(self, update: dict[str, Any]) -> int:
+        body = json.dumps(update)
+        headers = {'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': SECRET}
+        try:
+            self.connection.request('POST', '/webhook', body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return -1
+        return response.status
+
+
+def deliver(mode: str, update: dict[str, Any], telegram: FakeTelegramServer, port: int) -> None:
+    if mode == 'polling':
+        telegram.push_update(update)
+    else:
+        WebhookClient(port).post(update)
+
+
+def wait_for_reply(telegram: FakeTelegramServer, chat_id: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if chat_id in telegram.delivered:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict[str, Any]:
+    telegram = FakeTelegramServer().start()
+    env = dict(os.environ, TELEGRAM_API_URL=telegram.base_url, BOT_MODE=mode,
+               BOT_WEBHOOK_URL=f'http://127.0.0.1:{args.port}/webhook', BOT_WEBHOOK_SECRET=SECRET,
+               BOT_WEBHOOK_LISTEN=f'127.0.0.1:{args.port}', BOT_UPDATE_QUEUE_SIZE=str(args.queue_size))
+    bot = subprocess.Popen([sys.executable, '-m', 'benchmarks.bot_updates', '--serve'], env=env)
+    try:
+        # the listener comes up after setWebhook, so keep retrying the first update until it is answered
+        deadline = time.monotonic() + 30
+        while not wait_for_reply(telegram, WARMUP_CHAT_ID, 1):
+            if time.monotonic() > deadline or bot.poll() is not None:
+                raise SystemExit(f'{mode} bot failed to start')
+            deliver(mode, help_update(1, WARMUP_CHAT_ID), telegram, args.port)
+
+        sent_at = dict[int, float]()
+        rejected = 0
+        counter = iter(range(args.updates))
+        lock = threading.Lock()
+
+        def worker() -> None:
+            nonlocal rejected
+            client = WebhookClient(args.port) if mode == 'webhook' else None
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                chat_id = CHAT_ID_BASE + index
+                update = help_update(index + 2, chat_id)
+                sent_at[chat_id] = time.monotonic()
+                if client is None:
+                    telegram.push_update(update)
+                elif client.post(update) != 200:
+                    with lock:
+                        rejected += 1
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=worker) for _ in range(args.concurrency if mode == 'webhook' else 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        while len(telegram.delivered) - 1 < args.updates - rejected and time.monotonic() - start < args.timeout:
+            time.sleep(0.01)
+        wall = time.monotonic() - start
+    finally:
+        bot.terminate()
+        bot.wait()
+        telegram.shutdown()
+
+    latencies = [telegram.delivered[chat_id] - sent for chat_id, sent in sent_at.items()
+                 if chat_id in telegram.delivered]
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'updates': args.updates,
+        'answered': len(latencies),
+        'rejected': rejected,
+        'updates_per_second': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        'p50_ms': round(quantiles[49] * 1000, 2) if quantiles else None,
+        'p95_ms': round(quantiles[94] * 1000, 2) if quantiles else None,
+        'p99_ms': round(quantiles[98] * 1000, 2) if quantiles else None,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    results = {mode: run_mode(mode, args) for mode in args.modes}
+    report = {
+        'benchmark': 'bot_updates',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'updates': args.updates, 'concurrency': args.concurrency, 'queue_size': args.queue_size},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16, help='parallel webhook deliveries')
+    parser.add_argument('--queue-size', type=int, default=1024)
+    parser.add_argument('--port', type=int, default=18443)
+    parser.add_argument('--timeout', type=float, default=120.0, help='seconds to wait for all replies')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--output')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.serve:
+        serve()
+    else:
+        main(arguments)
@@ -0,0 +1,141 @@
+"""Throughput of the directory sync (app.models.directory_sync) against an ldap3 mock directory.
+
+Seeds ``--users`` user objects into a MOCK_SYNC directory and binds ``--bound`` of them to rows in
+Config.database, then runs a full pass, changes ``--changes`` objects (new display names, every
+tenth one renamed), deletes ``--deletes`` and runs an incremental pass followed by a full one. The
+mock has no show-deleted control and no highestCommittedUSN, so deletions are found by the full
+pass and the high-water mark is the highest uSNChanged seen; the counts in ``checks`` show what
+each pass picked up. Point the environment at a scratch database before running it.
+
+Usage: python -m benchmarks.directory_sync --users 20000 --bound 2000 --page-size 500 --output sync.json
+"""
+import argparse
+import json
+import platform
+import time
+import uuid
+from typing import Any
+
+SEARCH_BASE = 'dc=bench,dc=local'
+SERVICE_DN = f'cn=svc,{SEARCH_BASE}'
+DOMAIN = 'bench.local'
+
+
+def user_dn(index: int) -> str:
+    return f'cn=sync{index},ou=users,{SEARCH_BASE}'
+
+
+def seed(args: argparse.Namespace) -> Any:
+    from ldap3 import MOCK_SYNC, OFFLINE_AD_2012_R2, Connection, Server
+
+    from app.config import Config
+    from app.directory import DirectoryReader, LDAPConnectionPool
+
+    server = Server('sync-mock', get_info=OFFLINE_AD_2012_R2)  # type: ignore[arg-type]
+    connection = Connection(server, SERVICE_DN, 'svc', client_strategy=MOCK_SYNC)
+    connection.strategy.add_entry(SERVICE_DN, {'objectClass': 'person', 'userPassword': 'svc'})
+    for index in range(args.users):
+        connection.strategy.add_entry(user_dn(index), {
+            'objectClass': 'user',
+            'objectGUID': uuid.UUID(int=index + 1).bytes_le,
+            'sAMAccountName': f'sync{index}',
+            'userPrincipalName': f'sync{index}@{DOMAIN}',
+            'displayName': f'Sync User {index}',
+            'userAccountControl': '512',
+            'uSNChanged': str(index + 1),
+        })
+    connection.bind()
+
+    pool = LDAPConnectionPool(server, SERVICE_DN, 'svc', size=2, client_strategy=MOCK_SYNC)
+    Config.directory_reader = DirectoryReader(pool, SEARCH_BASE, args.page_size, show_deleted=False)
+
+    step = max(args.users // max(args.bound, 1), 1)
+    rows = [(f'sync{index}@{DOMAIN}', 700_000_000 + index) for index in range(0, args.users, step)][:args.bound]
+    with Config.database.get_connection() as db:
+        db.executemany('INSERT OR IGNORE INTO "users" ("login", "telegram", "bind_dest") VALUES (?, ?, 0)', rows)
+    return connection
+
+
+def change(connection: Any, args: argparse.Namespace) -> None:
+    usn = args.users
+    for index in range(args.changes):
+        usn += 1
+        changes = {'displayName': [('MODIFY_REPLACE', [f'Changed User {index}'])],
+                   'uSNChanged': [('MODIFY_REPLACE', [str(usn)])]}
+        if index % 10 == 0:
+            changes['userPrincipalName'] = [('MODIFY_REPLACE', [f'renamed{index}@{DOMAIN}'])]
+        connection.modify(user_dn(index), changes)
+    for index in range(args.users - args.deletes, args.users):
+        connection.delete(user_dn(index))
+
+
+def timed_pass(full: bool) -> dict[str, Any]:
+    from app.models import directory_sync
+
+    start = time.perf_counter()
+    entries = directory_sync.sync(full)
+    seconds = time.perf_counter() - start
+    return {'entries': entries, 'seconds': round(seconds, 3), 'entries_per_s': round(entries / seconds, 1),
+            'usn': directory_sync.usn}
+
+
+def count(sql: str) -> int:
+    from app.config import Config
+
+    return Config.database.execute(sql).fetchone()[0]
+
+
+def main(args: argparse.Namespace) -> None:
+    from app.common.database.migrations import apply_migrations
+    from app.config import Config
+
+    Config.load()
+    apply_migrations()
+    connection = seed(args)
+
+    results = {'full': timed_pass(True)}
+    linked = count('SELECT COUNT(*) FROM "users" WHERE "ldap_guid" IS NOT NULL')
+    change(connection, args)
+    results['incremental'] = timed_pass(False)
+    changed = count('SELECT COUNT(*) FROM "directory_users" WHERE "display_name" LIKE \'Changed User %\'')
+    renamed = count('SELECT COUNT(*) FROM "users" WHERE "login" LIKE \'renamed%\'')
+    results['full_after_changes'] = timed_pass(True)
+
+    report = {
+        'benchmark': 'directory_sync',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'users': args.users, 'bound': args.bound, 'changes': args.changes, 'deletes': args.deletes,
+                       'page_size': args.page_size},
+        'results': results,
+        'checks': {
+            'linked_users': linked,
+            'changed_entries': changed,
+            'renamed_users': renamed,
+            'deleted_entries': count('SELECT COUNT(*) FROM "directory_users" WHERE "deleted" = 1'),
+            'deleted_bindings': count('SELECT COUNT(*) FROM "users" WHERE "deleted_at" IS NOT NULL'),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--bound', type=int, default=2000, help='directory users with a row in the users table')
+    parser.add_argument('--changes', type=int, default=500)
+    parser.add_argument('--deletes', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
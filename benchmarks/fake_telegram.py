@@ -0,0 +1,102 @@
+"""Minimal local stand-in for the Telegram Bot API.
+
+Answers getMe and sendMessage for any token and remembers the last text sent to each chat,
+so benchmarks and tests can pick up reset codes without talking to Telegram. Updates pushed
+with ``push_update`` are handed out through getUpdates long polling; sends to chats in
+``unreachable`` are refused the way Telegram refuses a chat that blocked the bot.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeTelegramServer'
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+    def _payload(self) -> dict[str, Any]:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body or b'{}')
+        return {key: value[0] for key, value in parse_qs(body.decode()).items()}
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        method = self.path.rsplit('/', 1)[-1]
+        payload = self._payload()
+        status = 200
+        if method == 'getMe':
+            result: Any = {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}}
+        elif method == 'sendMessage' and int(payload['chat_id']) in self.server.unreachable:
+            status = 403
+            result = {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}
+        elif method == 'sendMessage':
+            result = {'ok': True, 'result': self.server.record(int(payload['chat_id']), str(payload.get('text', '')))}
+        elif method == 'getUpdates':
+            updates = self.server.poll(int(payload.get('offset') or 0), float(payload.get('timeout') or 0))
+            result = {'ok': True, 'result': updates}
+        else:
+            result = {'ok': True, 'result': True}
+
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        super().__init__((host, port), FakeTelegramHandler)
+        self._lock = threading.Lock()
+        self._updates = threading.Condition(self._lock)
+        self._pending = list[dict[str, Any]]()
+        self.messages = dict[int, str]()
+        self.unreachable = set[int]()
+        self.delivered = dict[int, float]()
+        self.sent = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host!s}:{port}/bot'
+
+    def record(self, chat_id: int, text: str) -> dict[str, Any]:
+        with self._lock:
+            self.messages[chat_id] = text
+            self.delivered[chat_id] = time.monotonic()
+            self.sent += 1
+            message_id = self.sent
+        return {'message_id': message_id, 'date': 0, 'text': text,
+                'chat': {'id': chat_id, 'type': 'private'}}
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # clients under test are killed mid-request at the end of a run
+        pass
+
+    def push_update(self, update: dict[str, Any]) -> None:
+        with self._updates:
+            self._pending.append(update)
+            self._updates.notify_all()
+
+    def poll(self, offset: int, timeout: float) -> list[dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._updates:
+            self._pending = [update for update in self._pending if update['update_id'] >= offset]
+            while not self._pending and (remaining := deadline - time.monotonic()) > 0:
+                self._updates.wait(remaining)
+            return self._pending[:100]
+
+    def start(self) -> 'FakeTelegramServer':
+        threading.Thread(target=self.serve_forever, name='fake-telegram', daemon=True).start()
+        return self
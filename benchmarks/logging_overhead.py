@@ -0,0 +1,159 @@
+"""What logging costs a request, with the file handler on the request thread and behind app.log's queue.
+
+``--threads`` threads each serve ``--requests`` simulated requests that log the lines a reset
+request logs today (a lookup, a found user, a Telegram send, a rate-limit check) around a little
+CPU work. ``direct`` writes them the way Config.setup_app_logger sets up the root logger, every
+other mode goes through app.log.setup_queue_logging. ``--disk-latency`` adds a delay to every
+write, standing in for a busy or network-backed log volume. The latency of the bare work is
+reported as ``none`` for reference.
+
+Usage: python -m benchmarks.logging_overhead --threads 16 --requests 2000 --output logging.json
+       python -m benchmarks.logging_overhead --disk-latency 1 --modes none direct queue queue_sampled
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.log import setup_queue_logging, stop_queue_logging
+
+MODES = ('none', 'direct', 'queue', 'queue_json', 'queue_sampled')
+FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+@dataclass
+class BenchUser:
+    id: int
+    login: str
+    email2: Optional[str] = None
+    phone: Optional[int] = None
+    telegram: Optional[int] = None
+
+
+class SlowFileHandler(logging.FileHandler):
+    def __init__(self, filename: str, latency: float) -> None:
+        super().__init__(filename, encoding='utf-8')
+        self.latency = latency
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+def configure(mode: str, path: str, latency: float) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.INFO)
+    if mode == 'none':
+        root.setLevel(logging.CRITICAL)
+        return
+
+    handler = SlowFileHandler(path, latency)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    root.addHandler(handler)
+    if mode != 'direct':
+        sampling = {'bench.models': 0.1, 'bench.web': 0.1} if mode == 'queue_sampled' else None
+        setup_queue_logging(100_000, mode == 'queue_json', sampling)
+
+
+def request(index: int) -> None:
+    models = logging.getLogger('bench.models')
+    web = logging.getLogger('bench.web')
+    login = f'bench{index % 1000}@bench.local'
+    user = BenchUser(index, login, telegram=900_000_000 + index)
+
+    web.info("Rate limit check for %s from %s", login, '10.0.0.1')
+    models.info("Looking up %s", login)
+    hashlib.sha256(login.encode() * 64).hexdigest()
+    models.info("User found: %s", user.login)
+    web.info("Reset via Telegram for user: %s", login)
+    hashlib.sha256(login.encode() * 64).hexdigest()
+    logging.getLogger('bench.telegram').info("Sending message to %d", user.telegram)
+
+
+def run_mode(mode: str, args: argparse.Namespace, directory: str) -> dict[str, Any]:
+    path = os.path.join(directory, f'{mode}.log')
+    configure(mode, path, args.disk_latency / 1000)
+    latencies = list[float]()
+    lock = threading.Lock()
+
+    def worker(offset: int) -> None:
+        mine = []
+        for index in range(offset, offset + args.requests):
+            start = time.perf_counter()
+            request(index)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(index * args.requests,)) for index in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    # the queue modes finish writing here, after the requests were answered
+    stop_queue_logging()
+    drained = time.perf_counter() - start
+    configure('none', path, 0)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    lines = 0
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / wall, 1),
+        'p50_us': round(quantiles[49] * 1e6, 1),
+        'p99_us': round(quantiles[98] * 1e6, 1),
+        'mean_us': round(statistics.fmean(latencies) * 1e6, 1),
+        'drained_s': round(drained, 2),
+        'lines': lines,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        results = {mode: run_mode(mode, args, directory) for mode in args.modes}
+    report = {
+        'benchmark': 'logging_overhead',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'threads': args.threads, 'requests': args.requests, 'disk_latency_ms': args.disk_latency},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per thread')
+    parser.add_argument('--disk-latency', type=float, default=0.0, help='milliseconds added to every write')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,125 @@
+"""Micro-benchmark for the normalize_username hook (app.web.hooks.normalize_username.normalized_login).
+
+Feeds ``--calls`` usernames drawn from ``--users`` accounts, a few popular ones taking most of
+the traffic, mixed with unsupported domains and malformed input, through the hook's
+normalization. The directory is a stand-in whose normalize_login sleeps ``--ldap-latency``
+milliseconds. ``legacy`` is the hook before the memo cache, ``memo`` the current default and
+``local`` runs with LOGIN_NORMALIZE_LOCAL.
+
+Usage: python -m benchmarks.normalize_username --calls 20000 --ldap-latency 2 --output normalize.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from typing import Any, Optional
+
+from app.cache import TTLCache
+from app.config import Config
+from app.web.hooks.normalize_username import normalized_login
+
+MODES = ('legacy', 'memo', 'local')
+DOMAINS = ['vtl.edu', 'vtl.in.ua']
+
+
+class SlowDirectory:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    def normalize_login(self, login: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return login.lower()
+
+
+def legacy_normalized_login(username: str) -> Optional[str]:
+    username_part = username.split('@')
+    if len(username_part) == 2:
+        if username_part[1] not in Config.login_supported_domain:
+            return None
+        return Config.ldap_descriptor.normalize_login(username_part[0])
+    return Config.ldap_descriptor.normalize_login(username)
+
+
+def usernames(count: int, users: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    names = list[str]()
+    for _ in range(count):
+        kind = rng.random()
+        index = min(int(rng.paretovariate(0.5)) - 1, users - 1)
+        if kind < 0.08:
+            names.append(f'user{index}@gmail.com')
+        elif kind < 0.10:
+            names.append(rng.choice(['', 'a b', 'x@y@vtl.edu', 'user;drop', '*']))
+        elif kind < 0.55:
+            names.append(f'User{index}@{rng.choice(DOMAINS)}')
+        else:
+            names.append(f'user{index}')
+    return names
+
+
+def run_mode(mode: str, names: list[str], latency: float) -> dict[str, Any]:
+    directory = SlowDirectory(latency)
+    Config.ldap_descriptor = directory
+    Config.login_cache = TTLCache(4096, 3600.0)
+    Config.login_normalize_local = mode == 'local'
+    normalize = legacy_normalized_login if mode == 'legacy' else normalized_login
+
+    latencies = list[float]()
+    start = time.perf_counter()
+    for name in names:
+        call_start = time.perf_counter()
+        normalize(name)
+        latencies.append(time.perf_counter() - call_start)
+    wall = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'calls': len(names),
+        'directory_calls': directory.calls,
+        'mean_us': round(statistics.fmean(latencies) * 1e6, 2),
+        'p50_us': round(quantiles[49] * 1e6, 2),
+        'p99_us': round(quantiles[98] * 1e6, 2),
+        'wall_s': round(wall, 3),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    Config.login_supported_domain = DOMAINS
+    Config.login_supported_domains = frozenset(DOMAINS)
+    names = usernames(args.calls, args.users, args.seed)
+    results = {mode: run_mode(mode, names, args.ldap_latency / 1000) for mode in args.modes}
+    report = {
+        'benchmark': 'normalize_username',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'calls': args.calls, 'users': args.users, 'ldap_latency_ms': args.ldap_latency,
+                       'seed': args.seed},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--ldap-latency', type=float, default=2.0, help='milliseconds per directory call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
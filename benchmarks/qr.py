@@ -0,0 +1,52 @@
+"""Compare the inline base64 QR data URI with the cached QR endpoint.
+
+Usage: python -m benchmarks.qr [iterations]
+"""
+import base64
+import sys
+import timeit
+from io import BytesIO
+
+import qrcode
+
+from app.cache import TTLCache
+from app.config import Config
+from app.web.qr import qr_image
+
+URL = 'otpauth://totp/VTL%20User%20Reset%20App:user%40vtl.edu?secret=JBSWY3DPEHPK3PXPJBSWY3DPEHPK3PXP' \
+      '&issuer=VTL%20User%20Reset%20App'
+
+
+def inline_data_uri() -> str:
+    buffer = BytesIO()
+    qrcode.make(URL).save(buffer)
+    return "data:image/png;base64,{}".format(base64.b64encode(buffer.getvalue()).decode())
+
+
+def cached_image() -> bytes:
+    return qr_image(URL)
+
+
+def cold_image() -> bytes:
+    Config.qr_cache.clear()
+    return qr_image(URL)
+
+
+def main(iterations: int) -> None:
+    Config.qr_cache = TTLCache(256, 3600)
+    image = cached_image()
+    # the page only carries the endpoint path, the payload is rebuilt server-side
+    path = len('/user/qr/otp')
+    sizes = {
+        'inline': len(inline_data_uri()),
+        'cold': path,
+        'cached': path,
+    }
+    print(f"{'path':<8} {'us/call':>10} {'html bytes':>11}   (endpoint image: {len(image)} bytes)")
+    for name, func in (('inline', inline_data_uri), ('cold', cold_image), ('cached', cached_image)):
+        seconds = timeit.timeit(func, number=iterations)
+        print(f"{name:<8} {seconds / iterations * 1e6:>10.1f} {sizes[name]:>11}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,239 @@
+"""Concurrent writers from a web and a bot process against one SQLite file.
+
+Both children load Config the way main_web.py and main_bot.py do and write through the app's
+own code paths for ``--seconds``: the web process saves, refreshes and deletes sessions and
+saves users from ``--threads`` threads, the bot process saves users from ``--tasks`` asyncio
+tasks through the model executor. Every statement that fails with "database is locked" is
+counted. ``--modes legacy`` replays the same load on a fresh connection per call in rollback
+journal mode, the way Config.database behaved before app.db. Point the environment at a
+scratch database before running it.
+
+Usage: python -m benchmarks.sqlite_stress --seconds 10 --threads 8 --tasks 32 --output sqlite.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+MODES = ('wal', 'legacy')
+ROLES = ('web', 'bot')
+USERS = 1000
+
+
+class LegacyDatabase:
+    """What the app had before app.db: a new connection per call, default journal and locking."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        connection = sqlite3.connect(self.path)
+        cursor = connection.execute(sql, parameters)
+        connection.commit()
+        return cursor
+
+    @contextmanager
+    def get_connection(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+# ---------------------------------------------------------------- server side
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies = list[float]()
+        self.locked = 0
+        self.errors = 0
+
+    def call(self, func: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        try:
+            func()
+        except sqlite3.OperationalError as exception:
+            with self._lock:
+                if 'locked' in str(exception) or 'busy' in str(exception):
+                    self.locked += 1
+                else:
+                    self.errors += 1
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+
+
+def user(index: int, role: str) -> Any:
+    from app.models import User
+
+    saved = User(id=index + 1, login=f'stress{index}@bench.local')
+    saved.mark_clean()
+    saved.phone = random.randrange(1_000_000, 9_999_999)
+    saved.email2 = f'{role}-{time.monotonic_ns()}@bench.local'
+    return saved
+
+
+def web_worker(deadline: float, recorder: Recorder) -> None:
+    from app.web.sessions import session_store
+
+    while time.monotonic() < deadline:
+        index = random.randrange(USERS)
+        session_id = f'stress-{threading.get_ident()}-{index}'
+        recorder.call(lambda: session_store.save(session_id, f'stress{index}@bench.local', 'stress'))
+        recorder.call(lambda: user(index, 'web').save())
+        recorder.call(session_store.flush)
+        recorder.call(lambda: session_store.delete(session_id))
+
+
+async def bot_worker(deadline: float, recorder: Recorder) -> None:
+    from app.models.aio import run_sync
+
+    while time.monotonic() < deadline:
+        saved = user(random.randrange(USERS), 'bot')
+        await run_sync(recorder.call, saved.save)
+
+
+async def bot_workers(tasks: int, deadline: float, recorder: Recorder) -> None:
+    await asyncio.gather(*[bot_worker(deadline, recorder) for _ in range(tasks)])
+
+
+def serve(args: argparse.Namespace) -> None:
+    from app.config import Config
+    from app.db import database_path
+
+    Config.load()
+    if args.mode == 'legacy':
+        path = database_path(Config.database)
+        Config.database.close()
+        Config.database = LegacyDatabase(path)
+        # journal_mode=WAL is persistent and Config.load() just set it, both children switch back before the start
+        Config.database.execute('PRAGMA journal_mode=DELETE')
+
+    time.sleep(max(0.0, args.start_at - time.time()))
+    deadline = time.monotonic() + args.seconds
+    recorder = Recorder()
+    start = time.perf_counter()
+    if args.role == 'web':
+        threads = [threading.Thread(target=web_worker, args=(deadline, recorder)) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        asyncio.run(bot_workers(args.tasks, deadline, recorder))
+    wall = time.perf_counter() - start
+
+    print(json.dumps(summarize(recorder, wall)), flush=True)
+
+
+def summarize(recorder: Recorder, wall: float) -> dict[str, float]:
+    latencies = recorder.latencies or [0.0]
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'statements': len(recorder.latencies),
+        'locked': recorder.locked,
+        'errors': recorder.errors,
+        'ops': round(len(recorder.latencies) / wall, 1) if wall > 0 else 0.0,
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+# ---------------------------------------------------------------- client side
+
+
+def prepare() -> None:
+    from app.common.database.migrations import apply_migrations
+    from app.config import Config
+
+    Config.load()
+    apply_migrations()
+    rows = [(index + 1, f'stress{index}@bench.local') for index in range(USERS)]
+    with Config.database.get_connection() as db:
+        db.executemany('INSERT OR IGNORE INTO "users" ("id", "login", "bind_dest") VALUES (?, ?, 0)', rows)
+    Config.database.close()
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict[str, Any]:
+    subprocess.run([sys.executable, '-m', 'benchmarks.sqlite_stress', '--prepare'], check=True)
+
+    start_at = time.time() + args.warmup
+    children = {}
+    for role in ROLES:
+        command = [sys.executable, '-m', 'benchmarks.sqlite_stress', '--serve', '--mode', mode, '--role', role,
+                   '--seconds', str(args.seconds), '--threads', str(args.threads), '--tasks', str(args.tasks),
+                   '--start-at', str(start_at)]
+        children[role] = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+    results = {}
+    for role, child in children.items():
+        output, _ = child.communicate()
+        if child.returncode != 0:
+            raise SystemExit(f'{mode} {role} process failed with exit code {child.returncode}')
+        results[role] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    results = {mode: run_mode(mode, args) for mode in args.modes}
+    report = {
+        'benchmark': 'sqlite_stress',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'parameters': {'seconds': args.seconds, 'threads': args.threads, 'tasks': args.tasks, 'users': USERS},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    locked = sum(result['locked'] for result in results.get('wal', {}).values())
+    if locked:
+        raise SystemExit(f'{locked} statements failed with "database is locked" in WAL mode')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=8, help='writer threads in the web process')
+    parser.add_argument('--tasks', type=int, default=32, help='writer tasks in the bot process')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds both processes get to load Config')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=['wal'])
+    parser.add_argument('--output')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES, default='wal', help=argparse.SUPPRESS)
+    parser.add_argument('--role', choices=ROLES, default='web', help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, default=0.0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.prepare:
+        prepare()
+    elif arguments.serve:
+        serve(arguments)
+    else:
+        main(arguments)
@@ -0,0 +1,98 @@
+"""Cold-start cost of the web process: time to import app.web and time to first request.
+
+Time to first request is measured from spawning ``benchmarks.web_load --serve`` until
+GET /auth/ answers 200, so it covers interpreter start, imports, Config.load, migrations,
+asset manifest and template loads. With ``--budget`` the run fails when the median exceeds it.
+The import-time budget itself is enforced by tests/test_startup.py.
+
+Usage: python -m benchmarks.startup --runs 5 --budget 3.0 --output startup.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from .fake_telegram import FakeTelegramServer
+
+
+def time_import(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+    return time.perf_counter() - start
+
+
+def first_request_ok(port: int) -> bool:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+    try:
+        connection.request('GET', '/auth/')
+        return connection.getresponse().status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+def time_to_first_request(port: int, env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.web_load', '--serve', '--port', str(port),
+                               '--users', '1'], env=env, stdout=subprocess.DEVNULL)
+    try:
+        while not first_request_ok(port):
+            if server.poll() is not None:
+                raise SystemExit('benchmark server failed to start')
+            time.sleep(0.005)
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args: argparse.Namespace) -> None:
+    telegram = FakeTelegramServer().start()
+    env = dict(os.environ, TELEGRAM_API_URL=telegram.base_url)
+    imports = [time_import('app.web') for _ in range(args.runs)]
+    first_request = [time_to_first_request(args.port, env) for _ in range(args.runs)]
+    telegram.shutdown()
+
+    median = statistics.median(first_request)
+    within_budget = args.budget is None or median <= args.budget
+    report = {
+        'benchmark': 'startup',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'runs': args.runs, 'budget_s': args.budget},
+        'results': {
+            'import_app_web_s': round(statistics.median(imports), 3),
+            'first_request_s': round(median, 3),
+            'first_request_min_s': round(min(first_request), 3),
+            'within_budget': within_budget,
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    if not within_budget:
+        raise SystemExit(f'time to first request {median:.3f}s is over the {args.budget}s budget')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, help='fail when the median time to first request exceeds this')
+    parser.add_argument('--port', type=int, default=18081)
+    parser.add_argument('--output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,367 @@
+"""Reproducible load test for the CherryPy app (app.web.controllers.Root) and the ASGI app (app.asgi).
+
+The server runs in a child process (``--serve``), one per mode in ``--modes``. It loads Config the
+same way main_web.py does, swaps Config.ldap_descriptor for an ldap3 MOCK_SYNC directory seeded with
+``--users`` accounts, points the Telegram sender at a local fake Bot API and seeds matching rows into
+Config.database. ``--ldap-latency`` adds a fixed delay to every directory call, standing in for the
+network round-trip a real domain controller costs; the mock directory scans every entry on each
+search, so keep ``--users`` small when comparing modes or it measures ldap3 instead of the server.
+The user_index flow logs every client in as its own account and a new login ends the previous
+session of that account, so it needs ``--users`` of at least ``--concurrency``.
+Point the environment at a scratch database before running it.
+
+Usage: python -m benchmarks.web_load --users 5000 --concurrency 32 --requests 2000 --output web.json
+       python -m benchmarks.web_load --modes cherrypy asgi --users 50 --concurrency 500 --ldap-latency 50 \
+           --flows login reset_post reset_typed
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+from .fake_telegram import FakeTelegramServer
+
+MODES = ('cherrypy', 'asgi')
+FLOWS = ('login', 'user_index', 'reset_post', 'reset_typed', 'reset_save')
+PASSWORD = 'Bench-Pass-1'
+SEARCH_BASE = 'dc=bench,dc=local'
+SERVICE_DN = f'cn=svc,{SEARCH_BASE}'
+TELEGRAM_ID_BASE = 900_000_000
+
+
+def login_name(index: int) -> str:
+    return f'bench{index}'
+
+
+# ---------------------------------------------------------------- server side
+
+
+def seed_directory(users: int, domain: str, latency: float = 0.0):
+    from ldap3 import MOCK_SYNC, OFFLINE_AD_2012_R2, Connection, Server
+
+    from app.directory import LDAPConnectionPool, PooledLDAPDescriptor
+
+    server = Server('bench-mock', get_info=OFFLINE_AD_2012_R2)  # type: ignore[arg-type]
+    connection = Connection(server, SERVICE_DN, 'svc', client_strategy=MOCK_SYNC)
+    connection.strategy.add_entry(SERVICE_DN, {'objectClass': 'person', 'userPassword': 'svc'})
+    for index in range(users):
+        name = login_name(index)
+        connection.strategy.add_entry(f'cn={name},ou=users,{SEARCH_BASE}', {
+            'objectClass': 'user',
+            'sAMAccountName': name,
+            'userPrincipalName': f'{name}@{domain}',
+            'displayName': f'Bench User {index}',
+            'userPassword': PASSWORD,
+        })
+
+    pool = LDAPConnectionPool(server, SERVICE_DN, 'svc', size=8, client_strategy=MOCK_SYNC)
+    descriptor = PooledLDAPDescriptor(pool, SEARCH_BASE)
+    if latency > 0:
+        for name in ('find_user', 'login', 'set_password'):
+            setattr(descriptor, name, delayed(getattr(descriptor, name), latency))
+    return descriptor
+
+
+def delayed(func: Callable, latency: float) -> Callable:
+    def call(*args, **kwargs):
+        time.sleep(latency)
+        return func(*args, **kwargs)
+
+    return call
+
+
+def seed_database(users: int, domain: str) -> None:
+    from app.config import Config
+
+    rows = [(f'{login_name(index)}@{domain}', TELEGRAM_ID_BASE + index) for index in range(users)]
+    with Config.database.get_connection() as db:
+        db.executemany('INSERT OR IGNORE INTO "users" ("login", "telegram", "bind_dest") VALUES (?, ?, 0)', rows)
+
+
+def serve(args: argparse.Namespace) -> None:
+    from app.common.database.migrations import apply_migrations
+    from app.config import LDAP_OPERATIONS, Config
+    from app.metrics import LDAP_ERRORS, LDAP_SECONDS, InstrumentedProxy
+
+    Config.load()
+    Config.rate_limit_enabled = False
+    if args.io_workers is not None:
+        Config.model_io_workers = args.io_workers
+    apply_migrations()
+    domain = Config.login_supported_domain[0]
+    directory = seed_directory(args.users, domain, args.ldap_latency / 1000)
+    # wrapped like the real directory, so its calls show in metrics and traces
+    Config.ldap_descriptor = InstrumentedProxy(directory, LDAP_OPERATIONS, LDAP_SECONDS, LDAP_ERRORS)
+    Config.ldap_user_cache.clear()
+    seed_database(args.users, domain)
+
+    if args.mode == 'asgi':
+        serve_asgi(args)
+    else:
+        serve_cherrypy(args)
+
+
+def serve_asgi(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from app.asgi import AsgiApp
+
+    config = uvicorn.Config(AsgiApp(), host='127.0.0.1', port=args.port, lifespan='on', access_log=False,
+                            log_config=None, backlog=max(2048, args.concurrency * 2))
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run)
+    thread.start()
+    while not server.started and thread.is_alive():
+        time.sleep(0.05)
+    print('READY', flush=True)
+    thread.join()
+
+
+def serve_cherrypy(args: argparse.Namespace) -> None:
+    import cherrypy
+
+    from app.web.controllers import Root
+    from app.web.sessions import session_store
+    from app.web.tg_sender import telegram_sender
+
+    cherrypy.config.update({
+        'environment': 'production',
+        'log.screen': False,
+        'server.socket_host': '127.0.0.1',
+        'server.socket_port': args.port,
+        'server.thread_pool': args.threads,
+        'server.socket_queue_size': max(5, args.concurrency),
+    })
+    cherrypy.tree.mount(Root(), '/', {'/': {'tools.sessions.on': True}})
+    cherrypy.engine.subscribe('start', session_store.start)
+    cherrypy.engine.subscribe('stop', session_store.stop)
+    cherrypy.engine.subscribe('stop', telegram_sender.stop)
+    cherrypy.engine.signals.subscribe()
+    cherrypy.engine.start()
+    print('READY', flush=True)
+    cherrypy.engine.block()
+
+
+# ---------------------------------------------------------------- client side
+
+
+class Client:
+    def __init__(self, port: int) -> None:
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        self.cookies = SimpleCookie()
+
+    def request(self, method: str, path: str, params: Optional[dict[str, str]] = None) -> tuple[int, bytes]:
+        headers = {'User-Agent': 'web-load-benchmark'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{key}={morsel.value}' for key, morsel in self.cookies.items())
+        body = None
+        if params is not None and method == 'POST':
+            body = urlencode(params)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif params is not None:
+            path = f'{path}?{urlencode(params)}'
+
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(cookie)
+        return response.status, data
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies = dict[str, list[float]]()
+        self.errors = dict[str, int]()
+
+    def call(self, name: str, expected: int, func: Callable[[], tuple[int, bytes]]) -> bytes:
+        start = time.perf_counter()
+        try:
+            status, body = func()
+        except (OSError, http.client.HTTPException):
+            status, body = -1, b''
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+            if status != expected:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return body
+
+
+def wait_for_code(telegram: FakeTelegramServer, chat_id: int, previous: Optional[str]) -> Optional[str]:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        text = telegram.messages.get(chat_id)
+        if text is not None and text != previous:
+            match = re.search(r'(\d{7})', text)
+            if match is not None:
+                return match.group(1)
+        time.sleep(0.01)
+    return None
+
+
+def wait_for_idle(telegram: FakeTelegramServer, quiet: float = 0.5, timeout: float = 30.0) -> None:
+    # codes sent by an earlier flow may still be on their way and would be taken for the fresh one
+    deadline = time.monotonic() + timeout
+    sent = -1
+    while telegram.sent != sent and time.monotonic() < deadline:
+        sent = telegram.sent
+        time.sleep(quiet)
+
+
+def run_flow(flow: str, args: argparse.Namespace, telegram: FakeTelegramServer, recorder: Recorder) -> float:
+    if flow == 'reset_save':
+        wait_for_idle(telegram)
+
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+
+    def next_index() -> Optional[int]:
+        with counter_lock:
+            return next(counter, None)
+
+    def worker(worker_id: int) -> None:
+        client = Client(args.port)
+        if flow == 'user_index':
+            recorder.call('setup', 303, lambda: client.request(
+                'POST', '/auth/login', {'username': login_name(worker_id), 'password': PASSWORD}))
+
+        while (iteration := next_index()) is not None:
+            user = iteration % args.users
+            username = login_name(user)
+            if flow == 'login':
+                client.cookies.clear()
+                recorder.call(flow, 303, lambda: client.request(
+                    'POST', '/auth/login', {'username': username, 'password': PASSWORD}))
+            elif flow == 'user_index':
+                recorder.call(flow, 200, lambda: client.request('GET', '/user/'))
+            elif flow == 'reset_post':
+                recorder.call(flow, 200, lambda: client.request('POST', '/auth/reset_post', {'username': username}))
+            elif flow == 'reset_typed':
+                recorder.call(flow, 200, lambda: client.request(
+                    'POST', '/auth/reset_typed', {'username': username, 'bind_dest_id': '3'}))
+            elif flow == 'reset_save':
+                chat_id = TELEGRAM_ID_BASE + user
+                previous = telegram.messages.get(chat_id)
+                recorder.call('setup', 200, lambda: client.request(
+                    'POST', '/auth/reset_typed', {'username': username, 'bind_dest_id': '3'}))
+                code = wait_for_code(telegram, chat_id, previous) or '0000000'
+                recorder.call(flow, 303, lambda: client.request('POST', '/auth/reset_save', {
+                    'username': username, 'bind_dest_id': '3', 'reset_key': code, 'password': PASSWORD}))
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(index % args.users,)) for index in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def summarize(latencies: list[float], errors: int, wall: float) -> dict[str, float]:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+def peak_child_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def run_mode(mode: str, args: argparse.Namespace, telegram: FakeTelegramServer) -> dict[str, dict[str, float]]:
+    env = dict(os.environ, TELEGRAM_API_URL=telegram.base_url)
+    command = [sys.executable, '-m', 'benchmarks.web_load', '--serve', '--mode', mode, '--port', str(args.port),
+               '--users', str(args.users), '--threads', str(args.threads), '--concurrency', str(args.concurrency),
+               '--ldap-latency', str(args.ldap_latency)]
+    if args.io_workers is not None:
+        command += ['--io-workers', str(args.io_workers)]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        assert server.stdout is not None
+        if server.stdout.readline().strip() != 'READY':
+            raise SystemExit(f'{mode} benchmark server failed to start')
+
+        recorder = Recorder()
+        results = {}
+        for flow in args.flows:
+            wall = run_flow(flow, args, telegram, recorder)
+            results[flow] = summarize(recorder.latencies.get(flow, []), recorder.errors.get(flow, 0), wall)
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args: argparse.Namespace) -> None:
+    telegram = FakeTelegramServer().start()
+    results = {mode: run_mode(mode, args, telegram) for mode in args.modes}
+
+    report = {
+        'benchmark': 'web_load',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'users': args.users, 'concurrency': args.concurrency, 'requests': args.requests,
+                       'threads': args.threads, 'io_workers': args.io_workers, 'ldap_latency_ms': args.ldap_latency},
+        'peak_rss_kb': peak_child_rss_kb(),
+        'telegram_messages': telegram.sent,
+        'results': results,
+    }
+    telegram.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per flow')
+    parser.add_argument('--threads', type=int, default=10, help='CherryPy thread pool size')
+    parser.add_argument('--io-workers', type=int, help='model executor size for the ASGI mode (MODEL_IO_WORKERS)')
+    parser.add_argument('--ldap-latency', type=float, default=0.0, help='added delay per directory call, ms')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=['cherrypy'])
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--flows', nargs='+', choices=FLOWS, default=list(FLOWS))
+    parser.add_argument('--output')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES, default='cherrypy', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.serve:
+        serve(arguments)
+    else:
+        main(arguments)
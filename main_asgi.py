@@ -0,0 +1,14 @@
+import uvicorn
+
+from app.asgi import create_app
+from app.config import Config
+
+
+def main_asgi():
+    app = create_app()
+    host, port = Config.asgi_listen
+    uvicorn.run(app, host=host, port=port, lifespan='on', access_log=False, log_config=None)
+
+
+if __name__ == '__main__':
+    main_asgi()
@@ -0,0 +1,14 @@
+from app.config import DEFAULT_ASSETS_CACHE_DIR, getenv_default, private_dir
+from app.web.assets import AssetManifest
+
+
+def main_assets():
+    cache_dir = private_dir(getenv_default('ASSETS_CACHE_DIR', DEFAULT_ASSETS_CACHE_DIR, str))
+    manifest = AssetManifest(cache_dir=cache_dir).build()
+    for path, asset in sorted(manifest.by_path.items()):
+        sizes = ' '.join(f'{encoding}={len(body)}' for encoding, body in asset.variants.items())
+        print(f'{path} -> {asset.url} {sizes}')
+
+
+if __name__ == '__main__':
+    main_assets()
@@ -1,12 +1,23 @@
+import sys
+
 from app.bot import Bot
 from app.common.database.migrations import apply_migrations
 from app.config import Config
+from app.startup import PROFILE_FLAG, profile_startup, profiler
 
 
 def main_bot():
-    Config.load()
+    with profiler.stage('Config.load'):
+        Config.load()
     Config.setup_app_logger('app_bot.log')
-    apply_migrations()
+    with profiler.stage('apply_migrations'):
+        apply_migrations()
+
+    if profiler.enabled:
+        with profiler.stage('Bot'):
+            Bot()
+        return
+
     Bot().start()
 
 
@@ -15,4 +26,7 @@ def exit_bot():
 
 
 if __name__ == '__main__':
-    main_bot()
+    if PROFILE_FLAG in sys.argv:
+        profile_startup(main_bot)
+    else:
+        main_bot()
@@ -1,12 +1,25 @@
+import sys
+
 from app.common.database.migrations import apply_migrations
 from app.config import Config
+from app.startup import PROFILE_FLAG, profile_startup, profiler
 from app.web import Web
+from app.web.controllers import Root
 
 
 def main_web():
-    Config.load()
+    with profiler.stage('Config.load'):
+        Config.load()
     Config.setup_app_logger('app_web.log')
-    apply_migrations()
+    with profiler.stage('apply_migrations'):
+        apply_migrations()
+
+    if profiler.enabled:
+        profiler.watch_templates(Config.jinja_env)
+        with profiler.stage('controllers'):
+            Root()
+        return
+
     Web.start()
 
 
@@ -15,4 +28,7 @@ def exit_web():
 
 
 if __name__ == '__main__':
-    main_web()
+    if PROFILE_FLAG in sys.argv:
+        profile_startup(main_web)
+    else:
+        main_web()
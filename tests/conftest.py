@@ -0,0 +1,50 @@
+import glob
+import os
+import sqlite3
+from typing import Iterator, Optional
+
+import cherrypy
+import pytest
+
+from app.config import Config
+from app.db import SQLiteDatabase
+
+MIGRATIONS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'app', 'database', 'migrations', '*.sql')))
+
+
+def apply_migrations(connection: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None) -> None:
+    """Runs the migration scripts in order, from the one named `since` up to the one before `until`."""
+    for path in MIGRATIONS:
+        name = os.path.basename(path)
+        if until is not None and name.startswith(until):
+            return
+        if since is not None and name < since:
+            continue
+        with open(path, encoding='utf-8') as f:
+            connection.executescript(f.read())
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch) -> Iterator[SQLiteDatabase]:
+    """A migrated SQLiteDatabase in a scratch file, installed as Config.database."""
+    path = str(tmp_path / 'test.db')
+    connection = sqlite3.connect(path)
+    apply_migrations(connection)
+    connection.close()
+
+    database = SQLiteDatabase(path)
+    monkeypatch.setattr(Config, 'database', database, raising=False)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def cherrypy_request() -> Iterator[cherrypy._cprequest.Request]:
+    """A fresh request and response served on this thread, for calling handlers and tools directly."""
+    httputil = cherrypy.lib.httputil
+    request = cherrypy._cprequest.Request(httputil.Host('127.0.0.1', 8080), httputil.Host('127.0.0.1', 50000))
+    request.headers = httputil.HeaderMap()
+    previous = cherrypy.serving.request, cherrypy.serving.response
+    cherrypy.serving.load(request, cherrypy._cprequest.Response())
+    yield request
+    cherrypy.serving.load(*previous)
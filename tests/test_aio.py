@@ -0,0 +1,45 @@
+import asyncio
+import contextvars
+import time
+from typing import Iterator
+
+import pytest
+
+from app.config import Config
+from app.models.aio import ModelExecutor, run_sync
+
+CALLS = 8
+DELAY = 0.2
+
+request_id = contextvars.ContextVar[str]('request_id')
+
+
+@pytest.fixture
+def executor(monkeypatch) -> Iterator[None]:
+    ModelExecutor.shutdown()
+    monkeypatch.setattr(Config, 'model_io_workers', CALLS, raising=False)
+    yield
+    ModelExecutor.shutdown()
+
+
+def slow_call(value: int) -> int:
+    time.sleep(DELAY)
+    return value
+
+
+def test_concurrent_calls_overlap(executor: None) -> None:
+    async def main() -> list[int]:
+        return await asyncio.gather(*(run_sync(slow_call, value) for value in range(CALLS)))
+
+    start = time.monotonic()
+    assert asyncio.run(main()) == list(range(CALLS))
+    # serialised calls would take CALLS * DELAY
+    assert time.monotonic() - start < DELAY * 3
+
+
+def test_context_follows_the_call(executor: None) -> None:
+    async def main() -> str:
+        request_id.set('abc')
+        return await run_sync(request_id.get)
+
+    assert asyncio.run(main()) == 'abc'
@@ -0,0 +1,241 @@
+import asyncio
+import importlib
+import os
+from typing import Any, Iterator, Optional
+
+import jinja2
+import pytest
+
+from app.asgi import AsgiApp
+from app.asgi.request import MAX_BODY, Message
+from app.cache import TTLCache
+from app.config import Config, private_dir
+from app.db import SQLiteDatabase
+from app.models.aio import ModelExecutor
+from app.web.sessions import SessionStore
+
+# importlib, since the packages re-export names that shadow these modules
+asgi_app = importlib.import_module('app.asgi.app')
+asgi_auth = importlib.import_module('app.asgi.auth')
+rate_limit = importlib.import_module('app.web.hooks.rate_limit')
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), '..', 'app', 'web', 'www')
+FORM = [('content-type', 'application/x-www-form-urlencoded'), ('user-agent', 'pytest')]
+
+
+class FakeDirectory:
+    def __init__(self) -> None:
+        self.lookups = 0
+
+    def login(self, username: str, password: str) -> bool:
+        return password == 'secret'
+
+    def normalize_login(self, login: str) -> str:
+        self.lookups += 1
+        return login.lower()
+
+
+@pytest.fixture(scope='module')
+def assets_cache(tmp_path_factory) -> str:
+    # compressing the static tree is the slow part of building the app, the cache keeps it to once
+    return private_dir(str(tmp_path_factory.mktemp('assets') / 'cache'))
+
+
+@pytest.fixture
+def directory(database: SQLiteDatabase, assets_cache: str, monkeypatch) -> Iterator[FakeDirectory]:
+    directory = FakeDirectory()
+    settings: dict[str, Any] = {
+        'jinja_env': jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES)),
+        'assets_cache_dir': assets_cache,
+        'ldap_descriptor': directory,
+        'ldap_user_cache': TTLCache(0, 0),
+        'login_cache': TTLCache(100, 60.0),
+        'login_supported_domains': frozenset(['vtl.edu']),
+        'login_normalize_local': False,
+        'rate_limit_enabled': True,
+        'rate_limit_ip': (100, 60.0),
+        'rate_limit_user': (100, 60.0),
+        'trusted_proxies': (),
+        'metrics_allowed_ips': frozenset(['127.0.0.1']),
+        'session_cookie_secure': True,
+        'session_lifetime': 3600.0,
+        'session_cache_size': 100,
+        'model_io_workers': 2,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value, raising=False)
+    sessions = SessionStore()
+    monkeypatch.setattr(asgi_app, 'session_store', sessions)
+    monkeypatch.setattr(asgi_auth, 'session_store', sessions)
+    monkeypatch.setattr(rate_limit, '_limiters', {})
+    ModelExecutor.shutdown()
+    yield directory
+    ModelExecutor.shutdown()
+
+
+@pytest.fixture
+def app(directory: FakeDirectory) -> AsgiApp:
+    return AsgiApp()
+
+
+class Reply:
+    def __init__(self, messages: list[Message]) -> None:
+        self.status: int = messages[0]['status']
+        self.headers = dict[str, str]()
+        self.cookies = list[str]()
+        for key, value in messages[0]['headers']:
+            if key == b'set-cookie':
+                self.cookies.append(value.decode())
+            else:
+                self.headers[key.decode()] = value.decode()
+        self.body: bytes = messages[1]['body']
+
+
+def call(app: AsgiApp, method: str, path: str, headers: list[tuple[str, str]] = [],
+         body: list[bytes] = [b''], client: Optional[str] = '127.0.0.1') -> Reply:
+    """One request through the ASGI interface, the body delivered in the given chunks."""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': [(key.encode(), value.encode()) for key, value in headers],
+             'client': (client, 50000) if client else None}
+    chunks = [{'type': 'http.request', 'body': chunk, 'more_body': index < len(body) - 1}
+              for index, chunk in enumerate(body)]
+    sent = list[Message]()
+
+    async def receive() -> Message:
+        return chunks.pop(0)
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return Reply(sent)
+
+
+def session_cookie(reply: Reply) -> tuple[str, str]:
+    return 'cookie', reply.cookies[0].split(';')[0]
+
+
+def test_routes(app: AsgiApp) -> None:
+    assert call(app, 'GET', '/office365').status == 200
+    assert call(app, 'GET', '/office365/').status == 200
+    assert call(app, 'GET', '/nope').status == 404
+    assert call(app, 'GET', '/auth/nope').status == 404
+
+    reply = call(app, 'DELETE', '/office365')
+    assert reply.status == 405
+    assert reply.headers['allow'] == 'GET'
+    reply = call(app, 'HEAD', '/office365')
+    assert reply.status == 200 and reply.body == b''
+    assert int(reply.headers['content-length']) > 0
+
+    # positional routes take the rest of the path as arguments
+    assert call(app, 'GET', '/static/missing/file.css').status == 404
+
+
+def test_unchanged_pages_revalidate(app: AsgiApp) -> None:
+    reply = call(app, 'GET', '/auth')
+    assert reply.status == 200
+    etag = reply.headers['etag']
+    reply = call(app, 'GET', '/auth', [('if-none-match', etag)])
+    assert reply.status == 304 and reply.body == b''
+
+
+def test_login_and_logout(app: AsgiApp) -> None:
+    assert call(app, 'GET', '/').headers['location'] == '/auth'
+
+    reply = call(app, 'POST', '/auth/login', FORM, [b'username=wrong&password=guess'])
+    assert reply.status == 200 and not reply.cookies
+    reply = call(app, 'POST', '/auth/login', FORM, [b'username=User1@vtl.edu&password=secret'])
+    assert reply.status == 303 and reply.headers['location'] == '/user'
+    assert {'HttpOnly', 'Secure', 'SameSite=Lax'} <= {part.strip() for part in reply.cookies[0].split(';')}
+    cookie = session_cookie(reply)
+
+    assert call(app, 'GET', '/', [cookie, ('user-agent', 'pytest')]).headers['location'] == '/user'
+    # the session is bound to the browser that logged in
+    assert call(app, 'GET', '/', [cookie, ('user-agent', 'other')]).headers['location'] == '/auth'
+
+    reply = call(app, 'GET', '/auth/logout', [cookie, ('user-agent', 'pytest')])
+    assert reply.status == 303 and reply.headers['location'] == '/auth'
+    assert 'Max-Age=0' in reply.cookies[0]
+    assert call(app, 'GET', '/', [cookie, ('user-agent', 'pytest')]).headers['location'] == '/auth'
+    assert call(app, 'GET', '/auth/logout', [cookie, ('user-agent', 'pytest')]).headers['location'] == '/auth'
+
+
+def test_logout_drops_the_cached_directory_entry(app: AsgiApp, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'ldap_user_cache', TTLCache(100, 60.0))
+    cookie = session_cookie(call(app, 'POST', '/auth/login', FORM, [b'username=User1@vtl.edu&password=secret']))
+    # the cache is keyed on the normalized login the session holds
+    Config.ldap_user_cache.set('user1', object())
+    call(app, 'GET', '/auth/logout', [cookie, ('user-agent', 'pytest')])
+    assert Config.ldap_user_cache.get('user1') is None
+
+
+def test_rate_limit_runs_before_normalization(app: AsgiApp, directory: FakeDirectory, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'rate_limit_ip', (1, 60.0))
+    assert call(app, 'POST', '/auth/login', FORM, [b'username=user1&password=secret']).status == 303
+    assert directory.lookups == 1
+
+    reply = call(app, 'POST', '/auth/login', FORM, [b'username=user2&password=secret'])
+    assert reply.status == 429
+    assert reply.headers['retry-after'] == '60'
+    assert directory.lookups == 1
+    assert call(app, 'POST', '/auth/login', FORM, [b'username=user3&password=secret'], client='10.0.0.2').status == 303
+
+
+def test_normalization_rejects_bad_logins_without_the_directory(app: AsgiApp, directory: FakeDirectory) -> None:
+    reply = call(app, 'POST', '/auth/login', FORM, [b'username=user1@gmail.com&password=secret'])
+    assert reply.status == 200 and not reply.cookies
+    assert directory.lookups == 0
+
+
+def test_session_is_read_before_the_handler(app: AsgiApp) -> None:
+    cookie = session_cookie(call(app, 'POST', '/auth/login', FORM, [b'username=user1&password=secret']))
+    # a logged in user is sent on before the form is even looked at
+    reply = call(app, 'POST', '/auth/login', [*FORM, cookie], [b'username=user2&password=guess'])
+    assert reply.headers['location'] == '/user'
+
+
+def test_request_bodies_are_capped(app: AsgiApp) -> None:
+    chunk = b'x' * (MAX_BODY // 4)
+    assert call(app, 'POST', '/auth/login', FORM, [chunk] * 5).status == 413
+    reply = call(app, 'POST', '/auth/login', FORM, [b'username=user1&', b'password=secret'])
+    assert reply.status == 303
+
+
+def test_metrics_only_for_allowed_addresses(app: AsgiApp) -> None:
+    assert call(app, 'GET', '/metrics').status == 200
+    assert call(app, 'GET', '/metrics', client='203.0.113.9').status == 404
+
+
+class Service:
+    def __init__(self, events: list[str], name: str) -> None:
+        self.events = events
+        self.name = name
+
+    def start(self) -> None:
+        self.events.append(f'{self.name} started')
+
+    def stop(self) -> None:
+        self.events.append(f'{self.name} stopped')
+
+
+def test_lifespan_starts_and_stops_the_background_services(app: AsgiApp, monkeypatch) -> None:
+    events = list[str]()
+    for name in ('session_store', 'token_store', 'profile_refresher', 'directory_sync', 'telegram_sender'):
+        monkeypatch.setattr(asgi_app, name, Service(events, name))
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = list[Message]()
+
+    async def receive() -> Message:
+        return messages.pop(0)
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    assert [message['type'] for message in sent] == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert events[:4] == ['session_store started', 'token_store started', 'profile_refresher started',
+                          'directory_sync started']
+    assert set(events[4:]) == {'session_store stopped', 'token_store stopped', 'profile_refresher stopped',
+                               'directory_sync stopped', 'telegram_sender stopped'}
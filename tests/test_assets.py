@@ -0,0 +1,36 @@
+import gzip
+import os
+
+import pytest
+
+from app.config import private_dir
+from app.web.assets import AssetManifest
+
+
+def test_tampered_cache_entries_are_not_served(tmp_path) -> None:
+    root = tmp_path / 'static'
+    root.mkdir()
+    source = b'body { color: red; }\n' * 100
+    (root / 'site.css').write_bytes(source)
+    cache_dir = private_dir(str(tmp_path / 'cache'))
+
+    asset = AssetManifest(str(root), cache_dir).build().by_path['site.css']
+    cached = os.path.join(cache_dir, f'{asset.digest}.gzip')
+    assert gzip.decompress(asset.variants['gzip']) == source
+
+    with open(cached, 'wb') as f:
+        f.write(gzip.compress(b'alert("planted")'))
+    asset = AssetManifest(str(root), cache_dir).build().by_path['site.css']
+    assert gzip.decompress(asset.variants['gzip']) == source
+    with open(cached, 'rb') as f:
+        assert gzip.decompress(f.read()) == source
+
+
+def test_shared_cache_directories_are_refused(tmp_path) -> None:
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        private_dir(str(shared))
+    assert private_dir(str(tmp_path / 'own')) == str(tmp_path / 'own')
+    assert (tmp_path / 'own').stat().st_mode & 0o777 == 0o700
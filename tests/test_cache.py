@@ -0,0 +1,169 @@
+import threading
+from typing import Callable, Optional
+
+import pyotp
+import pytest
+
+from app import cache as cache_module
+from app.cache import TTLCache
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.directory import LDAPUser
+from app.models import User, UserBindDestination
+from app.web import services
+
+LOGIN = 'user1@vtl.edu'
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch) -> None:
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = TTLCache[str, int](10, 60.0)
+    cache.set('a', 1)
+    clock.now += 59.0
+    assert cache.get('a') == 1
+    clock.now += 1.0
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_the_least_recently_used_entry_is_evicted() -> None:
+    cache = TTLCache[str, int](2, 60.0)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+@pytest.mark.parametrize('maxsize, ttl', [(0, 60.0), (10, 0.0)])
+def test_a_disabled_cache_loads_every_time_and_counts_nothing(maxsize: int, ttl: float) -> None:
+    cache = TTLCache[str, int](maxsize, ttl)
+    loads = list[int]()
+
+    def loader() -> int:
+        loads.append(1)
+        return 1
+
+    assert cache.get_or_load('a', loader) == 1
+    assert cache.get_or_load('a', loader) == 1
+    assert cache.get('a') is None
+    assert loads == [1, 1]
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def concurrently(cache: TTLCache[str, int], loader: Callable[[], int], count: int) -> list[object]:
+    """`count` threads calling get_or_load('a') while the loader is held until all of them missed."""
+    release = threading.Event()
+    results = list[object]()
+
+    def held() -> int:
+        release.wait(5)
+        return loader()
+
+    def call() -> None:
+        try:
+            results.append(cache.get_or_load('a', held))
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            results.append(exception)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    while cache.misses < count:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_misses_share_one_load() -> None:
+    cache = TTLCache[str, int](10, 60.0)
+    loads = list[int]()
+
+    def loader() -> int:
+        loads.append(1)
+        return 42
+
+    assert concurrently(cache, loader, 8) == [42] * 8
+    assert loads == [1]
+    assert cache.get('a') == 42
+
+
+def test_a_failed_load_is_shared_and_not_cached() -> None:
+    cache = TTLCache[str, int](10, 60.0)
+    loads = list[int]()
+
+    def loader() -> int:
+        loads.append(1)
+        raise RuntimeError('directory down')
+
+    results = concurrently(cache, loader, 4)
+    assert len(results) == 4 and all(isinstance(result, RuntimeError) for result in results)
+    assert loads == [1]
+    assert cache.get_or_load('a', lambda: 42) == 42
+
+
+def test_invalidation_during_a_load_keeps_the_loaded_value_out() -> None:
+    cache = TTLCache[str, int](10, 60.0)
+
+    def loader() -> int:
+        # the value was read before the change that invalidates it
+        cache.pop('a')
+        return 1
+
+    assert cache.get_or_load('a', loader) == 1
+    assert cache.get('a') is None
+    assert cache.get_or_load('a', lambda: 2) == 2
+    assert cache.get('a') == 2
+
+
+class FakeDirectory:
+    def __init__(self) -> None:
+        self.lookups = 0
+        self.passwords = dict[str, str]()
+
+    def get_user(self, login: str) -> LDAPUser:
+        self.lookups += 1
+        return LDAPUser(f'cn={login}', login, 'User One', login.split('@')[0])
+
+    def set_password(self, login: str, password: str) -> bool:
+        self.passwords[login] = password
+        return True
+
+
+@pytest.fixture
+def directory(database: SQLiteDatabase, monkeypatch) -> FakeDirectory:
+    directory = FakeDirectory()
+    monkeypatch.setattr(Config, 'ldap_descriptor', directory, raising=False)
+    monkeypatch.setattr(Config, 'ldap_user_cache', TTLCache(100, 60.0), raising=False)
+    monkeypatch.setattr(Config, 'profile_ttl', 86400.0, raising=False)
+    return directory
+
+
+def cached(login: str) -> Optional[LDAPUser]:
+    return Config.ldap_user_cache.get(login)
+
+
+def test_a_password_reset_drops_the_cached_directory_entry(directory: FakeDirectory) -> None:
+    secret = pyotp.random_base32()
+    User(login=LOGIN, otp=secret).save()
+    User.find(LOGIN)
+    assert cached(LOGIN) is not None and directory.lookups == 1
+
+    services.reset_password(LOGIN, str(UserBindDestination.OTP.value), pyotp.TOTP(secret).now(), 'new password')
+    assert directory.passwords == {LOGIN: 'new password'}
+    assert cached(LOGIN) is None
+    User.find(LOGIN)
+    assert directory.lookups == 2
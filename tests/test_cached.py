@@ -0,0 +1,43 @@
+import cherrypy
+
+from app.web.cached import CachedResponse
+
+
+class Page:
+    def __init__(self) -> None:
+        self.renders = 0
+        self.text = 'hello'
+
+    def render(self) -> str:
+        self.renders += 1
+        return self.text
+
+
+def test_rendered_once_and_revalidated_with_the_etag(cherrypy_request: cherrypy._cprequest.Request) -> None:
+    page = Page()
+    cached = CachedResponse(page.render)
+    assert page.renders == 0
+
+    assert cached.serve() == b'hello'
+    headers = cherrypy.serving.response.headers
+    etag = headers['ETag']
+    assert etag.startswith('"') and headers['Cache-Control'] == 'no-cache'
+    assert headers['Content-Type'] == 'text/html;charset=utf-8'
+
+    cherrypy_request.headers['If-None-Match'] = f'"other", {etag}'
+    assert cached.serve() == b''
+    assert cherrypy.serving.response.status == 304
+    assert page.renders == 1
+
+
+def test_a_stale_etag_gets_the_body(cherrypy_request: cherrypy._cprequest.Request) -> None:
+    page = Page()
+    cached = CachedResponse(page.render)
+    _, etag = cached.load()
+
+    page.text = 'changed'
+    cached.invalidate()
+    cherrypy_request.headers['If-None-Match'] = etag
+    assert cached.serve() == b'changed'
+    assert cherrypy.serving.response.headers['ETag'] != etag
+    assert page.renders == 2
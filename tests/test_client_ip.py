@@ -0,0 +1,29 @@
+import pytest
+
+from app.config import Config, parse_networks
+from app.web.client_ip import client_ip
+
+
+@pytest.fixture(autouse=True)
+def proxies(monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'trusted_proxies', parse_networks('10.0.0.0/8, ::1'), raising=False)
+
+
+def test_direct_peers_are_taken_as_is() -> None:
+    assert client_ip('203.0.113.7', None) == '203.0.113.7'
+    # a client cannot pick its own address by sending the header
+    assert client_ip('203.0.113.7', '198.51.100.1') == '203.0.113.7'
+
+
+def test_forwarded_for_is_read_from_trusted_proxies() -> None:
+    assert client_ip('10.0.0.2', '203.0.113.7') == '203.0.113.7'
+    assert client_ip('::1', '203.0.113.7, 10.1.2.3') == '203.0.113.7'
+    # entries left of the first untrusted hop are client supplied
+    assert client_ip('10.0.0.2', '198.51.100.1, 203.0.113.7') == '203.0.113.7'
+    assert client_ip('10.0.0.2', '10.0.0.3') == '10.0.0.3'
+    assert client_ip('10.0.0.2', '') == '10.0.0.2'
+
+
+def test_nothing_is_trusted_by_default(monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'trusted_proxies', ())
+    assert client_ip('10.0.0.2', '203.0.113.7') == '10.0.0.2'
@@ -0,0 +1,105 @@
+import multiprocessing
+import sqlite3
+import threading
+from typing import Iterator
+
+import pytest
+
+from app.db import SQLiteDatabase
+
+
+@pytest.fixture
+def db(tmp_path) -> Iterator[SQLiteDatabase]:
+    database = SQLiteDatabase(str(tmp_path / 'test.db'))
+    database.execute('CREATE TABLE "items" ("name" TEXT NOT NULL)')
+    yield database
+    database.close()
+
+
+def names(database: SQLiteDatabase) -> list[str]:
+    # a separate connection only sees committed rows
+    connection = sqlite3.connect(database.path)
+    try:
+        return [row[0] for row in connection.execute('SELECT "name" FROM "items" ORDER BY "name"')]
+    finally:
+        connection.close()
+
+
+def test_execute_outside_a_transaction_autocommits(db: SQLiteDatabase) -> None:
+    db.execute('INSERT INTO "items" VALUES (?)', ('a',))
+    assert names(db) == ['a']
+
+
+def test_nested_blocks_join_the_outer_transaction(db: SQLiteDatabase) -> None:
+    with db.get_connection() as outer:
+        outer.execute('INSERT INTO "items" VALUES (?)', ('a',))
+        with db.get_connection() as inner:
+            assert inner is outer
+            inner.execute('INSERT INTO "items" VALUES (?)', ('b',))
+        # leaving the inner block does not commit
+        assert names(db) == []
+        db.execute('INSERT INTO "items" VALUES (?)', ('c',))
+        assert names(db) == []
+    assert names(db) == ['a', 'b', 'c']
+
+
+def test_exceptions_roll_the_whole_transaction_back(db: SQLiteDatabase) -> None:
+    with pytest.raises(RuntimeError):
+        with db.get_connection() as outer:
+            outer.execute('INSERT INTO "items" VALUES (?)', ('a',))
+            with db.get_connection() as inner:
+                inner.execute('INSERT INTO "items" VALUES (?)', ('b',))
+                raise RuntimeError('boom')
+    assert names(db) == []
+
+    with db.get_connection() as connection:
+        connection.execute('INSERT INTO "items" VALUES (?)', ('c',))
+    assert names(db) == ['c']
+
+
+def test_threads_get_their_own_connections(db: SQLiteDatabase) -> None:
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(db.connection()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not db.connection()
+    assert len(db) == 2
+
+
+def increment(path: str, threads: int, count: int) -> int:
+    """Read-modify-write increments of one counter from `threads` threads; returns "database is locked" errors."""
+    database = SQLiteDatabase(path)
+    locked = list[int]()
+
+    def run() -> None:
+        for _ in range(count):
+            try:
+                with database.get_connection() as connection:
+                    value = connection.execute('SELECT "value" FROM "counter"').fetchone()[0]
+                    connection.execute('UPDATE "counter" SET "value" = ?', (value + 1,))
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                locked.append(1)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    database.close()
+    return len(locked)
+
+
+def test_writer_processes_neither_lock_out_nor_lose_updates(tmp_path) -> None:
+    path = str(tmp_path / 'shared.db')
+    database = SQLiteDatabase(path)
+    database.execute('CREATE TABLE "counter" ("value" INTEGER NOT NULL)')
+    database.execute('INSERT INTO "counter" VALUES (0)')
+
+    # the web and the bot process, each writing from several threads
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        locked = pool.starmap(increment, [(path, 4, 50)] * 2)
+    assert locked == [0, 0]
+    assert database.execute('SELECT "value" FROM "counter"').fetchone()[0] == 2 * 4 * 50
+    database.close()
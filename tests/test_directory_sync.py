@@ -0,0 +1,112 @@
+import importlib
+import uuid
+from typing import Any
+
+import pytest
+from ldap3 import MOCK_SYNC, OFFLINE_AD_2012_R2, Connection, Server
+from ldap3.core.exceptions import (LDAPCommunicationError,
+                                   LDAPSocketReceiveError)
+
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.directory import DirectoryReader, LDAPConnectionPool
+
+# importlib, since app.models re-exports the sync instance under the module's name
+sync_module = importlib.import_module('app.models.directory_sync')
+
+SEARCH_BASE = 'dc=test,dc=local'
+SERVICE_DN = f'cn=svc,{SEARCH_BASE}'
+
+
+def user_dn(index: int) -> str:
+    return f'cn=sync{index},ou=users,{SEARCH_BASE}'
+
+
+@pytest.fixture
+def directory(database: SQLiteDatabase, monkeypatch) -> Connection:
+    """A mock directory of three users, read by Config.directory_reader."""
+    server = Server('sync-mock', get_info=OFFLINE_AD_2012_R2)  # type: ignore[arg-type]
+    connection = Connection(server, SERVICE_DN, 'svc', client_strategy=MOCK_SYNC)
+    connection.strategy.add_entry(SERVICE_DN, {'objectClass': 'person', 'userPassword': 'svc'})
+    for index in range(3):
+        connection.strategy.add_entry(user_dn(index), {
+            'objectClass': 'user',
+            'objectGUID': uuid.UUID(int=index + 1).bytes_le,
+            'sAMAccountName': f'sync{index}',
+            'userPrincipalName': f'sync{index}@test.local',
+            'displayName': f'Sync User {index}',
+            'userAccountControl': '512',
+            'uSNChanged': str(index + 1),
+        })
+    connection.bind()
+
+    pool = LDAPConnectionPool(server, SERVICE_DN, 'svc', size=1, client_strategy=MOCK_SYNC)
+    monkeypatch.setattr(Config, 'directory_reader', DirectoryReader(pool, SEARCH_BASE, 2, show_deleted=False),
+                        raising=False)
+    monkeypatch.setattr(Config, 'ldap_sync_full_interval', 3600.0, raising=False)
+    return connection
+
+
+def deleted(database: SQLiteDatabase) -> list[str]:
+    return [row[0] for row in database.execute('SELECT "account" FROM "directory_users" WHERE "deleted" = 1')]
+
+
+def test_passes_pick_up_changes_and_deletions(directory: Connection, database: SQLiteDatabase) -> None:
+    sync = sync_module.DirectorySync()
+    assert sync.sync() == 3
+    assert sync.usn == 3
+
+    directory.modify(user_dn(0), {'displayName': [('MODIFY_REPLACE', ['Changed'])],
+                                  'uSNChanged': [('MODIFY_REPLACE', ['4'])]})
+    directory.delete(user_dn(2))
+    assert sync.sync() == 1
+    assert database.execute('SELECT "display_name" FROM "directory_users" WHERE "account" = ?',
+                            ('sync0',)).fetchone()[0] == 'Changed'
+    assert deleted(database) == []
+
+    assert sync.sync(full=True) == 2
+    assert deleted(database) == ['sync2']
+
+
+def test_full_pass_keeps_entries_changed_after_the_mark(directory: Connection, database: SQLiteDatabase,
+                                                        monkeypatch: Any) -> None:
+    sync = sync_module.DirectorySync()
+    sync.sync()
+    # sync1 changes between reading highestCommittedUSN and the search
+    directory.modify(user_dn(1), {'uSNChanged': [('MODIFY_REPLACE', ['5'])]})
+    monkeypatch.setattr(Config.directory_reader, 'highest_usn', lambda: 4)
+
+    assert sync.sync(full=True) == 3
+    assert deleted(database) == []
+    assert sync.usn == 4
+
+
+def failing_search(monkeypatch: Any, failures: int) -> None:
+    """Makes the next `failures` root DSE reads fail the way a dropped connection does."""
+    search = Connection.search
+    remaining = [failures]
+
+    def wrapper(self: Connection, search_base: str, *args: Any, **kwargs: Any) -> Any:
+        if search_base == '' and remaining[0] > 0:
+            remaining[0] -= 1
+            raise LDAPSocketReceiveError('connection reset')
+        return search(self, search_base, *args, **kwargs)
+
+    monkeypatch.setattr(Connection, 'search', wrapper)
+
+
+def test_highest_usn_reconnects_after_a_dropped_connection(directory: Connection, monkeypatch: Any) -> None:
+    reader = Config.directory_reader
+    assert reader is not None
+    failing_search(monkeypatch, 1)
+    # the mock does not publish highestCommittedUSN, so a good connection reads None
+    assert reader.highest_usn() is None
+    assert reader.pool.metrics.calls['bind'] == 2
+
+
+def test_highest_usn_raises_when_the_server_stays_unreachable(directory: Connection, monkeypatch: Any) -> None:
+    reader = Config.directory_reader
+    assert reader is not None
+    failing_search(monkeypatch, 2)
+    with pytest.raises(LDAPCommunicationError):
+        reader.highest_usn()
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Callable, Iterator
+
+import pytest
+
+from app.bot.errors import ErrorReporter, fingerprint
+from app.config import Config
+from app.models.aio import ModelExecutor
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.messages = list[str]()
+
+    async def send_message(self, chat_id: int, text: str, **_kwargs: Any) -> None:
+        self.messages.append(text)
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch) -> Iterator[None]:
+    monkeypatch.setattr(Config, 'developer_chat_id', 1, raising=False)
+    monkeypatch.setattr(Config, 'error_report_window', 0.2, raising=False)
+    monkeypatch.setattr(Config, 'error_report_budget', (10, 60.0), raising=False)
+    # digests are formatted on the model executor
+    ModelExecutor.shutdown()
+    monkeypatch.setattr(Config, 'model_io_workers', 2, raising=False)
+    yield
+    ModelExecutor.shutdown()
+
+
+def error_in_lookup(message: str) -> ValueError:
+    try:
+        raise ValueError(message)
+    except ValueError as e:
+        return e
+
+
+def error_in_save(message: str) -> ValueError:
+    try:
+        raise ValueError(message)
+    except ValueError as e:
+        return e
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+def report(reporter: ErrorReporter, bot: FakeBot, error: BaseException) -> None:
+    reporter.report(error, None, {}, {}, bot)  # type: ignore[arg-type]
+
+
+def test_fingerprint_follows_the_traceback_not_the_message() -> None:
+    assert fingerprint(error_in_lookup('a')) == fingerprint(error_in_lookup('b'))
+    assert fingerprint(error_in_lookup('a')) != fingerprint(error_in_save('a'))
+    assert fingerprint(error_in_lookup('a')) != fingerprint(KeyError('a'))
+
+
+def test_repeats_collapse_into_one_digest_per_window() -> None:
+    reporter, bot = ErrorReporter(), FakeBot()
+
+    async def main() -> None:
+        report(reporter, bot, error_in_lookup('first'))
+        await wait_for(lambda: len(bot.messages) == 1)
+        for _ in range(3):
+            report(reporter, bot, error_in_lookup('again'))
+        await asyncio.sleep(0.05)
+        assert len(bot.messages) == 1
+
+        # the reporter task outlives a quiet window and sends the repeats once it ends
+        await wait_for(lambda: len(bot.messages) == 2)
+        assert '3 times' in bot.messages[1]
+        await asyncio.sleep(0.3)
+        report(reporter, bot, error_in_lookup('later'))
+        await wait_for(lambda: len(bot.messages) == 3)
+        await reporter.close()
+
+    asyncio.run(main())
+
+
+def test_budget_holds_back_digests(monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'error_report_budget', (1, 60.0))
+    reporter, bot = ErrorReporter(), FakeBot()
+
+    async def main() -> None:
+        report(reporter, bot, error_in_lookup('a'))
+        await wait_for(lambda: len(bot.messages) == 1)
+        report(reporter, bot, error_in_save('b'))
+        await asyncio.sleep(0.1)
+        assert len(bot.messages) == 1
+        assert len(reporter) == 2
+        # the next round finds the budget still spent
+        await asyncio.sleep(0.3)
+        assert len(bot.messages) == 1
+        await reporter.close()
+
+    asyncio.run(main())
+
+
+def test_close_flushes_pending_digests(monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'error_report_window', 60.0)
+    reporter, bot = ErrorReporter(), FakeBot()
+
+    async def main() -> None:
+        report(reporter, bot, error_in_lookup('a'))
+        await wait_for(lambda: len(bot.messages) == 1)
+        report(reporter, bot, error_in_lookup('b'))
+        report(reporter, bot, error_in_lookup('c'))
+        await reporter.close()
+
+    asyncio.run(main())
+    assert len(bot.messages) == 2
+    assert '2 times' in bot.messages[1]
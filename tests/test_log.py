@@ -0,0 +1,131 @@
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Iterator
+
+import pytest
+
+from app import log
+from app.log import (LOG_DROPPED, JSONFormatter, RateLimitFilter,
+                     SamplingFilter, setup_queue_logging, stop_queue_logging)
+
+
+def record(name: str, level: int = logging.INFO, msg: str = 'message', *args: object) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sampling_keeps_a_fraction_of_the_configured_loggers(monkeypatch) -> None:
+    sampling = SamplingFilter({'app.models': 0.25, 'app.models.user': 0.5})
+    monkeypatch.setattr(log.random, 'random', lambda: 0.4)
+    dropped = LOG_DROPPED.value('sampled')
+
+    # the longest configured prefix applies
+    assert sampling.filter(record('app.models.user.child'))
+    assert not sampling.filter(record('app.models.tokens'))
+    assert sampling.filter(record('app.bot'))
+    assert sampling.filter(record('app.models.tokens', logging.WARNING))
+    assert LOG_DROPPED.value('sampled') == dropped + 1
+
+
+def test_rate_limit_refills_over_the_period(monkeypatch) -> None:
+    clock = Clock()
+    monkeypatch.setattr(log.time, 'monotonic', clock)
+    limit = RateLimitFilter({'app.bot': (2, 10.0)})
+    dropped = LOG_DROPPED.value('rate_limited')
+
+    assert limit.filter(record('app.bot.handlers'))
+    assert limit.filter(record('app.bot'))
+    assert not limit.filter(record('app.bot'))
+    assert limit.filter(record('app.bot', logging.ERROR))
+    assert limit.filter(record('app.web'))
+    assert LOG_DROPPED.value('rate_limited') == dropped + 1
+
+    # one record's worth comes back every period / capacity seconds, up to the capacity
+    clock.now += 5.0
+    assert limit.filter(record('app.bot'))
+    assert not limit.filter(record('app.bot'))
+    clock.now += 100.0
+    assert limit.filter(record('app.bot'))
+    assert limit.filter(record('app.bot'))
+    assert not limit.filter(record('app.bot'))
+
+
+def test_json_fields() -> None:
+    calls = list[int]()
+
+    def cost() -> int:
+        calls.append(1)
+        return 42
+
+    entry = record('app.web', logging.INFO, 'user %s', 'user1')
+    entry.__dict__.update(login='user1', cost=cost)
+    data = json.loads(JSONFormatter().format(entry))
+    assert set(data) == {'time', 'level', 'logger', 'thread', 'message', 'login', 'cost'}
+    assert (data['level'], data['logger'], data['message']) == ('INFO', 'app.web', 'user user1')
+    assert (data['login'], data['cost']) == ('user1', 42)
+    assert calls == [1]
+
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        entry = logging.LogRecord('app.web', logging.ERROR, __file__, 1, 'failed', None, sys.exc_info())
+    data = json.loads(JSONFormatter().format(entry))
+    assert 'ValueError: boom' in data['exception']
+
+
+class SlowHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages = list[str]()
+        self.threads = set[str]()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        time.sleep(0.01)
+        self.threads.add(threading.current_thread().name)
+        self.messages.append(self.format(record))
+
+
+@pytest.fixture
+def root_handler() -> Iterator[SlowHandler]:
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    handler = SlowHandler()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+    yield handler
+    stop_queue_logging()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def test_the_listener_writes_everything_queued_on_shutdown(root_handler: SlowHandler) -> None:
+    setup_queue_logging(json_format=True)
+    logger = logging.getLogger('app.test_log')
+    for number in range(20):
+        logger.info('record %d', number)
+    # the calling thread only enqueued, the handler is still working through them
+    assert len(root_handler.messages) < 20
+
+    stop_queue_logging()
+    assert [json.loads(message)['message'] for message in root_handler.messages] == \
+        [f'record {number}' for number in range(20)]
+    assert threading.current_thread().name not in root_handler.threads
+
+
+def test_mutable_arguments_are_rendered_when_logged(root_handler: SlowHandler) -> None:
+    setup_queue_logging()
+    values = ['before']
+    logging.getLogger('app.test_log').info('%s', values)
+    values[0] = 'after'
+    stop_queue_logging()
+    assert root_handler.messages == ["['before']"]
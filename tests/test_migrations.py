@@ -0,0 +1,75 @@
+import importlib
+import sqlite3
+
+import pytest
+
+from .conftest import apply_migrations
+
+MODEL_MODULES = ('app.models.user', 'app.models.tokens', 'app.models.profiles', 'app.models.directory_sync',
+                 'app.web.sessions', 'app.bot.persistence')
+
+# bulk statements that visit every row on purpose, once per start-up or directory sync pass
+FULL_SCANS = {
+    'app.bot.persistence.PURGE_CONVERSATIONS_SQL',
+    'app.bot.persistence.PURGE_CHAT_DATA_SQL',
+    'app.models.directory_sync.LINK_SQL',
+    'app.models.directory_sync.MISSING_SQL',
+    'app.models.directory_sync.MARK_DELETED_SQL',
+}
+
+
+def model_queries() -> list[tuple[str, str]]:
+    queries = list[tuple[str, str]]()
+    for name in MODEL_MODULES:
+        # importlib, since app.models re-exports instances under some module names
+        module = importlib.import_module(name)
+        queries.extend((f'{name}.{key}', value) for key, value in vars(module).items()
+                       if key.endswith('_SQL') and isinstance(value, str))
+    return queries
+
+
+@pytest.mark.parametrize('name,sql', model_queries())
+def test_model_queries_use_indexes(name: str, sql: str) -> None:
+    if name in FULL_SCANS:
+        pytest.skip('full scan by design')
+    connection = sqlite3.connect(':memory:')
+    apply_migrations(connection)
+    plan = connection.execute(f'EXPLAIN QUERY PLAN {sql}', [None] * sql.count('?')).fetchall()
+    scans = [row[3] for row in plan if row[3].startswith('SCAN')]
+    assert not scans, f'{name} scans: {scans}'
+
+
+def test_duplicate_logins_are_merged_not_dropped() -> None:
+    connection = sqlite3.connect(':memory:')
+    apply_migrations(connection, until='1677264286')
+    connection.executemany('INSERT INTO "users" ("id", "login", "email2", "telegram", "otp", "bind_dest") '
+                           'VALUES (?, ?, ?, ?, ?, ?)', [
+                               (1, 'a@x', 'a@mail', None, None, 0),
+                               (2, 'a@x', None, 111, None, 3),
+                               (3, 'a@x', None, 222, 'SECRET', 4),
+                               (4, 'b@x', None, 333, None, 3),
+                           ])
+    apply_migrations(connection, since='1677264286', until='1677264287')
+
+    rows = connection.execute('SELECT "id", "login", "email2", "telegram", "otp", "bind_dest" FROM "users" '
+                              'ORDER BY "id"').fetchall()
+    assert rows == [(1, 'a@x', 'a@mail', 222, 'SECRET', 4), (4, 'b@x', None, 333, None, 3)]
+    kept = connection.execute('SELECT "id" FROM "users_duplicates" ORDER BY "id"').fetchall()
+    assert kept == [(2,), (3,)]
+
+
+def test_session_times_are_converted_not_dropped() -> None:
+    connection = sqlite3.connect(':memory:')
+    apply_migrations(connection, until='1677264287')
+    connection.executemany('INSERT INTO "sessions" ("session_id", "username", "agent", "time") VALUES (?, ?, ?, ?)', [
+        ('a', 'a@x', 'agent', '2023-02-24 18:30:00.123456'),
+        ('b', 'b@x', 'agent', 1677263400),
+        ('c', 'c@x', 'agent', 'garbage'),
+    ])
+    apply_migrations(connection, since='1677264287', until='1677264288')
+
+    rows = dict(connection.execute('SELECT "session_id", "time" FROM "sessions"').fetchall())
+    assert rows.keys() == {'a', 'b'}
+    expected = connection.execute("SELECT CAST(strftime('%s', '2023-02-24 18:30:00', 'utc') AS INTEGER)").fetchone()[0]
+    assert rows['a'] == expected
+    assert rows['b'] == 1677263400
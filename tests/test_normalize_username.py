@@ -0,0 +1,37 @@
+from typing import Optional
+
+import pytest
+
+from app.config import Config
+from app.web.hooks.normalize_username import (INVALID_LOGIN_ERROR,
+                                              UNSUPPORTED_DOMAIN_ERROR,
+                                              login_account, login_error)
+
+
+@pytest.fixture(autouse=True)
+def domains(monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'login_supported_domains', frozenset(['vtl.edu']), raising=False)
+
+
+@pytest.mark.parametrize('username,account', [
+    ('user1', 'user1'),
+    ('User1@VTL.edu', 'User1'),
+    ('user1@gmail.com', None),
+    ('', None),
+    ('a b', None),
+    ('user;drop@vtl.edu', None),
+])
+def test_login_account(username: str, account: Optional[str]) -> None:
+    assert login_account(username) == account
+
+
+@pytest.mark.parametrize('username,error', [
+    ('user1@gmail.com', UNSUPPORTED_DOMAIN_ERROR),
+    ('x@y@vtl.edu', UNSUPPORTED_DOMAIN_ERROR),
+    ('', INVALID_LOGIN_ERROR),
+    ('a b', INVALID_LOGIN_ERROR),
+    ('user;drop@vtl.edu', INVALID_LOGIN_ERROR),
+])
+def test_rejected_logins_say_why(username: str, error: str) -> None:
+    assert login_account(username) is None
+    assert login_error(username) == error
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Any, Iterator, Optional
+
+import pytest
+
+from app.bot.handlers import StartConversationState
+from app.bot.persistence import SQLitePersistence
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.models.aio import ModelExecutor
+
+
+@pytest.fixture
+def settings(database: SQLiteDatabase, monkeypatch) -> Iterator[None]:
+    monkeypatch.setattr(Config, 'bot_persistence_interval', 5.0, raising=False)
+    monkeypatch.setattr(Config, 'bot_state_ttl', 3600.0, raising=False)
+    ModelExecutor.shutdown()
+    monkeypatch.setattr(Config, 'model_io_workers', 2, raising=False)
+    yield
+    ModelExecutor.shutdown()
+
+
+def updated(database: SQLiteDatabase, chat_id: int) -> Optional[float]:
+    row = database.execute('SELECT "updated" FROM "bot_chat_data" WHERE "chat_id" = ?', (chat_id,)).fetchone()
+    return None if row is None else float(row[0])
+
+
+def test_conversations_survive_a_restart(settings: None) -> None:
+    async def main() -> dict[Any, object]:
+        before = SQLitePersistence(StartConversationState)
+        await before.update_conversation('start', (42,), StartConversationState.CONFIRMATION)
+        await before.update_conversation('start', (43,), StartConversationState.LOGIN)
+        await before.update_conversation('start', (44,), 7)
+        await before.update_conversation('start', (43,), None)
+        await before.update_conversation('other', (42,), StartConversationState.FINISH)
+
+        after = SQLitePersistence(StartConversationState)
+        return await after.get_conversations('start')
+
+    assert asyncio.run(main()) == {(42,): StartConversationState.CONFIRMATION, (44,): 7}
+
+
+def test_chat_data_is_loaded_per_chat_on_first_use(settings: None) -> None:
+    async def main() -> None:
+        before = SQLitePersistence(StartConversationState)
+        await before.update_chat_data(42, {'login': 'user1', 'tg_id': 42})
+
+        after = SQLitePersistence(StartConversationState)
+        assert await after.get_chat_data() == {}
+        chat_data = dict[Any, Any]()
+        await after.refresh_chat_data(42, chat_data)
+        assert chat_data == {'login': 'user1', 'tg_id': 42}
+
+        # once loaded, the Application's copy is the current one and is not read again
+        chat_data['login'] = 'user2'
+        await after.refresh_chat_data(42, chat_data)
+        assert chat_data['login'] == 'user2'
+
+        empty = dict[Any, Any]()
+        await after.refresh_chat_data(43, empty)
+        assert empty == {}
+
+    asyncio.run(main())
+
+
+def test_unchanged_chat_data_is_not_rewritten(settings: None, database: SQLiteDatabase) -> None:
+    async def main() -> None:
+        persistence = SQLitePersistence(StartConversationState)
+        await persistence.update_chat_data(42, {'login': 'user1', 'tg_id': 42})
+        database.execute('UPDATE "bot_chat_data" SET "updated" = 0')
+
+        # key order does not count as a change
+        await persistence.update_chat_data(42, {'tg_id': 42, 'login': 'user1'})
+        assert updated(database, 42) == 0
+        await persistence.update_chat_data(42, {'login': 'user2', 'tg_id': 42})
+        assert (updated(database, 42) or 0) > 0
+
+        await persistence.drop_chat_data(42)
+        assert updated(database, 42) is None
+
+    asyncio.run(main())
+
+
+def test_user_data_is_not_stored(settings: None) -> None:
+    async def main() -> dict[int, Any]:
+        before = SQLitePersistence(StartConversationState)
+        await before.update_user_data(42, {'login': 'user1'})
+        return await SQLitePersistence(StartConversationState).get_user_data()
+
+    # the handlers keep everything in chat_data
+    assert not SQLitePersistence(StartConversationState).store_data.user_data
+    assert asyncio.run(main()) == {}
+
+
+def test_expired_state_is_dropped_on_startup(settings: None, database: SQLiteDatabase) -> None:
+    stale = time.time() - 7200
+    database.execute('INSERT INTO "bot_conversations" VALUES (?, ?, ?, ?)', ('start', '[42]', 'LOGIN', stale))
+    database.execute('INSERT INTO "bot_chat_data" VALUES (?, ?, ?)', (42, '{"login": "user1"}', stale))
+
+    async def main() -> tuple[dict[Any, object], dict[Any, Any]]:
+        persistence = SQLitePersistence(StartConversationState)
+        conversations = await persistence.get_conversations('start')
+        chat_data = dict[Any, Any]()
+        await persistence.refresh_chat_data(42, chat_data)
+        return conversations, chat_data
+
+    assert asyncio.run(main()) == ({}, {})
@@ -0,0 +1,119 @@
+import time
+from typing import Optional
+
+import pytest
+
+from app.cache import TTLCache
+from app.common.ldap import LDAPException
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.directory import LDAPUser
+from app.models import User
+from app.models.profiles import ProfileRefresher
+from app.models.user import PROFILE_READS
+
+DAY = 86400.0
+
+
+class FakeDirectory:
+    def __init__(self) -> None:
+        self.names = dict[str, str]()
+        self.lookups = list[str]()
+
+    def get_user(self, login: str) -> LDAPUser:
+        self.lookups.append(login)
+        if login not in self.names:
+            raise LDAPException(f'User {login} not found')
+        return LDAPUser(f'cn={login}', login, self.names[login], login.split('@')[0])
+
+
+@pytest.fixture
+def directory(database: SQLiteDatabase, monkeypatch) -> FakeDirectory:
+    directory = FakeDirectory()
+    monkeypatch.setattr(Config, 'ldap_descriptor', directory, raising=False)
+    monkeypatch.setattr(Config, 'ldap_user_cache', TTLCache(100, 60.0), raising=False)
+    monkeypatch.setattr(Config, 'profile_ttl', DAY, raising=False)
+    monkeypatch.setattr(Config, 'profile_max_age', 7 * DAY, raising=False)
+    monkeypatch.setattr(Config, 'profile_refresh_batch', 2, raising=False)
+    return directory
+
+
+def add_user(database: SQLiteDatabase, login: str, telegram: int,
+             display_name: Optional[str] = None, age: Optional[float] = None) -> int:
+    user = User(login=login, telegram=telegram)
+    user.save()
+    assert user.id is not None
+    refreshed_at = None if age is None else time.time() - age
+    database.execute('UPDATE "users" SET "display_name" = ?, "refreshed_at" = ? WHERE "id" = ?',
+                     (display_name, refreshed_at, user.id))
+    return user.id
+
+
+def profile(database: SQLiteDatabase, user_id: int) -> tuple[Optional[str], Optional[float]]:
+    return database.execute('SELECT "display_name", "refreshed_at" FROM "users" WHERE "id" = ?',
+                            (user_id,)).fetchone()
+
+
+def test_a_fresh_profile_is_served_without_the_directory(directory: FakeDirectory, database: SQLiteDatabase) -> None:
+    # older than PROFILE_TTL, so due for a refresh, but still within PROFILE_MAX_AGE
+    add_user(database, 'user1@vtl.edu', 42, 'Local Name', 2 * DAY)
+    directory.names['user1@vtl.edu'] = 'Directory Name'
+    local = PROFILE_READS.value('local')
+
+    user = User.try_find_by_telegram(42)
+    assert user is not None
+    assert (user.login, user.name, user.telegram) == ('user1@vtl.edu', 'Local Name', 42)
+    assert directory.lookups == []
+    assert PROFILE_READS.value('local') == local + 1
+    assert User.try_find_by_telegram(43) is None
+
+
+@pytest.mark.parametrize('display_name, age', [('Old Name', 8 * DAY), (None, None)])
+def test_a_stale_profile_falls_back_to_the_directory(directory: FakeDirectory, database: SQLiteDatabase,
+                                                     display_name: Optional[str], age: Optional[float]) -> None:
+    user_id = add_user(database, 'user1@vtl.edu', 42, display_name, age)
+    directory.names['user1@vtl.edu'] = 'Directory Name'
+    ldap = PROFILE_READS.value('ldap')
+
+    user = User.try_find_by_telegram(42)
+    assert user is not None
+    assert (user.id, user.name, user.telegram) == (user_id, 'Directory Name', 42)
+    assert directory.lookups == ['user1@vtl.edu']
+    assert PROFILE_READS.value('ldap') == ldap + 1
+
+    # the lookup brought the row up to date, the next one is served locally
+    name, refreshed_at = profile(database, user_id)
+    assert name == 'Directory Name' and refreshed_at is not None and refreshed_at > time.time() - 60
+    directory.lookups.clear()
+    assert User.try_find_by_telegram(42) is not None
+    assert directory.lookups == []
+
+
+def test_refresh_walks_stale_rows_in_batches(directory: FakeDirectory, database: SQLiteDatabase) -> None:
+    fresh = add_user(database, 'fresh@vtl.edu', 1, 'Fresh', 60.0)
+    stale = [add_user(database, f'user{index}@vtl.edu', 10 + index, 'Old', 2 * DAY) for index in range(3)]
+    missing = add_user(database, 'gone@vtl.edu', 20)
+    for index in range(3):
+        directory.names[f'user{index}@vtl.edu'] = f'User {index}'
+    refresher = ProfileRefresher()
+
+    assert refresher.refresh() == 2
+    assert directory.lookups == ['user0@vtl.edu', 'user1@vtl.edu']
+    # the next batch starts after the last row of this one
+    assert refresher.refresh() == 1
+    assert directory.lookups[2:] == ['user2@vtl.edu', 'gone@vtl.edu']
+    assert (refresher.refreshed, refresher.failed) == (3, 1)
+
+    assert [profile(database, user_id)[0] for user_id in stale] == ['User 0', 'User 1', 'User 2']
+    assert profile(database, fresh)[0] == 'Fresh'
+    assert profile(database, missing) == (None, None)
+    # refreshed profiles are cached for find()
+    cached = Config.ldap_user_cache.get('user0@vtl.edu')
+    assert cached is not None and cached.display_name == 'User 0'
+
+    # a short batch wraps the cursor around, and the failed row is retried on the next pass
+    directory.lookups.clear()
+    assert refresher.refresh() == 0
+    assert directory.lookups == []
+    assert refresher.refresh() == 0
+    assert directory.lookups == ['gone@vtl.edu']
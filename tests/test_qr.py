@@ -0,0 +1,39 @@
+import pytest
+
+from app.cache import TTLCache
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.models import TokenPurpose
+from app.models.tokens import TokenStore
+from app.web import qr
+
+LOGIN = 'user@vtl.edu'
+
+
+@pytest.fixture
+def tokens(database: SQLiteDatabase, monkeypatch) -> TokenStore:
+    store = TokenStore()
+    monkeypatch.setattr(qr, 'token_store', store)
+    monkeypatch.setattr(Config, 'bind_token_ttl', 600.0, raising=False)
+    monkeypatch.setattr(Config, 'telegram_bot_url', 'https://t.me/test_bot', raising=False)
+    return store
+
+
+def test_evicted_images_are_rendered_again(tokens: TokenStore, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'qr_cache', TTLCache(0, 0.0), raising=False)
+    tokens.issue(TokenPurpose.OTP, LOGIN, 'JBSWY3DPEHPK3PXP')
+    tokens.issue(TokenPurpose.TELEGRAM, LOGIN, '1234567')
+
+    for kind in ('otp', 'telegram'):
+        image = qr.get_qr_image(kind, LOGIN)
+        assert image is not None and image.startswith(b'\x89PNG')
+        assert qr.get_qr_image(kind, LOGIN) == image
+    assert qr.get_qr_image('other', LOGIN) is None
+
+
+def test_no_image_without_a_pending_binding(tokens: TokenStore, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'qr_cache', TTLCache(16, 60.0), raising=False)
+    tokens.issue(TokenPurpose.OTP, LOGIN, 'JBSWY3DPEHPK3PXP')
+    assert qr.get_qr_image('otp', LOGIN) is not None
+    tokens.discard(TokenPurpose.OTP, LOGIN)
+    assert qr.get_qr_image('otp', LOGIN) is None
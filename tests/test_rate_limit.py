@@ -0,0 +1,103 @@
+import importlib
+
+import cherrypy
+import pytest
+
+from app import ratelimit
+from app.config import Config
+from app.ratelimit import TokenBucketLimiter
+from app.web.utils import init_hooks
+
+# importlib, since app.web.hooks re-exports the tool function under the module's name
+hook = importlib.import_module('app.web.hooks.rate_limit')
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def limits(monkeypatch) -> None:
+    monkeypatch.setattr(hook, '_limiters', {})
+    monkeypatch.setattr(Config, 'rate_limit_enabled', True, raising=False)
+    monkeypatch.setattr(Config, 'rate_limit_ip', (100, 60.0), raising=False)
+    monkeypatch.setattr(Config, 'rate_limit_user', (1, 60.0), raising=False)
+    monkeypatch.setattr(Config, 'trusted_proxies', (), raising=False)
+    monkeypatch.setattr(Config, 'login_supported_domains', frozenset(['vtl.edu']), raising=False)
+
+
+def test_burst_then_even_refill(clock: Clock) -> None:
+    limiter = TokenBucketLimiter(3, 30.0)
+    assert [limiter.allow('a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow('b')
+
+    clock.now += 9.0
+    assert not limiter.allow('a')
+    clock.now += 1.0
+    assert limiter.allow('a')
+    assert not limiter.allow('a')
+
+    # an idle bucket refills up to the burst, not beyond
+    clock.now += 600.0
+    assert [limiter.allow('a') for _ in range(4)] == [True, True, True, False]
+
+
+def test_least_recently_used_keys_are_evicted(clock: Clock) -> None:
+    limiter = TokenBucketLimiter(1, 60.0, max_keys=2)
+    assert limiter.allow('a') and limiter.allow('b')
+    assert not limiter.allow('a')
+    # 'b' was the least recently used: it is dropped and starts over with a full bucket, 'a' is kept
+    assert limiter.allow('c')
+    assert not limiter.allow('a')
+    assert limiter.allow('b')
+
+
+def test_retry_after_is_the_time_for_one_token() -> None:
+    assert TokenBucketLimiter(10, 300.0).retry_after() == 30
+    assert TokenBucketLimiter(30, 1.0).retry_after() == 1
+
+
+def test_spellings_of_a_login_share_a_bucket(limits: None) -> None:
+    assert hook.over_limit('login', '203.0.113.1', 'User1@VTL.edu') is None
+    assert hook.over_limit('login', '203.0.113.2', ' user1 ') is not None
+    assert hook.over_limit('login', '203.0.113.3', 'user2') is None
+
+
+def test_ip_limit_comes_first(limits: None, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'rate_limit_ip', (1, 60.0))
+    assert hook.over_limit('login', '203.0.113.1', 'user1') is None
+    limiter = hook.over_limit('login', '203.0.113.1', 'user2')
+    assert limiter is not None and limiter.capacity == 1
+    assert hook.over_limit('reset_post', '203.0.113.1', 'user2') is None
+
+
+def test_disabled(limits: None, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'rate_limit_enabled', False)
+    assert all(hook.over_limit('login', '203.0.113.1', 'user1') is None for _ in range(5))
+
+
+def test_hook_answers_429_with_retry_after(limits: None, cherrypy_request: cherrypy._cprequest.Request) -> None:
+    cherrypy_request.params = {'username': 'user1'}
+    hook.rate_limit(route='login', user=(2, 120.0))
+    hook.rate_limit(route='login', user=(2, 120.0))
+    with pytest.raises(cherrypy.HTTPError) as error:
+        hook.rate_limit(route='login', user=(2, 120.0))
+    assert error.value.status == 429
+    assert cherrypy.serving.response.headers['Retry-After'] == '60'
+
+
+def test_rate_limit_runs_before_normalize_username() -> None:
+    init_hooks()
+    # lower priorities run first; normalization may ask the directory, so rejected requests must stop earlier
+    assert cherrypy.tools.rate_limit._priority < cherrypy.tools.normalize_username._priority
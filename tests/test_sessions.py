@@ -0,0 +1,106 @@
+import time
+from typing import Optional
+
+import pytest
+
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.web.sessions import SessionStore
+
+AGENT = 'Mozilla/5.0'
+
+
+@pytest.fixture
+def store(database: SQLiteDatabase, monkeypatch) -> SessionStore:
+    monkeypatch.setattr(Config, 'session_cache_size', 100, raising=False)
+    monkeypatch.setattr(Config, 'session_lifetime', 3600.0, raising=False)
+    return SessionStore()
+
+
+def stored_time(database: SQLiteDatabase, session_id: str) -> Optional[float]:
+    data = database.execute('SELECT "time" FROM "sessions" WHERE "session_id" = ?', (session_id,)).fetchone()
+    return None if data is None else float(data[0])
+
+
+def test_save_and_delete_write_through(store: SessionStore, database: SQLiteDatabase) -> None:
+    store.save('s1', 'user1', AGENT)
+    assert stored_time(database, 's1') is not None
+
+    store.delete('s1')
+    assert stored_time(database, 's1') is None
+    assert store.resolve('s1', AGENT) is None
+
+
+def test_a_new_login_replaces_the_users_older_session(store: SessionStore, database: SQLiteDatabase) -> None:
+    store.save('s1', 'user1', AGENT)
+    store.save('s2', 'user1', AGENT)
+    assert 's1' not in store
+    assert store.resolve('s1', AGENT) is None
+    assert store.resolve('s2', AGENT) == 'user1'
+
+
+def test_sessions_are_bound_to_the_agent(store: SessionStore) -> None:
+    store.save('s1', 'user1', AGENT)
+    assert store.resolve('s1', 'curl/8.0') is None
+    assert store.check('s1', 'user1', AGENT)
+    assert not store.check('s1', 'user2', AGENT)
+
+
+def test_refreshes_are_written_in_batches(store: SessionStore, database: SQLiteDatabase) -> None:
+    store.save('s1', 'user1', AGENT)
+    store.save('s2', 'user2', AGENT)
+    database.execute('UPDATE "sessions" SET "time" = "time" - 100')
+    saved = stored_time(database, 's1')
+    assert saved is not None
+
+    assert store.resolve('s1', AGENT) == 'user1'
+    assert store.resolve('s2', AGENT) == 'user2'
+    assert stored_time(database, 's1') == saved
+
+    store.flush()
+    assert store.flushes == 1
+    refreshed = stored_time(database, 's1')
+    assert refreshed is not None and refreshed > saved
+    store.flush()
+    assert store.flushes == 1
+
+
+def test_sessions_outlive_a_restart(store: SessionStore, database: SQLiteDatabase, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'session_flush_interval', 60.0, raising=False)
+    monkeypatch.setattr(Config, 'session_sweep_interval', 60.0, raising=False)
+    store.start()
+    store.save('s1', 'user1', AGENT)
+    database.execute('UPDATE "sessions" SET "time" = "time" - 100')
+    saved = stored_time(database, 's1')
+    assert saved is not None
+    store.resolve('s1', AGENT)
+    # stopping writes the refreshes still pending
+    store.stop()
+    refreshed = stored_time(database, 's1')
+    assert refreshed is not None and refreshed > saved
+
+    restarted = SessionStore()
+    assert 's1' not in restarted
+    assert restarted.resolve('s1', AGENT) == 'user1'
+    assert 's1' in restarted
+
+
+def test_idle_sessions_expire(store: SessionStore, database: SQLiteDatabase, monkeypatch) -> None:
+    store.save('s1', 'user1', AGENT)
+    monkeypatch.setattr(Config, 'session_lifetime', -1.0)
+    assert store.resolve('s1', AGENT) is None
+    assert stored_time(database, 's1') is None
+
+
+def test_sweep_removes_stale_rows(store: SessionStore, database: SQLiteDatabase) -> None:
+    store.save('fresh', 'user1', AGENT)
+    store.save('stale', 'user2', AGENT)
+    database.execute('UPDATE "sessions" SET "time" = ? WHERE "session_id" = ?', (time.time() - 7200, 'stale'))
+    database.execute('INSERT INTO "sessions" ("session_id", "username", "agent", "time") VALUES (?, ?, ?, ?)',
+                     ('other', 'user3', AGENT, time.time() - 7200))
+
+    store.sweep()
+    assert store.swept == 2
+    assert stored_time(database, 'fresh') is not None
+    assert stored_time(database, 'stale') is None
+    assert stored_time(database, 'other') is None
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+# seconds for a cold `import app.web`; generous for CI runners, override to tighten locally
+IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', '1.5'))
+# imported on first use only, see app.web.tg_sender, app.web.qr and the OTP handlers
+DEFERRED = ('telegram', 'qrcode', 'PIL', 'pyotp')
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import app.web
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+'''
+
+
+def import_app_web() -> tuple[float, set[str]]:
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.splitlines()[-1])
+    return report['seconds'], set(report['modules'])
+
+
+def test_web_import_defers_heavy_packages() -> None:
+    _, modules = import_app_web()
+    loaded = [name for name in DEFERRED if name in modules]
+    assert not loaded, f'importing app.web pulls in {loaded}'
+
+
+def test_web_import_is_within_budget() -> None:
+    # best of three, so a busy runner does not fail the build on one slow start
+    seconds = min(import_app_web()[0] for _ in range(3))
+    assert seconds <= IMPORT_BUDGET, f'import app.web took {seconds:.3f}s, budget {IMPORT_BUDGET}s'
@@ -0,0 +1,47 @@
+import time
+from typing import Iterator
+
+import pytest
+
+from app.config import Config
+from app.web import utils
+from app.web.tg_sender import CHAT_INTERVAL, TelegramSender
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+@pytest.fixture
+def fake_telegram(monkeypatch) -> Iterator[FakeTelegramServer]:
+    """A fake Bot API and a sender talking to it, installed in place of the process-wide sender."""
+    fake = FakeTelegramServer().start()
+    monkeypatch.setattr(Config, 'telegram_bot_token', '1:test', raising=False)
+    monkeypatch.setattr(Config, 'telegram_api_url', fake.base_url, raising=False)
+    monkeypatch.setattr(Config, 'telegram_pool_size', 2, raising=False)
+    monkeypatch.setattr(Config, 'telegram_send_timeout', 5.0, raising=False)
+    sender = TelegramSender()
+    monkeypatch.setattr(utils, 'telegram_sender', sender)
+    yield fake
+    sender.stop()
+    fake.shutdown()
+    fake.server_close()
+
+
+def test_send_reaches_the_bot_api(fake_telegram: FakeTelegramServer) -> None:
+    message = utils.telegram_sender.send(42, 'hello').result(5.0)
+    assert message.text == 'hello'
+    assert fake_telegram.messages == {42: 'hello'}
+
+
+def test_deliver_reports_refused_sends(fake_telegram: FakeTelegramServer) -> None:
+    fake_telegram.unreachable.add(13)
+    assert utils.deliver_tg_msg(42, 'code 1')
+    assert not utils.deliver_tg_msg(13, 'code 2')
+    assert fake_telegram.messages == {42: 'code 1'}
+
+
+def test_deliver_cancels_timed_out_sends(fake_telegram: FakeTelegramServer, monkeypatch) -> None:
+    assert utils.deliver_tg_msg(42, 'code 1')
+    # the next message to the chat waits out CHAT_INTERVAL in the sender, past the timeout
+    monkeypatch.setattr(Config, 'telegram_send_timeout', 0.2)
+    assert not utils.deliver_tg_msg(42, 'code 2')
+    time.sleep(CHAT_INTERVAL + 0.3)
+    assert fake_telegram.messages == {42: 'code 1'}
@@ -0,0 +1,59 @@
+import pytest
+
+from app.config import Config
+from app.db import SQLiteDatabase
+from app.models import TokenPurpose
+from app.models.tokens import TokenStore
+
+LOGIN = 'user@vtl.edu'
+
+
+@pytest.fixture
+def settings(database: SQLiteDatabase, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'reset_token_ttl', 600.0, raising=False)
+    monkeypatch.setattr(Config, 'bind_token_ttl', 600.0, raising=False)
+
+
+def rows(database: SQLiteDatabase) -> int:
+    return database.execute('SELECT COUNT(*) FROM "tokens"').fetchone()[0]
+
+
+def test_consume_succeeds_once(settings: None) -> None:
+    store = TokenStore()
+    store.issue(TokenPurpose.RESET, LOGIN, '1234567')
+    assert not store.consume(TokenPurpose.RESET, LOGIN, '7654321')
+    assert store.consume(TokenPurpose.RESET, LOGIN, '1234567')
+    assert not store.consume(TokenPurpose.RESET, LOGIN, '1234567')
+    assert store.peek(TokenPurpose.RESET, LOGIN) is None
+
+
+def test_purposes_are_separate(settings: None) -> None:
+    store = TokenStore()
+    store.issue(TokenPurpose.RESET, LOGIN, '1234567')
+    assert store.peek(TokenPurpose.TELEGRAM, LOGIN) is None
+    assert not store.consume(TokenPurpose.TELEGRAM, LOGIN, '1234567')
+
+
+def test_expired_tokens_are_rejected_and_purged(settings: None, database: SQLiteDatabase, monkeypatch) -> None:
+    store = TokenStore()
+    store.issue(TokenPurpose.TELEGRAM, LOGIN, 'live')
+    monkeypatch.setattr(Config, 'reset_token_ttl', -1.0)
+    store.issue(TokenPurpose.RESET, LOGIN, 'expired')
+
+    assert store.peek(TokenPurpose.RESET, LOGIN) is None
+    assert not store.consume(TokenPurpose.RESET, LOGIN, 'expired')
+    store.purge()
+    assert store.purged == 1
+    assert rows(database) == 1
+    assert store.peek(TokenPurpose.TELEGRAM, LOGIN) == 'live'
+
+
+def test_changes_made_by_another_process_are_seen(settings: None) -> None:
+    web, bot = TokenStore(), TokenStore()
+    web.issue(TokenPurpose.OTP, LOGIN, 'first')
+    assert web.peek(TokenPurpose.OTP, LOGIN) == 'first'
+
+    bot.issue(TokenPurpose.OTP, LOGIN, 'second')
+    assert web.peek(TokenPurpose.OTP, LOGIN) == 'second'
+    assert bot.consume(TokenPurpose.OTP, LOGIN, 'second')
+    assert web.peek(TokenPurpose.OTP, LOGIN) is None
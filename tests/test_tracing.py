@@ -0,0 +1,113 @@
+import asyncio
+import os
+import stat
+import threading
+from typing import Iterator, Optional
+
+import pytest
+
+from app.config import Config, getenv_default, private_dir
+from app.models.aio import ModelExecutor, run_sync
+from app.profiling import RouteProfiler
+from app.tracing import Span, Tracer, span
+
+
+@pytest.fixture
+def executor(monkeypatch) -> Iterator[None]:
+    ModelExecutor.shutdown()
+    monkeypatch.setattr(Config, 'model_io_workers', 2, raising=False)
+    yield
+    ModelExecutor.shutdown()
+
+
+def names(root: Span) -> list[str]:
+    return [line.split(' @')[0] for line in root.render()]
+
+
+def query(name: str, threads: set[str]) -> None:
+    threads.add(threading.current_thread().name)
+    with span(f'{name}.query'):
+        with span(f'{name}.fetch'):
+            pass
+
+
+def test_spans_nest_across_run_sync(executor: None) -> None:
+    tracer = Tracer()
+    threads = set[str]()
+
+    async def request(name: str) -> Optional[Span]:
+        with tracer.trace(name) as root:
+            with span(f'{name}.handler'):
+                await run_sync(query, name, threads)
+                await asyncio.sleep(0)
+                await run_sync(query, name, threads)
+        return root
+
+    async def main() -> tuple[Optional[Span], Optional[Span]]:
+        # two requests interleaved on one loop, each keeps to its own tree
+        return await asyncio.gather(request('first'), request('second'))
+
+    first, second = asyncio.run(main())
+    assert threading.current_thread().name not in threads
+    assert first is not None and second is not None
+    for name, root in (('first', first), ('second', second)):
+        assert names(root) == [name, f'  {name}.handler',
+                               f'    {name}.query', f'      {name}.fetch',
+                               f'    {name}.query', f'      {name}.fetch']
+        assert root.duration is not None
+    assert tracer.traces == 2
+
+
+def test_a_disabled_tracer_records_nothing() -> None:
+    tracer = Tracer()
+    tracer.enabled = False
+    with tracer.trace('request') as root:
+        with span('handler'):
+            pass
+    assert root is None and tracer.traces == 0
+
+
+def test_profiles_need_a_directory() -> None:
+    profiler = RouteProfiler()
+    with pytest.raises(ValueError):
+        profiler.arm('/user', 1, 'cprofile')
+    assert profiler.start('/user') is None
+
+
+def test_the_profile_dir_must_be_private(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv('PROFILE_DIR', raising=False)
+    assert getenv_default('PROFILE_DIR', '', private_dir) == ''
+
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    monkeypatch.setenv('PROFILE_DIR', str(shared))
+    with pytest.raises(PermissionError):
+        getenv_default('PROFILE_DIR', '', private_dir)
+
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))
+    directory = getenv_default('PROFILE_DIR', '', private_dir)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+@pytest.mark.parametrize('mode, suffix', [('cprofile', '.prof'), ('sample', '.folded')])
+def test_armed_routes_are_profiled_into_the_directory(tmp_path, mode: str, suffix: str) -> None:
+    profiler = RouteProfiler()
+    profiler.directory = private_dir(str(tmp_path / 'profiles'))
+    with pytest.raises(ValueError):
+        profiler.arm('/user', 1, 'perf')
+    profiler.arm('/user', 1, mode)
+    assert profiler.start('/auth') is None
+
+    session = profiler.start('/user')
+    assert session is not None
+    sum(range(100_000))
+    profiler.stop(session, '/user')
+    # the plan was for one request
+    assert profiler.start('/user') is None
+
+    written = profiler.status()['written']
+    assert len(written) == 1
+    assert os.path.dirname(written[0]) == profiler.directory
+    assert os.path.basename(written[0]).startswith('user-') and written[0].endswith(suffix)
+    assert os.listdir(profiler.directory) == [os.path.basename(written[0])]
@@ -0,0 +1,90 @@
+import sqlite3
+from typing import Optional
+
+import pytest
+
+from app.db import SQLiteDatabase
+from app.models import User, UserBindDestination
+
+
+@pytest.fixture
+def statements(database: SQLiteDatabase) -> list[str]:
+    """Statements run on this thread's connection, as SQLite expands them."""
+    statements = list[str]()
+    database.connection().set_trace_callback(statements.append)
+    return statements
+
+
+def row(database: SQLiteDatabase, login: str) -> Optional[tuple]:
+    return database.execute('SELECT "telegram", "otp", "bind_dest" FROM "users" WHERE "login" = ?',
+                            (login,)).fetchone()
+
+
+def writes(statements: list[str]) -> list[str]:
+    return [statement.strip() for statement in statements if statement.strip().startswith(('INSERT', 'UPDATE'))]
+
+
+def test_only_changed_columns_are_written(database: SQLiteDatabase, statements: list[str]) -> None:
+    user = User(login='user1@vtl.edu')
+    user.save()
+    assert user.id is not None and not user.is_dirty()
+    assert len(writes(statements)) == 1
+
+    statements.clear()
+    user.save()
+    # bind_dest None reads as NONE, the value that was written
+    user.bind_dest = UserBindDestination.NONE
+    user.save()
+    assert statements == []
+
+    user.telegram = 42
+    user.otp = 'SECRET'
+    assert user.dirty_fields() == ('telegram', 'otp')
+    user.save()
+    assert writes(statements) == [f'UPDATE "users" SET "telegram" = 42, "otp" = \'SECRET\' WHERE "id" = {user.id}']
+    assert row(database, 'user1@vtl.edu') == (42, 'SECRET', 0)
+    assert not user.is_dirty()
+
+
+def test_transaction_writes_once_on_exit(database: SQLiteDatabase, statements: list[str]) -> None:
+    first, second = User(login='user1@vtl.edu'), User(login='user2@vtl.edu')
+    with User.transaction() as outer:
+        first.save()
+        with User.transaction() as inner:
+            assert inner is outer
+            second.save()
+        # leaving the inner block writes nothing
+        assert statements == []
+        first.telegram = 42
+        first.save()
+
+    assert [statement for statement in statements if statement.startswith('BEGIN')] == ['BEGIN IMMEDIATE']
+    assert len(writes(statements)) == 2
+    assert row(database, 'user1@vtl.edu') == (42, None, 0)
+    assert first.id is not None and second.id is not None
+
+
+def test_exceptions_discard_the_deferred_saves(database: SQLiteDatabase) -> None:
+    user = User(login='user1@vtl.edu')
+    with pytest.raises(RuntimeError):
+        with User.transaction():
+            user.save()
+            raise RuntimeError('boom')
+    assert row(database, 'user1@vtl.edu') is None
+    assert user.id is None and user.is_dirty()
+
+
+def test_a_failed_commit_rolls_back_and_leaves_users_dirty(database: SQLiteDatabase) -> None:
+    existing = User(login='user2@vtl.edu')
+    existing.save()
+    first, duplicate = User(login='user1@vtl.edu', telegram=42), User(login='user2@vtl.edu')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with User.transaction():
+            first.save()
+            duplicate.save()
+    assert row(database, 'user1@vtl.edu') is None
+    assert first.id is None and first.is_dirty()
+
+    first.save()
+    assert row(database, 'user1@vtl.edu') == (42, None, 0)
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from typing import Iterator
+
+import cherrypy
+import pytest
+from telegram import Update
+from telegram.ext import Application
+
+from app.bot.bot import Bot
+from app.bot.webhook import WebhookReceiver
+from app.config import Config
+
+SECRET = 'webhook-secret'
+UPDATE = {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'chat': {'id': 42, 'type': 'private'},
+                                      'text': '/help'}}
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    """An event loop running on a background thread, as the webhook bot runs it."""
+    loop = asyncio.new_event_loop()
+    running = threading.Event()
+    loop.call_soon(running.set)
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    running.wait()
+    yield loop
+    if loop.is_running():
+        loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    # a drain cut short by its timeout is left pending on the stopped loop
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    if pending:
+        loop.run_until_complete(asyncio.wait(pending))
+    loop.close()
+
+
+@pytest.fixture
+def receiver(loop: asyncio.AbstractEventLoop, cherrypy_request: cherrypy._cprequest.Request,
+             monkeypatch) -> WebhookReceiver:
+    monkeypatch.setattr(Config, 'bot_webhook_secret', SECRET, raising=False)
+    application = Application.builder().token('1:test').updater(None).update_queue(asyncio.Queue(maxsize=1)).build()
+    receiver = WebhookReceiver(application)
+    receiver.loop = loop
+    receiver.accepting = True
+    cherrypy_request.headers['X-Telegram-Bot-Api-Secret-Token'] = SECRET
+    cherrypy_request.json = UPDATE
+    return receiver
+
+
+def status(receiver: WebhookReceiver) -> int:
+    try:
+        receiver.index()
+    except cherrypy.HTTPError as e:
+        return e.status
+    return 200
+
+
+def test_accepts_updates_with_the_secret(receiver: WebhookReceiver) -> None:
+    assert status(receiver) == 200
+    update = receiver.application.update_queue.get_nowait()
+    assert isinstance(update, Update) and update.update_id == 1
+
+
+def test_rejects_a_wrong_secret(receiver: WebhookReceiver, cherrypy_request: cherrypy._cprequest.Request) -> None:
+    cherrypy_request.headers['X-Telegram-Bot-Api-Secret-Token'] = 'guess'
+    assert status(receiver) == 403
+    del cherrypy_request.headers['X-Telegram-Bot-Api-Secret-Token']
+    assert status(receiver) == 403
+    assert receiver.application.update_queue.empty()
+
+
+def test_unavailable_while_not_accepting(receiver: WebhookReceiver) -> None:
+    receiver.accepting = False
+    assert status(receiver) == 503
+    assert receiver.application.update_queue.empty()
+
+
+def test_unavailable_when_the_queue_is_full(receiver: WebhookReceiver) -> None:
+    assert status(receiver) == 200
+    assert status(receiver) == 503
+    assert receiver.application.update_queue.qsize() == 1
+
+
+class DrainingApplication:
+    """Stands in for a running Application: stop() works through the queue, taking `delay` per update."""
+
+    def __init__(self, delay: float) -> None:
+        self.update_queue = asyncio.Queue[int]()
+        self.delay = delay
+        self.processed = list[int]()
+        self.shut_down = False
+
+    async def stop(self) -> None:
+        while not self.update_queue.empty():
+            await asyncio.sleep(self.delay)
+            self.processed.append(self.update_queue.get_nowait())
+
+    async def shutdown(self) -> None:
+        self.shut_down = True
+
+
+def stopped_bot(loop: asyncio.AbstractEventLoop, application: DrainingApplication) -> Bot:
+    # Bot() would build a real Application; stop() only needs these
+    bot = object.__new__(Bot)
+    bot.application = application  # type: ignore[assignment]
+    bot.loop = loop
+    bot.webhook = WebhookReceiver(application)  # type: ignore[arg-type]
+    bot.webhook.accepting = True
+    for update_id in range(3):
+        application.update_queue.put_nowait(update_id)
+    return bot
+
+
+def wait_stopped(loop: asyncio.AbstractEventLoop) -> None:
+    deadline = time.monotonic() + 5
+    while loop.is_running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not loop.is_running()
+
+
+def test_stop_drains_queued_updates(loop: asyncio.AbstractEventLoop, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'bot_drain_timeout', 5.0, raising=False)
+    application = DrainingApplication(0.01)
+    bot = stopped_bot(loop, application)
+
+    bot.stop()
+    assert bot.webhook is not None and not bot.webhook.accepting
+    assert application.processed == [0, 1, 2]
+    assert application.shut_down
+    wait_stopped(loop)
+
+
+def test_stop_gives_up_after_the_drain_timeout(loop: asyncio.AbstractEventLoop, monkeypatch) -> None:
+    monkeypatch.setattr(Config, 'bot_drain_timeout', 0.05, raising=False)
+    application = DrainingApplication(10.0)
+    bot = stopped_bot(loop, application)
+
+    start = time.monotonic()
+    bot.stop()
+    assert time.monotonic() - start < 5
+    wait_stopped(loop)